@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+bench_categorize.py - categorize_bills.CategoryMatcher の一致確認とマイクロベンチマーク
+議案名のコーパス（既定 10万件）で、従来のキーワードごとのループ（any(kw in name ...)）と
+CategoryMatcher（キーワードをまとめた正規表現1本）の時間を比べ、
+マッチしたカテゴリ（順序も含む）が全件同じことを確かめる。1件でも違えば終了コード 1。
+
+コーパスには実際の議案名の形のほか、キーワード同士が重なる・前後に並ぶ・一部だけ含む名前を混ぜる
+（「障害者権利」と「障害者」「障害」のように、接頭辞の関係にあるキーワードの取りこぼしを見るため）。
+
+使い方:
+  python bench/bench_categorize.py                 # 10万件
+  python bench/bench_categorize.py --names 1000000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")  # import するだけなので接続はしない
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bench")
+
+import datagen
+import categorize_bills
+
+KEYWORDS = sorted({kw for cat in categorize_bills.CATEGORIES for kw in cat["keywords"]})
+SHAPES = [
+    "{a}の一部を改正する法律案", "{a}及び{b}の一部を改正する法律案", "{a}に関する法律案", "{a}{b}法案",
+    "{a}等の推進に関する法律案", "{a}の見直しに関する決議案", "令和{n}年度{a}予算", "{a}（第{n}号）",
+]
+
+
+def legacy_match(bill_name: str) -> list[dict]:
+    """変更前の categorize_bill のカテゴリ判定（結果の比較用にそのまま残す）"""
+    matched = []
+    for cat in categorize_bills.CATEGORIES:
+        for kw in cat["keywords"]:
+            if kw in bill_name:
+                matched.append(cat)
+                break
+    return matched
+
+
+def fragment(rng: random.Random) -> str:
+    """キーワード・その一部・つなげたもの・法令名のどれか"""
+    kw = rng.choice(KEYWORDS)
+    roll = rng.random()
+    if roll < 0.3:
+        return kw
+    if roll < 0.5 and len(kw) > 1:
+        start = rng.randrange(len(kw))
+        return kw[start:rng.randint(start + 1, len(kw))]
+    if roll < 0.7:
+        return kw + rng.choice(KEYWORDS)
+    return rng.choice(datagen.LAW_STEMS)
+
+
+def make_corpus(count: int, seed: int = 17) -> list[str]:
+    rng = random.Random(seed)
+    return [rng.choice(SHAPES).format(a=fragment(rng), b=fragment(rng), n=rng.randint(1, 7)) for _ in range(count)]
+
+
+def timed(func, corpus) -> tuple[float, list[list[str]]]:
+    started = time.perf_counter()
+    out = [func(name) for name in corpus]
+    seconds = time.perf_counter() - started
+    return seconds, [[cat["name"] for cat in cats] for cats in out]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CategoryMatcher の一致確認とマイクロベンチマーク")
+    parser.add_argument("--names", type=int, default=100_000, help="議案名の件数 (デフォルト: 100000)")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.names)
+    print(f"コーパス: {len(corpus)}件, キーワード {len(KEYWORDS)}個, カテゴリ {len(categorize_bills.CATEGORIES)}個")
+
+    legacy_seconds, expected = timed(legacy_match, corpus)
+    matcher_seconds, actual = timed(categorize_bills.CATEGORY_MATCHER.match, corpus)
+    print(f"  従来（キーワードごとの in）: {legacy_seconds:.3f}秒 ({len(corpus) / legacy_seconds:,.0f}件/秒)")
+    print(f"  CategoryMatcher:            {matcher_seconds:.3f}秒 (×{legacy_seconds / matcher_seconds:.1f})")
+
+    mismatches = [(name, e, a) for name, e, a in zip(corpus, expected, actual) if e != a]
+    if mismatches:
+        for name, e, a in mismatches[:5]:
+            print(f"  ❌ {name!r}: {e} != {a}")
+        print(f"  不一致: {len(mismatches)}件")
+        sys.exit(1)
+    matched = sum(1 for e in expected if e)
+    print(f"  結果: 全件一致（カテゴリあり {matched}件, 複数カテゴリ {sum(1 for e in expected if len(e) > 1)}件）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+bench_search.py - speech_index.py（発言本文の全文検索インデックス）のベンチマーク
+合成した発言（既定 10万件、語の出現は Zipf 分布）を collect_daily と同じく add_many で足していき、
+索引の作成速度（件数/秒・本文MB/秒）、セグメント数・サイズ、まとめにかかった時間を測る。
+続けて出現順位の違う語・複数語・1文字の検索を繰り返し、応答時間の中央値と p95 を一致件数と並べて出す。
+--scan をつけると、本文を全件なめる検索（サイトの ilike 相当）と結果の件数・時間を比べる。
+
+使い方:
+  python bench/bench_search.py                      # 10万件
+  python bench/bench_search.py --speeches 1000000   # 100万件（数分かかる）
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import resource
+import statistics
+from itertools import accumulate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datagen
+from speech_index import SpeechIndex
+
+TOPICS = (
+    ["消費税", "軽減税率", "防衛費", "少子化対策", "子ども・子育て支援金", "物価高騰", "賃上げ", "原子力発電所",
+     "再生可能エネルギー", "マイナンバーカード", "政治資金規正法", "裏金", "能登半島地震", "復興", "インボイス制度",
+     "年金", "医療費", "介護人材", "外国人労働者", "円安", "日米同盟", "台湾有事", "ガソリン税", "米価", "教員不足"] +
+    datagen.LAW_STEMS + [c + "委員会" for c in datagen.COMMITTEES] + datagen.MEETINGS
+)
+KANJI = "政治経済社会法律制度予算税金財政国民地方自治行政改革環境教育医療福祉労働雇用産業農業漁業外交安全保障防衛警察司法選挙議会内閣総理大臣省庁公共事業交通通信情報技術研究開発資源エネルギー電力"
+TAIL_WORDS = 20_000  # 話題の語のあとに続く、漢字を組み合わせた語（ロングテール）
+FILLERS = ["について", "に関して", "を", "は", "が", "の", "と", "も", "に対する", "における"]
+ENDINGS = ["お伺いいたします。", "御説明申し上げます。", "答弁を求めます。", "検討してまいります。",
+           "重要と考えております。", "いかがお考えでしょうか。", "承知しております。"]
+
+
+def make_words(seed: int = 13) -> list[str]:
+    """出現順位の順に並べた語彙（話題の語 + ロングテール）"""
+    rng = random.Random(seed)
+    words = dict.fromkeys(TOPICS)
+    while len(words) < len(TOPICS) + TAIL_WORDS:
+        words[''.join(rng.choices(KANJI, k=rng.randint(2, 4)))] = None
+    return list(words)
+
+
+WORDS = make_words()
+QUERIES = {
+    "1位の語": WORDS[0],
+    "10位の語": WORDS[9],
+    "100位の語": WORDS[99],
+    "5000位の語": WORDS[4999],
+    "複数語": f"{WORDS[1]} {WORDS[2]}",
+    "長い語": "原子力規制委員会設置法",
+    "1文字": "米",
+    "ヒットなし": "ラグランジュ点",
+}
+
+
+def make_speeches(count: int, avg_chars: int, seed: int = 11):
+    """(speechID, 本文) を count 件。語は Zipf 分布（順位 r の語は 1/r に比例）で選ぶ"""
+    rng = random.Random(seed)
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(WORDS))))
+    for i in range(count):
+        parts = [f"○{datagen.make_name(rng, rng.randrange(2000))}君　"]
+        length = 0
+        target = rng.randint(avg_chars // 4, avg_chars * 7 // 4)
+        while length < target:
+            words = rng.choices(WORDS, cum_weights=cum_weights, k=2)
+            sentence = f"{words[0]}{rng.choice(FILLERS)}{words[1]}{rng.choice(ENDINGS)}"
+            parts.append(sentence)
+            length += len(sentence)
+        yield f"bench-{i:08d}", "".join(parts)
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run_queries(index: SpeechIndex, label: str, repeat: int):
+    print(f"  検索（{label}, セグメント {index.stats()['segments']}個, {repeat}回の中央値 / p95, 一致件数）:")
+    for name, query in QUERIES.items():
+        matched = len(index.search(query, limit=10 ** 9))
+        times = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            index.search(query, limit=20)
+            times.append((time.perf_counter() - t) * 1000)
+        print(f"    {name:<8} {query!r:<24} {statistics.median(times):8.1f}ms / {percentile(times, 0.95):8.1f}ms"
+              f"  {matched}件")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="発言の全文検索インデックスのベンチマーク")
+    parser.add_argument("--speeches", type=int, default=100_000, help="発言数 (デフォルト: 100000)")
+    parser.add_argument("--chars", type=int, default=300, help="発言の平均文字数 (デフォルト: 300)")
+    parser.add_argument("--repeat", type=int, default=20, help="検索ごとの繰り返し回数 (デフォルト: 20)")
+    parser.add_argument("--scan", action="store_true", help="全件なめる検索とも比べる")
+    parser.add_argument("--dir", help="インデックスを作るディレクトリ（省略時は一時ディレクトリ、終わったら消す）")
+    args = parser.parse_args()
+
+    path = args.dir or tempfile.mkdtemp(prefix="bench-speech-index-")
+    shutil.rmtree(path, ignore_errors=True)
+    index = SpeechIndex(path)
+    print(f"発言 {args.speeches}件（平均 {args.chars}文字）→ {path}")
+
+    # collect_daily と同じく、書き込みチャンク（1000件）ごとに add_many し、最後に flush
+    chars = 0
+    started = time.perf_counter()
+    chunk = []
+    for speech_id, text in make_speeches(args.speeches, args.chars):
+        chars += len(text)
+        chunk.append((speech_id, text))
+        if len(chunk) >= 1000:
+            index.add_many(chunk)
+            chunk = []
+    index.add_many(chunk)
+    index.flush()
+    build_seconds = time.perf_counter() - started
+    stats = index.stats()
+    print(f"  作成: {build_seconds:.1f}秒 ({args.speeches / build_seconds:,.0f}件/秒, "
+          f"{chars * 3 / 1e6 / build_seconds:.1f}MB/秒 ※UTF-8換算)")
+    print(f"  セグメント: {stats['segments']}個, {stats['bytes'] / 1e6:.1f}MB "
+          f"(本文 {chars * 3 / 1e6:.0f}MB の {stats['bytes'] / (chars * 3):.0%}), "
+          f"最大RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f}MB")
+
+    run_queries(index, "まとめる前", args.repeat)
+    if stats["segments"] > 1:
+        started = time.perf_counter()
+        index.merge()
+        print(f"  まとめ: {time.perf_counter() - started:.1f}秒, {index.stats()['bytes'] / 1e6:.1f}MB")
+        run_queries(index, "1つにまとめた後", args.repeat)
+
+    if args.scan:
+        print("  全件なめる検索（本文を作り直しながら in で照合。作り直しの時間は除く）:")
+        for name, query in QUERIES.items():
+            words = query.split()
+            matched = 0
+            seconds = 0.0
+            for _, text in make_speeches(args.speeches, args.chars):
+                t = time.perf_counter()
+                matched += all(w in text for w in words)
+                seconds += time.perf_counter() - t
+            print(f"    {name:<8} {query!r:<24} {seconds * 1000:8.1f}ms  一致 {matched}件")
+
+    index.close()
+    if not args.dir:
+        shutil.rmtree(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+bench_summary.py - categorize_bills.generate_summary のマイクロベンチマーク
+議案名のコーパス（既定 10万件。会期・衆参をまたいで同じ名前が繰り返し出てくる）で、
+従来の実装（パターンごとの re.search）と今の実装（まとめたパターン1回 + LRU）の時間を比べ、
+出力が全件バイト単位で同じことを確かめる。
+
+使い方:
+  python bench/bench_summary.py                 # 10万件
+  python bench/bench_summary.py --names 1000000 --unique 0.5
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")  # import するだけなので接続はしない
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bench")
+
+import datagen
+import categorize_bills
+
+CATEGORY_NAMES = [None] + [c["name"] for c in categorize_bills.CATEGORIES]
+SHAPES = [
+    "{stem}の一部を改正する法律案", "{stem}及び{stem2}の一部を改正する法律案", "{stem}に関する法律案",
+    "{stem}の改正に関し講ずべき措置に関する法律案", "{stem}等の一部を改正する法律案", "{stem}法案",
+    "令和{n}年度一般会計予算", "{stem}に関する日本国とアメリカ合衆国との間の協定の締結について承認を求めるの件",
+    "{stem}の見直しに関する決議案", "{stem}の承認を求めるの件", "{stem}\nの一部を改正する法律案",
+    "{stem}（第{n}号）の一部を改正する法律案（修正）",
+]
+
+
+def legacy_generate_summary(bill_name: str, bill_type: str, category: str | None) -> str:
+    """変更前の generate_summary（結果の比較用にそのまま残す）"""
+    type_label = ""
+    if bill_type == "閣法":
+        type_label = "政府提出。"
+    elif bill_type == "衆法" or bill_type == "参法":
+        type_label = "議員立法。"
+    name = bill_name
+    m = re.search(r'(.+?)の一部を改正する法律案', name)
+    if m:
+        law_name = m.group(1).strip()
+        cat_hint = f"（{category}分野）" if category else ""
+        return f"{type_label}{law_name}の規定を改正し、{cat_hint}制度を見直す法案。"
+    m = re.search(r'(.+?)に関する法律案', name)
+    if m:
+        topic = m.group(1).strip()
+        return f"{type_label}{topic}について新たな法的枠組みを定める法案。"
+    m = re.search(r'(.+?)に関し講ずべき', name)
+    if m:
+        topic = m.group(1).strip()
+        return f"{type_label}{topic}に対処するため、政府が実施する措置を定める法案。"
+    m = re.search(r'(.+?)法案$', name)
+    if m:
+        topic = m.group(1).strip()
+        return f"{type_label}{topic}に関する法案。"
+    if "予算" in name:
+        return f"{type_label}国の予算案。国の歳入・歳出の計画を定める。"
+    if bill_type == "条約" or "条約" in name or "協定" in name:
+        return f"国際的な取り決め。国会の承認を経て締結される。"
+    if "決議" in name:
+        return f"国会としての意思を表明する決議案。法的拘束力はない。"
+    cat_hint = f"{category}に関する" if category else ""
+    return f"{type_label}{cat_hint}議案。"
+
+
+def make_corpus(count: int, unique: float, seed: int = 7) -> list[tuple[str, str, str | None]]:
+    """(bill_name, bill_type, category) を count 件。unique の割合だけ一度しか出ない名前を混ぜる"""
+    rng = random.Random(seed)
+    stems = datagen.LAW_STEMS + [" " + s for s in datagen.LAW_STEMS[:5]] + ["", "法"]
+    common = [
+        (rng.choice(SHAPES).format(stem=rng.choice(stems), stem2=rng.choice(stems), n=rng.randint(1, 7)),
+         rng.choice(datagen.BILL_TYPES), rng.choice(CATEGORY_NAMES))
+        for _ in range(max(1, count // 20))
+    ]
+    corpus = []
+    for i in range(count):
+        if rng.random() < unique:
+            name = rng.choice(SHAPES).format(stem=rng.choice(stems), stem2=rng.choice(stems), n=i)
+            corpus.append((name, rng.choice(datagen.BILL_TYPES), rng.choice(CATEGORY_NAMES)))
+        else:
+            corpus.append(rng.choice(common))
+    return corpus
+
+
+def timed(func, corpus) -> tuple[float, list[str]]:
+    started = time.perf_counter()
+    out = [func(*key) for key in corpus]
+    return time.perf_counter() - started, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="generate_summary のマイクロベンチマーク")
+    parser.add_argument("--names", type=int, default=100_000, help="議案名の件数 (デフォルト: 100000)")
+    parser.add_argument("--unique", type=float, default=0.1, help="一度しか出ない名前の割合 (デフォルト: 0.1)")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.names, args.unique)
+    distinct = len(set(corpus))
+    print(f"コーパス: {len(corpus)}件 (異なる組み合わせ {distinct}件)")
+
+    legacy_seconds, expected = timed(legacy_generate_summary, corpus)
+    categorize_bills.generate_summary.cache_clear()
+    cold_seconds, actual = timed(categorize_bills.generate_summary, corpus)
+    warm_seconds, _ = timed(categorize_bills.generate_summary, corpus)
+    nocache_seconds, uncached = timed(categorize_bills.generate_summary.__wrapped__, corpus)
+
+    mismatches = [(key, e, a) for key, e, a in zip(corpus, expected, actual) if e.encode() != a.encode()]
+    mismatches += [(key, e, a) for key, e, a in zip(corpus, expected, uncached) if e.encode() != a.encode()]
+    print(f"  従来（re.search × 最大4）: {legacy_seconds:.3f}秒 ({len(corpus) / legacy_seconds:,.0f}件/秒)")
+    print(f"  まとめたパターンのみ:      {nocache_seconds:.3f}秒 (×{legacy_seconds / nocache_seconds:.1f})")
+    print(f"  + LRU（初回）:             {cold_seconds:.3f}秒 (×{legacy_seconds / cold_seconds:.1f})")
+    print(f"  + LRU（2回目）:            {warm_seconds:.3f}秒 (×{legacy_seconds / warm_seconds:.1f})")
+    if mismatches:
+        for key, e, a in mismatches[:5]:
+            print(f"  ❌ {key!r}: {e!r} != {a!r}")
+        sys.exit(1)
+    print("  出力: 全件一致")
+
+
+if __name__ == "__main__":
+    main()
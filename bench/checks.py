@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+checks.py - 取り込みスクリプトの動作確認（レビューで見つかった不具合の再発防止）
+run_bench.py と同じスタンドイン（fake_postgrest.py）を立ててスクリプトを子プロセスで実行し、
+DB・アーカイブに残った結果を確かめる。速さではなく結果の正しさを見る。1つでも失敗すれば終了コード 1。
+
+使い方:
+  python bench/checks.py                               # 全部
+  python bench/checks.py --checks archive_cached_pages
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+
+import datagen
+from fake_postgrest import FakeServer
+from run_bench import REPO_DIR, script_env
+
+
+class CheckFailed(Exception):
+    pass
+
+
+def expect(condition: bool, message: str):
+    if not condition:
+        raise CheckFailed(message)
+
+
+class Runner:
+    """workdir を共有してスクリプトを何回か実行する（キャッシュ・アーカイブは実行をまたいで残る）"""
+
+    def __init__(self, server, workdir: str, python: str):
+        self.server = server
+        self.workdir = workdir
+        self.python = python
+
+    def run(self, script: str, *args, env: dict | None = None, allow_failure: bool = False) -> str:
+        proc = subprocess.run([self.python, os.path.join(REPO_DIR, script), *args], cwd=self.workdir,
+                              env={**script_env(self.server, self.workdir), **(env or {})},
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        if proc.returncode != 0 and not allow_failure:
+            raise CheckFailed(f"{script} {' '.join(args)}: 終了コード {proc.returncode}\n{proc.stdout[-2000:]}")
+        return proc.stdout
+
+
+# === チェック ===
+# check(runner) → 失敗なら CheckFailed
+
+def check_archive_cached_pages(runner: Runner):
+    """--archive はレスポンスキャッシュから返したページもアーカイブし、--replay で全件読み直せる"""
+    records, _ = datagen.speech_corpus(500)
+    runner.server.corpus.records = records
+    period = ["--from", "2000-01-01", "--until", "2099-12-31"]
+    runner.run("collect_daily.py", *period)  # キャッシュだけ作る（アーカイブしない）
+    runner.run("collect_daily.py", *period, "--archive")  # 全ページがキャッシュから返る
+    runner.run("collect_daily.py", *period, "--archive")
+
+    runner.server.db.reset()
+    runner.run("collect_daily.py", *period, "--replay", "--stream")
+    speeches = len(runner.server.db.rows("speeches"))
+    expect(speeches == len(records), f"--replay で書き込めた発言 {speeches}件（期待 {len(records)}件）")
+
+
+def check_same_party_near_homonyms(runner: Runner):
+    """
+    同じ会派で1文字違いの別人（DBの「佐藤一郎」によみがなく、発言者「佐東一郎」にはある）を同じ議員に寄せない。
+    よみが一致する1文字違い（「鈴木花子」と「鈴本花子」）は従来どおり寄せる。2回流して別名が残らないことも見る
+    """
+    party = "自由民主党"
+    runner.server.db.load("legislators", [
+        {"name": "佐藤一郎", "house": "衆議院", "current_party": party, "last_seen": "2000-01-01"},
+        {"name": "鈴木花子", "name_yomi": "すずきはなこ", "house": "衆議院", "current_party": party,
+         "last_seen": "2000-01-01"},
+    ])
+    records, _ = datagen.speech_corpus(40)
+    speakers = [("佐東一郎", "さとういちろう"), ("鈴本花子", "すずきはなこ")]
+    runner.server.corpus.records = [
+        {**r, "speaker": speakers[i % 2][0], "speakerYomi": speakers[i % 2][1], "speakerGroup": party}
+        for i, r in enumerate(records)
+    ]
+    for _ in range(2):
+        runner.run("collect_daily.py", "--from", "2000-01-01", "--until", "2099-12-31")
+
+    ids = {}
+    for row in runner.server.db.rows("legislators"):
+        ids.setdefault(row["name"], []).append(row["id"])
+    expect(len(ids.get("佐東一郎", [])) == 1, f"佐東一郎 が別の議員として1行で登録されていない: {ids}")
+    expect("鈴本花子" not in ids, f"鈴本花子 が 鈴木花子 に寄せられていない: {ids}")
+    linked = {}
+    for row in runner.server.db.rows("speeches"):
+        linked.setdefault(row["speaker_name"], set()).add(row.get("legislator_id"))
+    expect(linked.get("佐東一郎") == set(ids["佐東一郎"]), f"佐東一郎 の発言のリンク先: {linked.get('佐東一郎')}")
+    expect(linked.get("鈴本花子") == set(ids["鈴木花子"]), f"鈴本花子 の発言のリンク先: {linked.get('鈴本花子')}")
+
+
+def check_councillors_same_id(runner: Runner):
+    """CSVの2人（「山田　太郎」と、よみが同じ1文字違いの「山田　太朗」）が同じ既存議員に寄っても、upsert が通って1行になる"""
+    runner.server.db.load("legislators", [
+        {"name": "山田太郎", "name_yomi": "やまだたろう", "house": "衆議院", "last_seen": "2020-01-01"},
+    ])
+    data_dir = os.path.join(runner.workdir, "councillors")
+    datagen.write_councillors_data(data_dir, 10, 3)
+    datagen.write_csv(os.path.join(data_dir, "giin.csv"), ["議員氏名", "読み方", "会派", "役職等", "写真URL"], [
+        ["山田　太郎", "やまだ　たろう", datagen.KAIHA[0][0], "", ""],
+        ["山田　太朗", "やまだ　たろう", datagen.KAIHA[0][0], "", ""],
+        ["鈴木　花子", "すずき　はなこ", datagen.KAIHA[1][0], "", ""],
+    ])
+    runner.run("import_councillors.py", "--legs-only")
+
+    names = sorted(row["name"] for row in runner.server.db.rows("legislators"))
+    expect(names == ["山田太郎", "鈴木 花子"], f"legislators: {names}")
+
+
+def check_ambiguous_write_failures(runner: Runner):
+    """
+    書き込みが反映されたのに応答が返らなかったとき、upsert（meetings）は送り直して続け、
+    insert（新しい議員）は送り直さない（議員が重複しない）。再実行すれば残りも書き込める
+    """
+    records, _ = datagen.speech_corpus(200)
+    runner.server.corpus.records = records
+    period = ["--from", "2000-01-01", "--until", "2099-12-31"]
+    runner.server.drop_writes = {"meetings", "legislators"}
+    runner.run("collect_daily.py", *period, allow_failure=True)
+    expect(not runner.server.drop_writes, f"切断していない書き込み: {runner.server.drop_writes}")
+    runner.run("collect_daily.py", *period)
+
+    names = [row["name"] for row in runner.server.db.rows("legislators")]
+    duplicated = sorted({n for n in names if names.count(n) > 1})
+    expect(not duplicated, f"重複して登録された議員: {duplicated}")
+    speeches = runner.server.db.rows("speeches")
+    expect(len(speeches) == len(records), f"発言 {len(speeches)}件（期待 {len(records)}件）")
+    unlinked = sum(1 for r in speeches if r.get("legislator_id") is None)
+    expect(not unlinked, f"議員にリンクされていない発言 {unlinked}件")
+
+
+def check_recent_shards_recollected(runner: Runner):
+    """
+    --shard の完了済みシャードでも、直近 IMMUTABLE_DAYS 日のものは次の実行で取り直し、あとから公開された発言を拾う。
+    60日前のシャードは完了のまま飛ばし、--reset-checkpoint で取り直す
+    （60日前の期間はレスポンスキャッシュでも変わらない扱いなので、取り直すときは --no-cache も付ける）
+    """
+    today = datetime.now().date()
+    old, recent = (today - timedelta(days=60)).isoformat(), (today - timedelta(days=2)).isoformat()
+    records, _ = datagen.speech_corpus(40)
+    runner.server.corpus.records = [{**r, "date": old if i < 20 else recent} for i, r in enumerate(records)]
+    period = ["--from", (today - timedelta(days=63)).isoformat(), "--until", today.isoformat(), "--shard", "week"]
+    env = {"KOKKAI_CACHE_TTL": "0"}  # 翌日の実行のつもりで、キャッシュは確認してから使う
+    runner.run("collect_daily.py", *period, env=env)
+
+    late = [{**r, "speechID": f"{r['speechID']}-late"} for r in runner.server.corpus.records]
+    runner.server.corpus.records = sorted(runner.server.corpus.records + late, key=lambda r: r["date"])
+
+    def written(date: str) -> int:
+        return sum(1 for s in runner.server.db.rows("speeches") if s["date"] == date)
+
+    runner.run("collect_daily.py", *period, env=env)
+    expect(written(recent) == 40, f"直近のシャード: 発言 {written(recent)}件（期待 40件）")
+    expect(written(old) == 20, f"60日前のシャード: 発言 {written(old)}件（完了済みなので 20件のはず）")
+    runner.run("collect_daily.py", *period, "--reset-checkpoint", "--no-cache", env=env)
+    expect(written(old) == 40, f"--reset-checkpoint 後の60日前のシャード: 発言 {written(old)}件（期待 40件）")
+
+
+def check_link_scoped_to_run(runner: Runner):
+    """
+    通常の実行は、その実行の発言者の未リンク発言だけをリンクし、前からある未リンク発言には触れない。
+    同じ期間をもう一度流したときは、リンク済みなので UPDATE を送らない。
+    前からある未リンク発言は --link-all でリンクし、議員の見つからない発言者は未解決として数える
+    """
+    runner.server.db.load("legislators", [
+        {"name": "佐藤一郎", "house": "衆議院", "last_seen": "2000-01-01"},
+    ])
+    runner.server.db.load("speeches", [
+        {"speech_id": "old-1", "speaker_name": "佐藤一郎", "date": "2000-01-01"},
+        {"speech_id": "old-2", "speaker_name": "名無し", "date": "2000-01-01"},
+    ])
+    records, _ = datagen.speech_corpus(100)
+    runner.server.corpus.records = records
+    period = ["--from", "2000-01-01", "--until", "2099-12-31"]
+    runner.run("collect_daily.py", *period)
+
+    def unlinked() -> list[str]:
+        return sorted(r["speech_id"] for r in runner.server.db.rows("speeches") if r.get("legislator_id") is None)
+
+    expect(unlinked() == ["old-1", "old-2"], f"リンクされていない発言: {unlinked()[:10]}")
+    runner.server.stats.reset()
+    runner.run("collect_daily.py", *period)
+    patches = runner.server.stats.snapshot()["requests"].get("PATCH speeches", 0)
+    expect(not patches, f"2回目の実行の UPDATE {patches}回（期待 0回）")
+
+    output = runner.run("collect_daily.py", "--link-all")
+    expect(unlinked() == ["old-2"], f"--link-all 後にリンクされていない発言: {unlinked()[:10]}")
+    expect("議員が見つからない 1名" in output, f"--link-all の出力:\n{output[-1000:]}")
+
+
+CHECKS = {
+    "archive_cached_pages": check_archive_cached_pages,
+    "same_party_near_homonyms": check_same_party_near_homonyms,
+    "councillors_same_id": check_councillors_same_id,
+    "ambiguous_write_failures": check_ambiguous_write_failures,
+    "recent_shards_recollected": check_recent_shards_recollected,
+    "link_scoped_to_run": check_link_scoped_to_run,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="取り込みスクリプトの動作確認")
+    parser.add_argument("--checks", default=",".join(CHECKS), help=f"実行するチェック（カンマ区切り: {', '.join(CHECKS)}）")
+    parser.add_argument("--python", default=sys.executable, help="スクリプトを実行する Python")
+    args = parser.parse_args()
+
+    names = [n for n in args.checks.split(",") if n]
+    unknown = [n for n in names if n not in CHECKS]
+    if unknown:
+        print(f"ERROR: 不明なチェック: {', '.join(unknown)}", file=sys.stderr)
+        sys.exit(2)
+
+    server = FakeServer().start()
+    failed = []
+    try:
+        for name in names:
+            server.reset()
+            workdir = tempfile.mkdtemp(prefix=f"check-{name}-")
+            try:
+                CHECKS[name](Runner(server, workdir, args.python))
+                print(f"  ✅ {name}")
+            except CheckFailed as e:
+                print(f"  ❌ {name}: {e}")
+                failed.append(name)
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        server.stop()
+
+    print(f"結果: {len(names) - len(failed)}/{len(names)} 件成功")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
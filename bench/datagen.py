@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+datagen.py - ベンチマーク用データの生成と、国会会議録APIレスポンスの録画
+乱数は seed 固定なので、同じ規模なら毎回同じデータになる。
+
+使い方:
+  python bench/datagen.py csv --rows 10000 --out /tmp/bench-data     # gian.csv / giin.csv 等を生成
+  python bench/datagen.py record --from 2025-01-20 --until 2025-01-24  # 本物のAPIを録画（要ネットワーク）
+
+録画したページは bench/fixtures/kokkai/ に保存され、run_bench.py はそれを優先して使う
+（件数が足りなければ ID をずらして複製する）。録画がなければ合成レコードを使う。
+"""
+
+import os
+import csv
+import json
+import glob
+import time
+import random
+import argparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "kokkai")
+KOKKAI_API = "https://kokkai.ndl.go.jp/api/speech"
+
+PARTIES = [
+    "自由民主党", "立憲民主党・無所属", "日本維新の会", "公明党", "国民民主党・無所属クラブ",
+    "日本共産党", "れいわ新選組", "参政党", "社会民主党", "有志の会",
+]
+KAIHA = [
+    ("自民", "自由民主党"), ("立憲", "立憲民主・社民・無所属"), ("公明", "公明党"),
+    ("維新", "日本維新の会"), ("民主", "国民民主党・新緑風会"), ("共産", "日本共産党"),
+    ("れ新", "れいわ新選組"), ("参政", "参政党"), ("無", "各派に属しない議員"),
+]
+MEETINGS = ["本会議", "予算委員会", "厚生労働委員会", "文部科学委員会", "法務委員会", "財務金融委員会"]
+POSITIONS = ["", "", "", "委員長", "国務大臣", "政府参考人", "大臣官房審議官"]
+BILL_TYPES = ["閣法", "衆法", "参法", "予算", "条約", "承認", "決議"]
+SAN_KINDS = ["法律案（内閣提出）", "法律案（衆法）", "法律案（参法）", "予算", "条約", "承認", "決議案"]
+LAW_STEMS = [
+    "所得税法", "地方税法", "健康保険法", "介護保険法", "国民年金法", "学校教育法", "児童福祉法",
+    "労働基準法", "最低賃金法", "電気事業法", "原子力規制委員会設置法", "自衛隊法", "関税定率法",
+    "農地法", "漁業法", "道路交通法", "個人情報の保護に関する法律", "公職選挙法", "刑法", "民法",
+]
+RESULTS = ["可決", "修正", "否決", "承認", "撤回", ""]
+COMMITTEES = ["内閣", "総務", "法務", "外務", "財務金融", "文部科学", "厚生労働", "農林水産", "経済産業"]
+SURNAMES = "佐藤鈴木高橋田中伊藤渡辺山本中村小林加藤吉田山田佐々木山口松本井上木村林斎藤清水"
+GIVEN = "太郎花子一郎健太美咲翔大輔由美直樹陽子誠優子拓也真理浩二"
+
+
+def make_name(rng: random.Random, i: int) -> str:
+    """重複しない議員名（姓2字 + 名2字 + 通し番号）"""
+    s = rng.randrange(0, len(SURNAMES) - 1, 2)
+    g = rng.randrange(0, len(GIVEN) - 1, 2)
+    return f"{SURNAMES[s:s + 2]}{GIVEN[g:g + 2]}{i}"
+
+
+def era_date(rng: random.Random) -> str:
+    """'令和5年 3月19日' 形式"""
+    return f"令和{rng.randint(1, 7)}年{rng.randint(1, 12):2d}月{rng.randint(1, 28)}日"
+
+
+def bill_name(rng: random.Random, i: int) -> str:
+    stem = rng.choice(LAW_STEMS)
+    if rng.random() < 0.3:
+        stem += "及び" + rng.choice(LAW_STEMS)
+    return f"{stem}の一部を改正する法律案（第{i}号）"
+
+
+def party_list(rng: random.Random, parties: list[str]) -> str:
+    return ";".join(rng.sample(parties, rng.randint(0, 4)))
+
+
+def vote_lists(rng: random.Random, parties: list[str]) -> list[str]:
+    """[賛成会派, 反対会派]。1つの会派はどちらか一方にだけ入る（bill_votes の一意キーは会派・院ごと）"""
+    yes = party_list(rng, parties)
+    return [yes, party_list(rng, [p for p in parties if p not in yes.split(";")])]
+
+
+# === 国会会議録API ===
+
+def synthetic_speeches(count: int, seed: int = 1, start_date: str = "2024-01-01") -> list[dict]:
+    """speechRecord 形式の合成レコード。1会議あたり約50発言、日付昇順"""
+    rng = random.Random(seed)
+    speakers = [(make_name(rng, i), rng.choice(PARTIES)) for i in range(max(10, count // 40))]
+    year, month, day = (int(x) for x in start_date.split("-"))
+    records = []
+    issue = 0
+    order = 0
+    for i in range(count):
+        if i == 0 or rng.random() < 0.02:
+            issue += 1
+            order = 0
+            day += 1
+            if day > 28:
+                day, month = 1, month + 1
+            if month > 12:
+                month, year = 1, year + 1
+            meeting = rng.choice(MEETINGS)
+            house = rng.choice(["衆議院", "参議院"])
+        order += 1
+        name, group = rng.choice(speakers)
+        issue_id = f"B{year % 100:02d}{issue:08d}"
+        records.append({
+            "speechID": f"{issue_id}_{order:03d}",
+            "issueID": issue_id,
+            "imageKind": "会議録",
+            "searchObject": order,
+            "session": 213,
+            "nameOfHouse": house,
+            "nameOfMeeting": meeting,
+            "issue": f"第{issue % 30 + 1}号",
+            "date": f"{year:04d}-{month:02d}-{day:02d}",
+            "closing": None,
+            "speechOrder": order,
+            "speaker": name,
+            "speakerYomi": None,
+            "speakerGroup": group,
+            "speakerPosition": rng.choice(POSITIONS),
+            "speakerRole": None,
+            "speech": f"○{name}君　" + "本法律案の趣旨について御説明申し上げます。" * rng.randint(1, 20),
+            "startPage": 1,
+            "speechURL": f"https://kokkai.ndl.go.jp/txt/{issue_id}/{order}",
+            "meetingURL": f"https://kokkai.ndl.go.jp/txt/{issue_id}/0",
+            "pdfURL": None,
+        })
+    return records
+
+
+def load_fixture_speeches() -> list[dict]:
+    """録画済みページの speechRecord を日付・発言順に並べて返す（なければ空）"""
+    records = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        page = data.get("speechRecord", [])
+        for r in ([page] if isinstance(page, dict) else page):
+            records[r["speechID"]] = r
+    return sorted(records.values(), key=lambda r: (r.get("date", ""), r.get("speechID", "")))
+
+
+def speech_corpus(count: int, seed: int = 1) -> tuple[list[dict], str]:
+    """count 件の発言レコードと、その出所（"fixtures" / "synthetic"）"""
+    recorded = load_fixture_speeches()
+    if not recorded:
+        return synthetic_speeches(count, seed), "synthetic"
+
+    # 録画分を複製して件数を合わせる。ID は周回ごとにずらす
+    records = []
+    for i in range(count):
+        lap, r = divmod(i, len(recorded))
+        r = dict(recorded[r])
+        if lap:
+            r["issueID"] = f"{r['issueID']}x{lap}"
+            r["speechID"] = f"{r['speechID']}x{lap}"
+        records.append(r)
+    records.sort(key=lambda r: r.get("date", ""))
+    return records, "fixtures"
+
+
+def record_fixtures(from_date: str, until_date: str, max_pages: int = 10, interval: float = 3.0):
+    """本物のAPIからページを取得して FIXTURES_DIR に保存"""
+    import requests
+
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    start = 1
+    for page in range(max_pages):
+        resp = requests.get(KOKKAI_API, params={
+            "from": from_date, "until": until_date, "recordPacking": "json",
+            "maximumRecords": 100, "startRecord": start,
+        }, timeout=60)
+        resp.raise_for_status()
+        data = resp.json()
+        path = os.path.join(FIXTURES_DIR, f"{from_date}_{until_date}_{start:06d}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        print(f"  保存: {path} ({data.get('numberOfReturn', 0)}件)")
+        start = data.get("nextRecordPosition")
+        if not start:
+            break
+        time.sleep(interval)
+
+
+# === CSV ===
+
+def write_csv(path: str, header: list[str], rows: list[list]):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def write_shu_gian(path: str, count: int, seed: int = 2):
+    """衆議院 gian.csv。約5%は別回次の同一議案（重複除去の対象）"""
+    rng = random.Random(seed)
+    header = [
+        "掲載回次", "提出回次", "番号", "議案件名", "議案種類", "キャプション", "審議状況",
+        "議案提出者", "議案提出会派", "衆議院審議終了年月日／衆議院審議結果",
+        "衆議院付託年月日／衆議院付託委員会", "衆議院議案受理年月日",
+        "衆議院審議時賛成会派", "衆議院審議時反対会派", "公布年月日／法律番号", "経過情報URL",
+    ]
+    rows = []
+    for i in range(count):
+        n = rng.randrange(i) if i and rng.random() < 0.05 else i
+        submit = 150 + n // 1000
+        rows.append([
+            submit + rng.randint(0, 2), submit, n % 1000 + 1, bill_name(rng, n), BILL_TYPES[n % len(BILL_TYPES)],
+            "", rng.choice(["成立", "審議中", "未了", "撤回"]), "内閣" if n % 3 == 0 else make_name(rng, n),
+            rng.choice(PARTIES), f"{era_date(rng)}／{rng.choice(RESULTS)}",
+            f"{era_date(rng)}／{rng.choice(COMMITTEES)}", era_date(rng),
+            *vote_lists(rng, PARTIES), "",
+            f"https://www.shugiin.go.jp/keika/{submit}_{n}.htm",
+        ])
+    write_csv(path, header, rows)
+
+
+def write_san_gian(path: str, count: int, seed: int = 3):
+    """参議院 gian.csv（import_bills.py 用。カラム名は衆議院と揺れる）"""
+    rng = random.Random(seed)
+    header = [
+        "掲載回次", "提出回次", "番号", "議案件名", "種類", "審議状況",
+        "参議院審議終了年月日／参議院審議結果", "参議院付託年月日／参議院付託委員会",
+        "参議院予備付託年月日／参議院予備付託委員会", "参議院議案受理年月日",
+        "参議院本会議賛成会派", "参議院本会議反対会派", "経過情報URL",
+    ]
+    rows = []
+    for i in range(count):
+        n = rng.randrange(i) if i and rng.random() < 0.05 else i
+        submit = 150 + n // 1000
+        rows.append([
+            submit + rng.randint(0, 2), submit, n % 1000 + 1, bill_name(rng, n), BILL_TYPES[n % len(BILL_TYPES)],
+            rng.choice(["成立", "審議中", "未了"]), f"{era_date(rng)}／{rng.choice(RESULTS)}",
+            f"{era_date(rng)}／{rng.choice(COMMITTEES)}", "", era_date(rng),
+            *vote_lists(rng, PARTIES),
+            f"https://www.sangiin.go.jp/japanese/joho1/kousei/gian/{submit}/meisai/m{n}.htm",
+        ])
+    write_csv(path, header, rows)
+
+
+def write_councillors_data(data_dir: str, bills: int, members: int, seed: int = 4):
+    """import_councillors.py 用の kaiha.csv / giin.csv / gian.csv"""
+    rng = random.Random(seed)
+    os.makedirs(data_dir, exist_ok=True)
+    write_csv(os.path.join(data_dir, "kaiha.csv"), ["会派名", "略称"], [[full, abbrev] for abbrev, full in KAIHA])
+    write_csv(os.path.join(data_dir, "giin.csv"), ["議員氏名", "読み方", "会派", "役職等", "写真URL"], [
+        [f"{name[:2]}　{name[2:]}", "さとう　たろう", rng.choice(KAIHA)[0],
+         rng.choice(["", "", "委員長"]), f"https://www.sangiin.go.jp/photo/{i}.jpg"]
+        for i, name in ((i, make_name(rng, i)) for i in range(members))
+    ])
+    header = [
+        "審議回次", "提出回次", "提出番号", "種類", "件名", "議案URL",
+        "議案審議情報一覧 - 提出日", "議案審議情報一覧 - 提出者", "議案審議情報一覧 - 提出者区分",
+        "議案審議情報一覧 - 発議者", "参議院委員会等経過情報 - 付託委員会等",
+        "参議院委員会等経過情報 - 議決・継続結果", "参議院本会議経過情報 - 議決日",
+        "参議院本会議経過情報 - 議決", "参議院本会議経過情報 - 採決態様", "参議院本会議経過情報 - 投票結果",
+        "衆議院本会議経過情報 - 議決", "その他の情報 - 法律番号",
+    ]
+    rows = []
+    for i in range(bills):
+        session = 150 + i // 500
+        kind = SAN_KINDS[i % len(SAN_KINDS)] + ("（表）" if rng.random() < 0.02 else "")
+        rows.append([
+            session, session, i % 500 + 1, kind, bill_name(rng, i),
+            f"https://www.sangiin.go.jp/japanese/joho1/kousei/gian/{session}/meisai/m{i}.htm",
+            "2024-02-01", "内閣" if "内閣" in kind else "", "", make_name(rng, i) if "参法" in kind else "",
+            rng.choice(COMMITTEES), rng.choice(["可決", "継続", ""]), "2024-06-01",
+            rng.choice(["可決", "否決", "承認", ""]), rng.choice(["起立採決", "押しボタン", ""]), "",
+            rng.choice(["可決", ""]), "",
+        ])
+    write_csv(os.path.join(data_dir, "gian.csv"), header, rows)
+
+
+def synthetic_bills(count: int, seed: int = 5) -> list[dict]:
+    """categorize_bills.py 用の bills 行"""
+    rng = random.Random(seed)
+    return [{
+        "id": i + 1,
+        "house": rng.choice(["衆議院", "参議院"]),
+        "submit_session": 150 + i // 1000,
+        "bill_type": BILL_TYPES[i % len(BILL_TYPES)],
+        "bill_number": i % 1000 + 1,
+        "bill_name": bill_name(rng, i),
+        "category": None,
+        "category_sub": None,
+        "summary_template": None,
+        "affected_groups": None,
+    } for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ベンチマーク用データ生成")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("csv", help="gian.csv / giin.csv 等を生成")
+    p.add_argument("--rows", type=int, default=10000, help="議案の行数 (デフォルト: 10000)")
+    p.add_argument("--out", required=True, help="出力ディレクトリ")
+    p = sub.add_parser("record", help="国会会議録APIのレスポンスを録画")
+    p.add_argument("--from", dest="from_date", required=True, help="開始日 (YYYY-MM-DD)")
+    p.add_argument("--until", dest="until_date", required=True, help="終了日 (YYYY-MM-DD)")
+    p.add_argument("--pages", type=int, default=10, help="最大ページ数 (デフォルト: 10)")
+    args = parser.parse_args()
+
+    if args.command == "csv":
+        os.makedirs(args.out, exist_ok=True)
+        write_shu_gian(os.path.join(args.out, "shu_gian.csv"), args.rows)
+        write_san_gian(os.path.join(args.out, "san_gian.csv"), args.rows)
+        write_councillors_data(os.path.join(args.out, "councillors"), args.rows, max(10, args.rows // 40))
+        print(f"生成: {args.out} ({args.rows}行)")
+    else:
+        record_fixtures(args.from_date, args.until_date, args.pages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+fake_postgrest.py - ベンチマーク用の Supabase(PostgREST) / 国会会議録API スタンドイン
+取り込みスクリプトが使う範囲だけをインメモリで実装し、リクエスト数・送受信バイト数を数える。
+
+実装している範囲:
+  GET    /rest/v1/<table>   select / eq・neq・gt・gte・lt・lte・in・is / order / limit・offset
+  POST   /rest/v1/<table>   insert, upsert (on_conflict, merge-duplicates / ignore-duplicates)
+                            merge-duplicates で同じキーの行が1回に2行あれば Postgres と同じく 21000 で全体を拒否
+  PATCH  /rest/v1/<table>   フィルタ付き update（Prefer: count=exact なら Content-Range を返す）
+  GET    /api/speech        国会会議録API 発言単位出力（startRecord / maximumRecords / from / until）
+  GET    /api/meeting       国会会議録API 会議単位出力（同上。1レコード = 発言を含む1会議）
+  GET    /__bench/stats     カウンタ取得
+  POST   /__bench/reset     データとカウンタを消去
+
+--fail-rate で書き込みの一部を 503、--max-body-bytes で大きすぎるボディを 413 にできる（再送・分割の確認用）。
+drop_writes に入れたテーブルは、次の書き込みを反映してから応答せずに切断する（届いたか分からない失敗の確認用、1回ずつ）。
+
+単体で起動:
+  python bench/fake_postgrest.py --port 54321
+"""
+
+import csv
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+class CardinalityViolation(Exception):
+    """ON CONFLICT DO UPDATE で同じ行を2回更新しようとした（Postgres の 21000）"""
+
+
+def _sort_key(value):
+    """型が混在する列（int の id と uuid 文字列など）でも並べられるキー"""
+    if value is None:
+        return (2, "")
+    if isinstance(value, bool):
+        return (0, int(value))
+    if isinstance(value, (int, float)):
+        return (0, value)
+    return (1, str(value))
+
+
+def _coerce(row_value, text: str):
+    """フィルタ値（文字列）を行の値の型に合わせる"""
+    if isinstance(row_value, bool):
+        return text == "true"
+    if isinstance(row_value, int):
+        try:
+            return int(text)
+        except ValueError:
+            return text
+    if isinstance(row_value, float):
+        return float(text)
+    return text
+
+
+def _parse_in(text: str) -> list[str]:
+    """in.(a,b,"c,d") → ["a", "b", "c,d"]"""
+    return next(csv.reader([text[1:-1]], quotechar='"', skipinitialspace=True), [])
+
+
+def make_filter(column: str, expr: str):
+    """PostgREST のフィルタ式 → row を受けて bool を返す関数"""
+    negate = expr.startswith("not.")
+    if negate:
+        expr = expr[4:]
+    op, _, arg = expr.partition(".")
+
+    if op == "is":
+        want = {"null": None, "true": True, "false": False}[arg]
+        test = lambda row: row.get(column) is want
+    elif op == "in":
+        values = set(_parse_in(arg))
+        test = lambda row: row.get(column) is not None and str(row[column]) in values
+    elif op in ("eq", "neq", "gt", "gte", "lt", "lte"):
+        compare = {
+            "eq": lambda a, b: a == b, "neq": lambda a, b: a != b,
+            "gt": lambda a, b: a > b, "gte": lambda a, b: a >= b,
+            "lt": lambda a, b: a < b, "lte": lambda a, b: a <= b,
+        }[op]
+
+        def test(row):
+            value = row.get(column)
+            if value is None:
+                return False
+            target = _coerce(value, arg)
+            if type(value) is not type(target):
+                value, target = str(value), str(target)
+            return compare(value, target)
+    else:
+        raise ValueError(f"未対応のフィルタ: {column}={expr}")
+
+    return (lambda row: not test(row)) if negate else test
+
+
+class Database:
+    """テーブル名 → 行リストのインメモリDB。id は未指定なら連番を振る"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.tables: dict[str, list[dict]] = {}
+        self.next_id: dict[str, int] = {}
+        self.indexes: dict[tuple, dict] = {}  # (table, columns) → {key: row}
+
+    def rows(self, table: str) -> list[dict]:
+        return self.tables.setdefault(table, [])
+
+    def load(self, table: str, rows: list[dict]):
+        """ベンチの前準備として行を直接入れる"""
+        with self.lock:
+            for row in rows:
+                self._insert(table, dict(row))
+
+    def _insert(self, table: str, row: dict) -> dict:
+        if row.get("id") is None:
+            self.next_id[table] = self.next_id.get(table, 0) + 1
+            row["id"] = self.next_id[table]
+        elif isinstance(row["id"], int):
+            self.next_id[table] = max(self.next_id.get(table, 0), row["id"])
+        self.rows(table).append(row)
+        for (t, columns), index in self.indexes.items():
+            if t == table:
+                key = tuple(row.get(c) for c in columns)
+                if None not in key:
+                    index.setdefault(key, row)
+        return row
+
+    def _index(self, table: str, columns: tuple) -> dict:
+        """一意制約の代わり。NULL を含むキーは衝突しない（Postgres と同じ）"""
+        index = self.indexes.get((table, columns))
+        if index is None:
+            index = {}
+            for row in self.rows(table):
+                key = tuple(row.get(c) for c in columns)
+                if None not in key:
+                    index.setdefault(key, row)
+            self.indexes[(table, columns)] = index
+        return index
+
+    def _touch(self, table: str, changed):
+        """更新された列を含むインデックスを捨てる（次回使うときに作り直す）"""
+        for key in [k for k in self.indexes if k[0] == table and set(k[1]) & set(changed)]:
+            del self.indexes[key]
+
+    def select(self, table: str, filters: list, order: list, offset: int, limit: int | None) -> list[dict]:
+        with self.lock:
+            rows = [r for r in self.rows(table) if all(f(r) for f in filters)]
+        for column, desc in reversed(order):
+            rows.sort(key=lambda r: _sort_key(r.get(column)), reverse=desc)
+        end = None if limit is None else offset + limit
+        return rows[offset:end]
+
+    def write(self, table: str, payload: list[dict], on_conflict: tuple | None,
+              ignore_duplicates: bool, columns: list[str] | None) -> list[dict]:
+        """insert / upsert。返すのは挿入・更新された行"""
+        written = []
+        if on_conflict and not ignore_duplicates:
+            keys = [tuple(row.get(c) for c in on_conflict) for row in payload]
+            keys = [k for k in keys if None not in k]
+            if len(set(keys)) < len(keys):
+                raise CardinalityViolation("ON CONFLICT DO UPDATE command cannot affect row a second time")
+        with self.lock:
+            index = self._index(table, on_conflict) if on_conflict else None
+            for item in payload:
+                row = dict(item)
+                for c in columns or ():
+                    row.setdefault(c, None)
+                existing = None
+                if index is not None:
+                    key = tuple(row.get(c) for c in on_conflict)
+                    if None not in key:
+                        existing = index.get(key)
+                if existing is None:
+                    written.append(self._insert(table, row))
+                elif not ignore_duplicates:
+                    self._touch(table, [c for c in row if c not in on_conflict and existing.get(c) != row[c]])
+                    existing.update(row)
+                    written.append(existing)
+        return written
+
+    def update(self, table: str, filters: list, values: dict) -> list[dict]:
+        with self.lock:
+            matched = [r for r in self.rows(table) if all(f(r) for f in filters)]
+            self._touch(table, values)
+            for row in matched:
+                row.update(values)
+        return matched
+
+
+class Stats:
+    """エンドポイントごとのリクエスト数・送受信バイト数"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests: dict[str, int] = {}
+        self.bytes_in = 0  # クライアント → サーバー（リクエスト行・ヘッダー・ボディ）
+        self.bytes_out = 0  # サーバー → クライアント（ボディのみ）
+        self.server_seconds = 0.0
+
+    def add(self, key: str, bytes_in: int, bytes_out: int, seconds: float):
+        with self.lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.server_seconds += seconds
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "requests": dict(sorted(self.requests.items())),
+                "round_trips": sum(self.requests.values()),
+                "bytes_sent": self.bytes_in,
+                "bytes_received": self.bytes_out,
+                "server_seconds": round(self.server_seconds, 3),
+            }
+
+
+# 会議単位出力で会議の側に置かれる項目（それ以外は各発言の側）
+MEETING_FIELDS = ("issueID", "imageKind", "searchObject", "session", "nameOfHouse", "nameOfMeeting",
+                  "issue", "date", "closing", "meetingURL", "pdfURL")
+
+
+class SpeechCorpus:
+    """国会会議録APIのページングを再現する。records は date 昇順"""
+
+    def __init__(self, records: list[dict] | None = None):
+        self.records = records or []
+
+    def meetings(self, records: list[dict]) -> list[dict]:
+        """発言レコード → 会議単位出力の meetingRecord（会議の項目 + speechRecord）"""
+        by_issue = {}
+        for r in records:
+            meeting = by_issue.get(r.get("issueID"))
+            if meeting is None:
+                meeting = by_issue[r.get("issueID")] = {k: r[k] for k in MEETING_FIELDS if k in r}
+                meeting["speechRecord"] = []
+            meeting["speechRecord"].append({k: v for k, v in r.items() if k not in MEETING_FIELDS})
+        return list(by_issue.values())
+
+    def page(self, params: dict, meeting: bool = False) -> dict:
+        start = int(params.get("startRecord", 1))
+        maximum = int(params.get("maximumRecords", 10 if meeting else 100))
+        from_date = params.get("from", "0000-00-00")
+        until_date = params.get("until", "9999-99-99")
+        matched = [r for r in self.records if from_date <= r.get("date", "") <= until_date]
+        if meeting:
+            matched = self.meetings(matched)
+        chunk = matched[start - 1:start - 1 + maximum]
+        data = {
+            "numberOfRecords": len(matched),
+            "numberOfReturn": len(chunk),
+            "startRecord": start,
+            "meetingRecord" if meeting else "speechRecord": chunk,
+        }
+        if start - 1 + len(chunk) < len(matched):
+            data["nextRecordPosition"] = start + len(chunk)
+        return data
+
+
+class FakeServer:
+    """ThreadingHTTPServer をバックグラウンドスレッドで動かす"""
+
+    def __init__(self, port: int = 0, latency_ms: float = 0.0, fail_rate: float = 0.0, max_body_bytes: int = 0):
+        self.db = Database()
+        self.stats = Stats()
+        self.corpus = SpeechCorpus()
+        self.latency = latency_ms / 1000
+        self.fail_rate = fail_rate  # 書き込みを 503 で失敗させる割合（再送の確認用）
+        self.max_body_bytes = max_body_bytes  # これより大きいボディは 413（バッチ分割の確認用, 0 なら無制限）
+        self.drop_writes: set[str] = set()  # 書き込みを反映したあと応答せずに切断するテーブル（1回で外れる）
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(self))
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset(self):
+        self.db.reset()
+        self.stats.reset()
+        self.corpus = SpeechCorpus()
+        self.drop_writes = set()
+
+
+def _make_handler(server: FakeServer):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive（本番と同じく接続を使い回させる）
+
+        def log_message(self, format, *args):
+            pass
+
+        def _body(self) -> bytes:
+            length = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(length) if length else b""
+
+        def _send(self, status: int, body=None, headers: dict | None = None) -> int:
+            if isinstance(body, bytes):  # プロキシが返すような JSON でないエラー
+                data, content_type = body, "text/html"
+            else:
+                data = b"" if body is None else json.dumps(body, ensure_ascii=False).encode()
+                content_type = "application/json; charset=utf-8"
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+            return len(data)
+
+        def _handle(self, method: str):
+            started = time.perf_counter()
+            body = self._body()
+            request_bytes = len(self.requestline) + len(str(self.headers)) + len(body)
+            parts = urlsplit(self.path)
+            params = parse_qsl(parts.query, keep_blank_values=True)
+            if server.latency:
+                time.sleep(server.latency)
+
+            table = parts.path[len("/rest/v1/"):] if parts.path.startswith("/rest/v1/") else None
+            try:
+                key, status, payload, headers = self._route(method, parts.path, params, body)
+                if method != "GET" and table in server.drop_writes and status < 400:
+                    server.drop_writes.discard(table)
+                    server.stats.add(f"{key} dropped", request_bytes, 0, time.perf_counter() - started)
+                    self.close_connection = True
+                    return
+            except (ValueError, KeyError) as e:
+                key, status, payload, headers = f"{method} error", 400, {"message": str(e)}, None
+            except CardinalityViolation as e:
+                key, status, payload, headers = f"{method} error", 500, {
+                    "code": "21000", "message": str(e), "details": None,
+                    "hint": "Ensure that no rows proposed for insertion within the same command have duplicate "
+                            "constrained values."}, None
+            sent = self._send(status, payload, headers)
+            if not parts.path.startswith("/__bench/"):
+                server.stats.add(key, request_bytes, sent, time.perf_counter() - started)
+
+        def _route(self, method: str, path: str, params: list, body: bytes):
+            if path == "/__bench/stats":
+                return "", 200, server.stats.snapshot(), None
+            if path == "/__bench/reset":
+                server.reset()
+                return "", 200, {}, None
+            if path == "/api/speech":
+                return "GET kokkai", 200, server.corpus.page(dict(params)), None
+            if path == "/api/meeting":
+                return "GET kokkai meeting", 200, server.corpus.page(dict(params), meeting=True), None
+            if not path.startswith("/rest/v1/"):
+                return f"{method} unknown", 404, {"message": path}, None
+
+            table = path[len("/rest/v1/"):]
+            key = f"{method} {table}"
+            if server.max_body_bytes and len(body) > server.max_body_bytes:
+                return f"{key} 413", 413, b"<html><body>413 Request Entity Too Large</body></html>", None
+            if method != "GET" and random.random() < server.fail_rate:
+                return f"{key} 503", 503, {"code": "PGRST003", "message": "Timed out acquiring connection",
+                                           "hint": None, "details": None}, None
+            prefer = self.headers.get("Prefer", "")
+            representation = "return=minimal" not in prefer
+            count_exact = "count=exact" in prefer
+            options = {k: v for k, v in params if k in RESERVED_PARAMS}
+            filters = [make_filter(k, v) for k, v in params if k not in RESERVED_PARAMS]
+            select = [c for c in options.get("select", "*").split(",") if c]
+
+            def project(rows):
+                if select == ["*"]:
+                    return [dict(r) for r in rows]
+                return [{c: r.get(c) for c in select} for r in rows]
+
+            def count_header(n):
+                return {"Content-Range": f"0-{n - 1}/{n}" if n else "*/0"} if count_exact else None
+
+            if method == "GET":
+                order = []
+                for term in filter(None, options.get("order", "").split(",")):
+                    column, _, direction = term.partition(".")
+                    order.append((column, direction.startswith("desc")))
+                limit = int(options["limit"]) if "limit" in options else None
+                rows = server.db.select(table, filters, order, int(options.get("offset", 0)), limit)
+                return key, 200, project(rows), count_header(len(rows))
+
+            if method == "POST":
+                payload = json.loads(body or b"[]")
+                if isinstance(payload, dict):
+                    payload = [payload]
+                on_conflict = tuple(options["on_conflict"].split(",")) if "on_conflict" in options else None
+                if on_conflict is None and "resolution=" in prefer:
+                    on_conflict = ("id",)
+                columns = options["columns"].replace('"', "").split(",") if "columns" in options else None
+                rows = server.db.write(table, payload, on_conflict,
+                                       "resolution=ignore-duplicates" in prefer, columns)
+                return key, 201, project(rows) if representation else None, count_header(len(rows))
+
+            if method == "PATCH":
+                rows = server.db.update(table, filters, json.loads(body or b"{}"))
+                status = 200 if representation else 204
+                return key, status, project(rows) if representation else None, count_header(len(rows))
+
+            return key, 405, {"message": f"未対応: {method}"}, None
+
+        def do_GET(self):
+            self._handle("GET")
+
+        def do_POST(self):
+            self._handle("POST")
+
+        def do_PATCH(self):
+            self._handle("PATCH")
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PostgREST / 国会会議録API スタンドイン")
+    parser.add_argument("--port", type=int, default=54321, help="待ち受けポート (デフォルト: 54321)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="1リクエストごとの擬似遅延 (ミリ秒)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="書き込みを 503 で失敗させる割合 (0〜1)")
+    parser.add_argument("--max-body-bytes", type=int, default=0,
+                        help="これより大きいリクエストボディを 413 にする (デフォルト: 0 = 無制限)")
+    args = parser.parse_args()
+
+    server = FakeServer(args.port, args.latency_ms, args.fail_rate, args.max_body_bytes)
+    print(f"起動: {server.url}  (Ctrl+C で終了)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+run_bench.py - 取り込みスクリプトのオフライン ベンチマーク
+ローカルの PostgREST / 国会会議録API スタンドイン（fake_postgrest.py）を立て、
+各スクリプトを子プロセスとして実行して、処理件数/秒・HTTP往復数・送信バイト数・ピークRSSを計測する。
+結果は JSON で出力するので、レビュー時に前回の結果と比べて性能劣化を見つけられる。
+
+使い方:
+  python bench/run_bench.py                                   # 1k / 10k で全シナリオ
+  python bench/run_bench.py --scales 1000,10000,100000        # 100k も含める（数分かかる）
+  python bench/run_bench.py --scenarios import_bills_shu,categorize_bills --output bench.json
+  python bench/run_bench.py --compare bench.json              # 前回結果と比較（劣化があれば終了コード1）
+  python bench/run_bench.py --latency-ms 20                   # 1リクエスト20msの擬似ネットワーク遅延
+  python bench/run_bench.py --fail-rate 0.05                  # 書き込みの5%を 503 にして再送を確認
+  python bench/run_bench.py --max-body-bytes 100000           # 100KB を超えるボディを 413 にして分割を確認
+  python bench/run_bench.py --scenarios collect_daily_stream,collect_daily_meeting --kokkai-interval 0.2
+                                                              # 発言単位 / 会議単位の取得をAPI間隔込みで比べる
+
+計測値:
+  records_per_sec  入力件数 / 実行時間（子プロセスの起動から終了まで）
+  round_trips      スタンドインが受けたリクエスト数（requests にエンドポイント別の内訳）
+  bytes_sent       スクリプトが送ったバイト数（リクエスト行・ヘッダー・ボディ）
+  peak_rss_mb      スクリプト本体プロセスの最大RSS（ProcessPool の子プロセスは含まない）
+  coverage         発言を書いたシナリオのみ: 発言数・議員IDをリンクできた発言数・議員数
+  stages           スクリプト側の計測（metrics.py）によるステージ別の回数・秒数・行数
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timedelta, timezone
+
+import datagen
+from fake_postgrest import FakeServer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DUMMY_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bench"
+DEFAULT_SCALES = "1000,10000"
+REGRESSION_THRESHOLD = 0.2  # --compare で劣化とみなす変化率
+
+
+# === シナリオ ===
+# prepare(server, scale, workdir) → (スクリプトの引数リスト, 入力件数)
+
+def prepare_collect(server, scale, workdir, extra_args=()):
+    server.corpus.records, source = datagen.speech_corpus(scale)
+    print(f"    発言レコード: {source}", file=sys.stderr)
+    return ["collect_daily.py", "--from", "2000-01-01", "--until", "2099-12-31", *extra_args], scale
+
+
+def prepare_collect_stream(server, scale, workdir):
+    return prepare_collect(server, scale, workdir, ["--stream"])
+
+
+def prepare_collect_meeting(server, scale, workdir):
+    """会議単位出力（--api meeting）。collect_daily_stream と往復数・受信バイト数・時間を比べる"""
+    return prepare_collect(server, scale, workdir, ["--stream", "--api", "meeting"])
+
+
+def prepare_collect_replay(server, scale, workdir):
+    """API を叩かずにアーカイブから作り直す（--replay）。アーカイブは speech_archive.py --import で用意"""
+    records, source = datagen.speech_corpus(scale)
+    print(f"    発言レコード: {source}", file=sys.stderr)
+    path = os.path.join(workdir, "records.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    subprocess.run([sys.executable, os.path.join(REPO_DIR, "speech_archive.py"), "--dir",
+                    os.path.join(workdir, "archive"), "--import", path], check=True, stdout=subprocess.DEVNULL)
+    return ["collect_daily.py", "--from", "2000-01-01", "--until", "2099-12-31", "--replay", "--stream"], scale
+
+
+def prepare_collect_rerun(server, scale, workdir):
+    """
+    前日と重なる期間での再実行（毎日の収集）。発言日を今日までの連続した日付に付け替え、
+    同じ期間で1回流したあとの2回目を計測する（RERUN_SCENARIOS）
+    """
+    records, source = datagen.speech_corpus(scale)
+    print(f"    発言レコード: {source}", file=sys.stderr)
+    dates = sorted({r.get("date", "") for r in records})
+    today = datetime.now().date()
+    shifted = {d: (today - timedelta(days=len(dates) - 1 - i)).isoformat() for i, d in enumerate(dates)}
+    server.corpus.records = [{**r, "date": shifted[r.get("date", "")]} for r in records]
+    return ["collect_daily.py", "--from", shifted[dates[0]], "--until", today.isoformat()], scale
+
+
+def prepare_collect_link(server, scale, workdir):
+    """
+    議員が参議院CSV形式（「佐藤 太郎0」）や旧字体（髙橋・渡邊・齋藤）で登録済みのところに発言を流す。
+    一部の発言者は異体字（佐籐）で、よみだけが一致する。リンクできた発言数は結果の coverage に出る
+    """
+    server.corpus.records, source = datagen.speech_corpus(scale)
+    print(f"    発言レコード: {source}", file=sys.stderr)
+    speakers = {}
+    for r in server.corpus.records:
+        speakers.setdefault(r["speaker"], (len(speakers), r.get("speakerGroup")))
+    old_forms = str.maketrans({"高": "髙", "辺": "邊", "斎": "齋"})
+    legislators = []
+    for name, (i, group) in speakers.items():
+        legislators.append({"name": f"{name[:2]} {name[2:]}".translate(old_forms), "name_yomi": f"よみ{i}",
+                            "house": "参議院", "current_party": group, "last_seen": "2000-01-01"})
+    typo = {name: name.replace("藤", "籐", 1) for name, (i, _) in speakers.items() if i % 5 == 0}
+    server.corpus.records = [
+        {**r, "speaker": typo.get(r["speaker"], r["speaker"]), "speakerYomi": f"よみ{speakers[r['speaker']][0]}"}
+        for r in server.corpus.records
+    ]
+    server.db.load("legislators", legislators)
+    return ["collect_daily.py", "--from", "2000-01-01", "--until", "2099-12-31"], scale
+
+
+def prepare_bills_shu(server, scale, workdir):
+    path = os.path.join(workdir, "shu_gian.csv")
+    datagen.write_shu_gian(path, scale)
+    return ["import_bills.py", "--shu", path], scale
+
+
+def prepare_bills_san(server, scale, workdir):
+    path = os.path.join(workdir, "san_gian.csv")
+    datagen.write_san_gian(path, scale)
+    return ["import_bills.py", "--san", path], scale
+
+
+def prepare_bills_both(server, scale, workdir):
+    """衆・参の gian.csv を1回の実行で（ファイルごとに別プロセスで同時に）取り込む"""
+    shu, san = os.path.join(workdir, "shu_gian.csv"), os.path.join(workdir, "san_gian.csv")
+    datagen.write_shu_gian(shu, scale)
+    datagen.write_san_gian(san, scale)
+    return ["import_bills.py", "--shu", shu, "--san", san], scale * 2
+
+
+def prepare_councillors(server, scale, workdir):
+    members = max(10, scale // 40)
+    datagen.write_councillors_data(os.path.join(workdir, "councillors"), scale, members)
+    return ["import_councillors.py"], scale + members
+
+
+def prepare_categorize(server, scale, workdir):
+    server.db.load("bills", datagen.synthetic_bills(scale))
+    return ["categorize_bills.py"], scale
+
+
+SCENARIOS = {
+    "collect_daily": prepare_collect,
+    "collect_daily_stream": prepare_collect_stream,
+    "collect_daily_meeting": prepare_collect_meeting,
+    "collect_daily_replay": prepare_collect_replay,
+    "collect_daily_rerun": prepare_collect_rerun,
+    "collect_daily_link": prepare_collect_link,
+    "import_bills_shu": prepare_bills_shu,
+    "import_bills_san": prepare_bills_san,
+    "import_bills_both": prepare_bills_both,
+    "import_councillors": prepare_councillors,
+    "categorize_bills": prepare_categorize,
+}
+
+# 1回流してから同じ引数でもう1回実行し、2回目を計測するシナリオ → 追加の環境変数
+# （TTL 0 にして、直近の日は numberOfRecords の確認を経る経路を通す）
+RERUN_SCENARIOS = {"collect_daily_rerun": {"KOKKAI_CACHE_TTL": "0"}}
+
+
+def script_env(server, workdir: str, kokkai_interval: float = 0.001) -> dict:
+    """スクリプトをスタンドインに向け、ローカルの状態（キャッシュ・アーカイブなど）を workdir に置く環境変数"""
+    return {
+        **os.environ,
+        "SUPABASE_URL": server.url,
+        "SUPABASE_SERVICE_KEY": DUMMY_KEY,
+        "NEXT_PUBLIC_SUPABASE_URL": server.url,
+        "NEXT_PUBLIC_SUPABASE_ANON_KEY": DUMMY_KEY,
+        "KOKKAI_API": f"{server.url}/api/speech",
+        "KOKKAI_MEETING_API": f"{server.url}/api/meeting",
+        "KOKKAI_REQUEST_INTERVAL": str(kokkai_interval),
+        "LOOKUP_CACHE_PATH": os.path.join(workdir, "lookup_cache.sqlite3"),
+        "COUNCILLORS_DATA_DIR": os.path.join(workdir, "councillors"),
+        "SPEECH_ARCHIVE_DIR": os.path.join(workdir, "archive"),
+        "SPEECH_INDEX_DIR": os.path.join(workdir, "speech_index"),
+        "METRICS_PATH": os.path.join(workdir, "metrics.jsonl"),
+        "PYTHONUNBUFFERED": "1",
+    }
+
+
+def run_scenario(server, name: str, scale: int, python: str, kokkai_interval: float = 0.001) -> dict:
+    """シナリオを1回実行して計測結果を返す"""
+    server.reset()
+    workdir = tempfile.mkdtemp(prefix=f"bench-{name}-")
+    try:
+        args, records = SCENARIOS[name](server, scale, workdir)
+        env = {**script_env(server, workdir, kokkai_interval), **RERUN_SCENARIOS.get(name, {})}
+        log_path = os.path.join(workdir, "output.log")
+        if name in RERUN_SCENARIOS:
+            with open(log_path, "w", encoding="utf-8") as log:
+                subprocess.run([python, os.path.join(REPO_DIR, args[0]), *args[1:]],
+                               cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        server.stats.reset()  # 前準備の分は数えない
+        with open(log_path, "w", encoding="utf-8") as log:
+            started = time.perf_counter()
+            proc = subprocess.Popen([python, os.path.join(REPO_DIR, args[0]), *args[1:]],
+                                    cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+            _, status, rusage = os.wait4(proc.pid, 0)
+            elapsed = time.perf_counter() - started
+            proc.returncode = os.waitstatus_to_exitcode(status)
+
+        if proc.returncode != 0:
+            with open(log_path, encoding="utf-8", errors="replace") as f:
+                tail = f.read()[-2000:]
+            print(f"    ❌ 終了コード {proc.returncode}\n{tail}", file=sys.stderr)
+
+        stats = server.stats.snapshot()
+        speeches = server.db.rows("speeches")
+        coverage = {
+            "speeches": len(speeches),
+            "linked_speeches": sum(1 for r in speeches if r.get("legislator_id") is not None),
+            "legislators": len(server.db.rows("legislators")),
+        } if speeches else None
+        return {
+            "scenario": name,
+            "scale": scale,
+            "records": records,
+            "exit_code": proc.returncode,
+            "seconds": round(elapsed, 3),
+            "records_per_sec": round(records / max(elapsed, 1e-9), 1),
+            "round_trips": stats["round_trips"],
+            "requests": stats["requests"],
+            "bytes_sent": stats["bytes_sent"],
+            "bytes_received": stats["bytes_received"],
+            "server_seconds": stats["server_seconds"],
+            "peak_rss_mb": round(rusage.ru_maxrss / 1024, 1),  # Linux は KB 単位
+            "stages": read_stages(os.path.join(workdir, "metrics.jsonl")),
+            "coverage": coverage,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def read_stages(path: str) -> dict:
+    """スクリプトが書き出した metrics.py の計測結果から、ステージ別の回数・秒数・行数だけ取り出す"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        lines = [line for line in f if line.strip()]
+    stages = json.loads(lines[-1])["stages"] if lines else {}
+    return {name: {k: s[k] for k in ("count", "seconds", "rows")} for name, s in stages.items()}
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list[dict], baseline: dict, threshold: float) -> list[str]:
+    """前回結果との比較。劣化していれば説明文のリストを返す"""
+    before = {(r["scenario"], r["scale"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        old = before.get((r["scenario"], r["scale"]))
+        if not old:
+            continue
+        label = f"{r['scenario']}@{r['scale']}"
+        if r["records_per_sec"] < old["records_per_sec"] * (1 - threshold):
+            regressions.append(f"{label}: records/sec {old['records_per_sec']} → {r['records_per_sec']}")
+        for key in ("round_trips", "bytes_sent", "peak_rss_mb"):
+            if r[key] > old[key] * (1 + threshold) and r[key] - old[key] > 1:
+                regressions.append(f"{label}: {key} {old[key]} → {r[key]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="取り込みスクリプトのオフライン ベンチマーク")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help=f"入力件数（カンマ区切り, デフォルト: {DEFAULT_SCALES}）")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"実行するシナリオ（カンマ区切り: {', '.join(SCENARIOS)}）")
+    parser.add_argument("--python", default=sys.executable, help="スクリプトを実行する Python")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="1リクエストごとの擬似遅延 (ミリ秒)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="書き込みを 503 で失敗させる割合 (0〜1)")
+    parser.add_argument("--max-body-bytes", type=int, default=0,
+                        help="これより大きいリクエストボディを 413 にする (0 = 無制限)")
+    parser.add_argument("--kokkai-interval", type=float, default=0.001,
+                        help="国会会議録APIのリクエスト間隔 (秒, デフォルト: 0.001。本番は3)")
+    parser.add_argument("--output", help="結果JSONの出力先（省略時は標準出力）")
+    parser.add_argument("--compare", metavar="BASELINE", help="前回の結果JSONと比較する")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help=f"劣化とみなす変化率 (デフォルト: {REGRESSION_THRESHOLD})")
+    args = parser.parse_args()
+
+    scales = [int(s) for s in args.scales.split(",") if s]
+    names = [n for n in args.scenarios.split(",") if n]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        print(f"ERROR: 不明なシナリオ: {', '.join(unknown)}", file=sys.stderr)
+        sys.exit(2)
+
+    server = FakeServer(latency_ms=args.latency_ms, fail_rate=args.fail_rate,
+                        max_body_bytes=args.max_body_bytes).start()
+    results = []
+    try:
+        for name in names:
+            for scale in scales:
+                print(f"  {name} @ {scale} ...", file=sys.stderr)
+                result = run_scenario(server, name, scale, args.python, args.kokkai_interval)
+                print(f"    {result['seconds']}秒, {result['records_per_sec']}件/秒, "
+                      f"往復 {result['round_trips']}回, 送信 {result['bytes_sent'] / 1e6:.1f}MB, "
+                      f"RSS {result['peak_rss_mb']}MB", file=sys.stderr)
+                results.append(result)
+    finally:
+        server.stop()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "latency_ms": args.latency_ms,
+            "fail_rate": args.fail_rate,
+            "max_body_bytes": args.max_body_bytes,
+            "kokkai_interval": args.kokkai_interval,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"結果: {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    failed = [r for r in results if r["exit_code"] != 0]
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"  ⚠️ 劣化: {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,14 +6,26 @@ categorize_bills.py - 議案名からカテゴリ・テンプレ要約・影響
 使い方:
   python categorize_bills.py
   python categorize_bills.py --dry-run   # DB更新なし、結果だけ表示
+  python categorize_bills.py --incremental   # 新規・件名変更・ルール変更の分だけ分類し、結果が変わった行だけ更新
+  python categorize_bills.py --metrics run.jsonl   # ステージ別の所要時間・件数を書き出す
+  python categorize_bills.py --dry-run --from-mirror   # 議案をAPIではなくローカルミラー（local_mirror.py）から読む
 """
 
 import os
 import sys
 import re
+import json
 import time
+import atexit
+import inspect
+import functools
+import hashlib
 import argparse
 from supabase import create_client
+from lookup_cache import LookupCache, fetch_in_chunks
+from local_mirror import LocalMirror, MIRROR_PATH
+from metrics import metrics
+from supabase_writer import BatchWriter
 
 SUPABASE_URL = os.environ.get("SUPABASE_URL", "")
 SUPABASE_KEY = os.environ.get("SUPABASE_SERVICE_KEY", "")
@@ -39,24 +51,15 @@ if not SUPABASE_URL or not SUPABASE_KEY:
     sys.exit(1)
 
 supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+writer = BatchWriter(supabase)
 
+# upsert 時に一緒に送る既存カラム。部分カラムだけの upsert だと、
+# INSERT 側の NOT NULL 制約に引っかかるため、既存値をそのまま送り返す。
+# 取得後に削除・変更された議案を古い値で書き戻さないよう、送る直前に読み直して外す（recheck_bills）
+BILL_KEY_COLUMNS = ["house", "submit_session", "bill_type", "bill_number", "bill_name"]
+RECHECK_CHUNK = 1000  # 読み直してから書き込むまでの単位
+OUTPUT_COLUMNS = ["category", "category_sub", "summary_template", "affected_groups"]
 
-def retry_update(table, data, bill_id, max_retries=5):
-    """リトライ付きでDB更新。失敗時は指数バックオフで待機"""
-    for attempt in range(max_retries):
-        try:
-            supabase.table(table).update(data).eq("id", bill_id).execute()
-            return True
-        except Exception as e:
-            if attempt < max_retries - 1:
-                wait = 2 ** attempt * 5  # 5s, 10s, 20s, 40s, 80s
-                print(f"    ⚠️ エラー (試行{attempt+1}/{max_retries}): {str(e)[:80]}")
-                print(f"    💤 {wait}秒待機中...")
-                time.sleep(wait)
-            else:
-                print(f"    ❌ {max_retries}回失敗: {bill_id}")
-                return False
-    return False
 
 # ============================================
 # 政策カテゴリ辞書
@@ -234,6 +237,64 @@ CATEGORIES = [
 ]
 
 
+def keyword_pattern(keywords) -> str:
+    """
+    キーワード群を先頭から共通部分でまとめた正規表現にする（例: 障害(?:者(?:権利)?)?）。
+    同じ開始位置では必ず最長のキーワードにマッチする。
+    """
+    trie = {}
+    for kw in keywords:
+        node = trie
+        for ch in kw:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class CategoryMatcher:
+    """
+    CATEGORIES の全キーワードを1本の正規表現にコンパイルし、
+    議案名を1回走査するだけでマッチした全カテゴリを優先度順に返す。
+
+    ある位置で最長一致したキーワードに対し、その接頭辞になっているキーワード
+    （「障害者権利」に対する「障害者」「障害」）も同じ位置に出現しているので、
+    それらのカテゴリもまとめて拾う。結果は `kw in bill_name` を全件試すのと同じ。
+    """
+
+    def __init__(self, categories: list[dict]):
+        self.categories = categories
+        kw_to_indexes = {}
+        for i, cat in enumerate(categories):
+            for kw in cat["keywords"]:
+                kw_to_indexes.setdefault(kw, set()).add(i)
+        self.kw_to_indexes = {
+            kw: frozenset().union(*(idx for prefix, idx in kw_to_indexes.items() if kw.startswith(prefix)))
+            for kw in kw_to_indexes
+        }
+        self.pattern = re.compile(keyword_pattern(kw_to_indexes))
+
+    def match(self, bill_name: str) -> list[dict]:
+        """マッチしたカテゴリを優先度順に返す"""
+        indexes = set()
+        search = self.pattern.search
+        m = search(bill_name)
+        while m:
+            indexes |= self.kw_to_indexes[m.group()]
+            m = search(bill_name, m.start() + 1)
+        return [self.categories[i] for i in sorted(indexes)]
+
+
+CATEGORY_MATCHER = CategoryMatcher(CATEGORIES)
+
+
 def categorize_bill(bill_name: str, bill_type: str = "") -> dict:
     """
     議案名からカテゴリ、テンプレ要約、影響対象を返す。
@@ -246,12 +307,7 @@ def categorize_bill(bill_name: str, bill_type: str = "") -> dict:
     }
 
     # カテゴリ分類（最初にマッチしたものをメイン、2番目をサブ）
-    matched = []
-    for cat in CATEGORIES:
-        for kw in cat["keywords"]:
-            if kw in bill_name:
-                matched.append(cat)
-                break
+    matched = CATEGORY_MATCHER.match(bill_name)
 
     if matched:
         result["category"] = matched[0]["name"]
@@ -265,43 +321,64 @@ def categorize_bill(bill_name: str, bill_type: str = "") -> dict:
     return result
 
 
-def generate_summary(bill_name: str, bill_type: str, category: str | None) -> str:
-    """議案名からテンプレ要約を生成"""
-
-    # 提出者タイプ
-    type_label = ""
-    if bill_type == "閣法":
-        type_label = "政府提出。"
-    elif bill_type == "衆法" or bill_type == "参法":
-        type_label = "議員立法。"
+def categorize_bills(bills: list[tuple[str, str]]) -> list[dict]:
+    """
+    (bill_name, bill_type) のリストをまとめて分類。
+    会期・衆参をまたいで同名の議案が多いので、同じ組み合わせは1回だけ計算する。
+    """
+    results = {}
+    for key in bills:
+        if key not in results:
+            results[key] = categorize_bill(*key)
+    return [results[key] for key in bills]
 
-    # パターンマッチ
-    name = bill_name
 
+# ============================================
+# テンプレ要約
+# ============================================
+# (議案名のパターン, 要約) を上から順に試し、最初に当たったものを使う。
+# パターンの (.+?) が {topic}、{type_label} は提出者タイプ、{cat_hint} は「（○○分野）」
+SUMMARY_TEMPLATES = [
     # パターン1: 「○○法の一部を改正する法律案」
-    m = re.search(r'(.+?)の一部を改正する法律案', name)
-    if m:
-        law_name = m.group(1).strip()
-        cat_hint = f"（{category}分野）" if category else ""
-        return f"{type_label}{law_name}の規定を改正し、{cat_hint}制度を見直す法案。"
-
+    (r'(.+?)の一部を改正する法律案', "{type_label}{topic}の規定を改正し、{cat_hint}制度を見直す法案。"),
     # パターン2: 「○○に関する法律案」
-    m = re.search(r'(.+?)に関する法律案', name)
-    if m:
-        topic = m.group(1).strip()
-        return f"{type_label}{topic}について新たな法的枠組みを定める法案。"
-
+    (r'(.+?)に関する法律案', "{type_label}{topic}について新たな法的枠組みを定める法案。"),
     # パターン3: 「○○に関し講ずべき措置に関する法律案」
-    m = re.search(r'(.+?)に関し講ずべき', name)
-    if m:
-        topic = m.group(1).strip()
-        return f"{type_label}{topic}に対処するため、政府が実施する措置を定める法案。"
-
+    (r'(.+?)に関し講ずべき', "{type_label}{topic}に対処するため、政府が実施する措置を定める法案。"),
     # パターン4: 「○○法案」
-    m = re.search(r'(.+?)法案$', name)
-    if m:
-        topic = m.group(1).strip()
-        return f"{type_label}{topic}に関する法案。"
+    (r'(.+?)法案$', "{type_label}{topic}に関する法案。"),
+]
+TYPE_LABELS = {"閣法": "政府提出。", "衆法": "議員立法。", "参法": "議員立法。"}
+SUMMARY_CACHE_SIZE = 65536
+
+# 全パターンを1つにまとめ、先頭から1回だけ照合する（当たった選択肢は m.lastindex で分かる）。
+# 名前の先頭で当たらなければ途中からも当たらないので、改行を含まない名前なら上から順の re.search と同じ結果になる
+SUMMARY_PATTERN = re.compile("|".join(f"(?:{pattern})" for pattern, _ in SUMMARY_TEMPLATES))
+# 改行を含む名前用（. が改行に当たらないので、先頭からの照合と re.search で結果が変わりうる）
+SUMMARY_PATTERNS = [(re.compile(pattern), template) for pattern, template in SUMMARY_TEMPLATES]
+
+
+@functools.lru_cache(maxsize=SUMMARY_CACHE_SIZE)
+def generate_summary(bill_name: str, bill_type: str, category: str | None) -> str:
+    """議案名からテンプレ要約を生成（会期・衆参をまたいで同じ議案名が多いので結果を覚えておく）"""
+    type_label = TYPE_LABELS.get(bill_type, "")
+    name = bill_name
+
+    template = None
+    if "\n" not in name:
+        m = SUMMARY_PATTERN.match(name)
+        if m:
+            template = SUMMARY_TEMPLATES[m.lastindex - 1][1]
+    else:
+        for pattern, template in SUMMARY_PATTERNS:
+            m = pattern.search(name)
+            if m:
+                break
+        else:
+            template = None
+    if template is not None:
+        cat_hint = f"（{category}分野）" if category else ""
+        return template.format(type_label=type_label, topic=m.group(m.lastindex).strip(), cat_hint=cat_hint)
 
     # パターン5: 予算
     if "予算" in name:
@@ -320,25 +397,89 @@ def generate_summary(bill_name: str, bill_type: str, category: str | None) -> st
     return f"{type_label}{cat_hint}議案。"
 
 
+# 分類結果を左右するコード。ソースごと rules_hash に入れる
+RULES_CODE = (keyword_pattern, CategoryMatcher, categorize_bill, categorize_bills, generate_summary)
+# RULES_CODE の外で分類結果が変わる修正（呼び出し元での件名の前処理など）をしたら上げる
+RULES_VERSION = 1
+
+
+def rules_hash() -> str:
+    """
+    分類ルール（カテゴリ辞書・要約テンプレと、それを使う照合・分類・要約のコード）のハッシュ。
+    どれかを変えると --incremental でも全件再分類になる
+    """
+    code = "".join(inspect.getsource(f) for f in RULES_CODE)
+    rules = (f"{RULES_VERSION}\0" + json.dumps(CATEGORIES, ensure_ascii=False, sort_keys=True)
+             + json.dumps(SUMMARY_TEMPLATES, ensure_ascii=False) + json.dumps(TYPE_LABELS, ensure_ascii=False)
+             + code)
+    return hashlib.sha256(rules.encode("utf-8")).hexdigest()
+
+
+def bill_fingerprint(bill: dict) -> str:
+    """分類結果を左右する入力（件名・種類）のハッシュ"""
+    key = f"{bill.get('bill_name') or ''}\0{bill.get('bill_type') or ''}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def recheck_bills(updates: list[dict]) -> tuple[list[dict], set]:
+    """
+    書き込む直前に議案のキー列を読み直し、(そのまま送れる行, 外した id) を返す。
+    取得後に削除された議案は upsert で再び INSERT され、import_bills が変えた件名などは
+    取得時の値で上書きされてしまうので送らない（件名が変われば次の --incremental で分類し直される）。
+    読み直しから書き込みまで（1チャンクの往復）の間に変わったものまでは防げない。
+    """
+    fresh = fetch_in_chunks(supabase, "bills", ", ".join(["id", *BILL_KEY_COLUMNS]), "id",
+                            [u["id"] for u in updates], lambda row: (row["id"], row))
+    keep = [u for u in updates
+            if u["id"] in fresh and all(fresh[u["id"]].get(col) == u[col] for col in BILL_KEY_COLUMNS)]
+    return keep, {u["id"] for u in updates} - {u["id"] for u in keep}
+
+
 def main():
     parser = argparse.ArgumentParser(description="議案カテゴリ自動分類")
     parser.add_argument("--dry-run", action="store_true", help="DB更新なし")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="1リクエストで更新する件数の上限 (省略時は送信バイト数と応答時間で自動調整)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="前回から変わった議案だけ分類し、結果が変わった行だけ更新")
+    parser.add_argument("--metrics", help="計測結果の出力先（.prom なら Prometheus 形式、それ以外は JSON lines）")
+    parser.add_argument("--from-mirror", nargs="?", const=MIRROR_PATH, metavar="PATH",
+                        help=f"議案をローカルミラーから読む（先に local_mirror.py --sync bills。デフォルト: {MIRROR_PATH}）")
     args = parser.parse_args()
+    if args.from_mirror and not args.dry_run:
+        parser.error("--from-mirror は --dry-run と一緒に使ってください（ミラーが古いと件名を古い値で書き戻すため）")
+    atexit.register(metrics.write, "categorize_bills", args.metrics)
+
+    columns = ["id", *BILL_KEY_COLUMNS]
+    if args.incremental:
+        columns += OUTPUT_COLUMNS  # 既存の分類結果と比較して、同じなら書き込まない
 
     # 全bills取得
     print("議案データ取得中...")
     all_bills = []
     offset = 0
     page_size = 1000
-    while True:
+    if args.from_mirror:
+        mirror = LocalMirror(args.from_mirror)
+        if not mirror.has_table("bills"):
+            print(f"  ❌ {args.from_mirror} に bills がありません（python local_mirror.py --sync bills）")
+            sys.exit(1)
+        with metrics.stage("fetch_bills") as stage:
+            all_bills = [dict(row) for row in mirror.query(
+                f"SELECT {', '.join(columns)} FROM bills ORDER BY id")]
+            stage.rows = len(all_bills)
+    while not args.from_mirror:
         for attempt in range(5):
             try:
-                result = supabase.table("bills") \
-                    .select("id, bill_name, bill_type") \
-                    .range(offset, offset + page_size - 1) \
-                    .execute()
+                with metrics.stage("fetch_bills") as stage:
+                    result = supabase.table("bills") \
+                        .select(", ".join(columns)) \
+                        .range(offset, offset + page_size - 1) \
+                        .execute()
+                    stage.rows = len(result.data or [])
                 break
             except Exception as e:
+                metrics.incr("fetch_retries")
                 wait = 2 ** attempt * 3
                 print(f"  ⚠️ 取得エラー (試行{attempt+1}/5): {str(e)[:60]}... {wait}秒待機")
                 time.sleep(wait)
@@ -353,14 +494,35 @@ def main():
 
     print(f"  {len(all_bills)}件の議案を取得")
 
+    # 差分モード: ルールが前回と同じなら、件名・種類が変わった（または新規の）議案だけ対象にする
+    if args.incremental:
+        state = LookupCache()
+        current_rules = rules_hash()
+        rules_changed = state.get_many("categorize_rules", ["hash"]).get("hash") != current_rules
+        if rules_changed:
+            print("  分類ルールが前回と異なる（または初回）ため全件を再分類")
+            fingerprints = {}
+        else:
+            fingerprints = state.get_many("categorize_fingerprints", [b["id"] for b in all_bills])
+        targets = [b for b in all_bills if fingerprints.get(b["id"]) != bill_fingerprint(b)]
+        print(f"  対象: {len(targets)}件 (変更なし {len(all_bills) - len(targets)}件)")
+        metrics.incr("incremental_unchanged", len(all_bills) - len(targets))
+        if not targets:
+            print("\n✅ 変更なし")
+            return
+    else:
+        targets = all_bills
+
     # 分類
     categorized = 0
     uncategorized = 0
     category_counts: dict[str, int] = {}
     updates = []
 
-    for bill in all_bills:
-        cat = categorize_bill(bill["bill_name"], bill.get("bill_type", ""))
+    with metrics.stage("categorize") as stage:
+        results = categorize_bills([(bill["bill_name"], bill.get("bill_type", "")) for bill in targets])
+        stage.rows = len(results)
+    for bill, cat in zip(targets, results):
         if cat["category"]:
             categorized += 1
             category_counts[cat["category"]] = category_counts.get(cat["category"], 0) + 1
@@ -369,6 +531,7 @@ def main():
 
         updates.append({
             "id": bill["id"],
+            **{col: bill.get(col) for col in BILL_KEY_COLUMNS},
             "category": cat["category"],
             "category_sub": cat["category_sub"],
             "summary_template": cat["summary_template"],
@@ -377,7 +540,7 @@ def main():
 
     # 統計
     print(f"\n=== 分類結果 ===")
-    print(f"  分類成功: {categorized}件 ({categorized*100//len(all_bills)}%)")
+    print(f"  分類成功: {categorized}件 ({categorized*100//len(targets)}%)")
     print(f"  未分類: {uncategorized}件")
     print(f"\n  カテゴリ別:")
     for cat, cnt in sorted(category_counts.items(), key=lambda x: -x[1]):
@@ -386,7 +549,7 @@ def main():
     # サンプル表示
     print(f"\n=== サンプル（最初の20件） ===")
     for u in updates[:20]:
-        bill = next(b for b in all_bills if b["id"] == u["id"])
+        bill = next(b for b in targets if b["id"] == u["id"])
         print(f"\n  📜 {bill['bill_name']}")
         print(f"     カテゴリ: {u['category'] or '未分類'}" + (f" / {u['category_sub']}" if u['category_sub'] else ""))
         print(f"     要約: {u['summary_template']}")
@@ -396,31 +559,50 @@ def main():
         print(f"\n⚠️ --dry-run モード: DB更新はスキップ")
         return
 
-    # DB更新
+    # 差分モード: 計算結果が保存済みの値と同じ行は送らない
+    if args.incremental:
+        stored = {b["id"]: b for b in targets}
+        updates = [u for u in updates if any(u[col] != stored[u["id"]].get(col) for col in OUTPUT_COLUMNS)]
+        print(f"\n  書き込み対象: {len(updates)}件 (結果が同じ {len(targets) - len(updates)}件はスキップ)")
+
+    # DB更新（複数行 upsert を並行して送る。混雑時の再送は writer 側）
     print(f"\n--- DB更新中 ---")
     success = 0
     failed = 0
-    batch_size = 200
-    for i in range(0, len(updates), batch_size):
-        batch = updates[i:i + batch_size]
-        for item in batch:
-            ok = retry_update("bills", {
-                "category": item["category"],
-                "category_sub": item["category_sub"],
-                "summary_template": item["summary_template"],
-                "affected_groups": item["affected_groups"],
-            }, item["id"])
-            if ok:
-                success += 1
-            else:
-                failed += 1
-        done = min(i + batch_size, len(updates))
-        if done % 500 < batch_size:
-            print(f"  更新: {done}/{len(updates)} (成功:{success} 失敗:{failed})")
-        # バッチ間に少し休憩（Supabase過負荷防止）
-        time.sleep(0.5)
-
-    print(f"\n✅ 分類完了! 成功:{success}件 失敗:{failed}件")
+    failed_ids = set()
+    skipped_ids = set()
+    batches = []
+    for i in range(0, len(updates), RECHECK_CHUNK):
+        with metrics.stage("recheck_bills") as stage:
+            chunk, skipped = recheck_bills(updates[i:i + RECHECK_CHUNK])
+            stage.rows = len(chunk)
+        skipped_ids |= skipped
+        batches += writer.write("bills", chunk, on_conflict="id", stage="upsert_bills", max_rows=args.batch_size)
+    if skipped_ids:
+        print(f"  取得後に削除・変更された議案: {len(skipped_ids)}件（書き込まない）")
+    done = 0
+    for batch in batches:
+        error = batch.exception()
+        if error is None:
+            success += batch.size
+        else:
+            print(f"    ❌ 失敗: {len(batch.rows)}件 (id {batch.rows[0]['id']} ~): {str(error)[:80]}")
+            failed += batch.size
+            failed_ids.update(u["id"] for u in batch.rows)
+        done += batch.size
+        print(f"  更新: {done}/{len(updates) - len(skipped_ids)} (成功:{success} 失敗:{failed})")
+    writer.flush("bills", raise_errors=False)  # 失敗は上で数えたので、ここでは投げない
+    requests_made = len(batches)
+
+    # 差分モード: 反映できた議案の指紋を記録（失敗分は次回また対象になる）
+    if args.incremental:
+        state.put_many("categorize_fingerprints", {
+            b["id"]: bill_fingerprint(b) for b in targets if b["id"] not in failed_ids | skipped_ids
+        })
+        if not failed_ids:
+            state.put_many("categorize_rules", {"hash": current_rules})
+
+    print(f"\n✅ 分類完了! 成功:{success}件 失敗:{failed}件 (書き込みリクエスト {requests_made}回)")
 
 
 if __name__ == "__main__":
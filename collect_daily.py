@@ -7,22 +7,60 @@ GitHub Actions で毎日実行。差分のみ取得してSupabaseに保存。
   python collect_daily.py              # 最新3日分を取得
   python collect_daily.py --days 7     # 最新7日分を取得
   python collect_daily.py --from 2025-01-01 --until 2025-01-31  # 期間指定
+  python collect_daily.py --from 2024-01-01 --until 2024-06-30 --stream  # 長期間はページ単位で書き込み
+  python collect_daily.py --from 2023-01-01 --until 2023-12-31 --shard week --workers 2  # 再開可能な分割収集（Actions では進捗をキャッシュに引き継ぐ）
+  python collect_daily.py --from 2023-01-01 --until 2023-12-31 --shard week --reset-checkpoint  # 進捗を消して取り直す
+  python collect_daily.py --metrics run.jsonl  # ステージ別の所要時間・件数を書き出す（.prom なら Prometheus 形式）
+  python collect_daily.py --from 2020-01-01 --until 2024-12-31 --replay --stream  # APIを叩かずアーカイブから作り直す
+  python collect_daily.py --from 2024-01-01 --until 2024-12-31 --stream --api meeting  # 会議単位で取得（リクエスト数が減る）
+  python collect_daily.py --link-all  # 議員IDのない発言を全件走査してリンク（過去の実行の取りこぼしの補修）
+
+--archive をつけると、取得したページを生レコードのまま .speech_archive/ に保存する（speech_archive.py）。
+Actions では保存先を引き継がないので既定では保存しない（手元で --replay に備えるとき用）。
+APIのレスポンスは .kokkai_cache.sqlite3 にキャッシュし、重なった期間・再実行では取り直さない（--no-cache で無効）。
+発言者名は speaker_index.py の名寄せ索引で既存の議員に寄せる（空白・旧字体などの表記揺れで重複登録しない）。
+--index をつけると、書き込んだ発言の本文を .speech_index/ の全文検索インデックスに足していく（speech_index.py）。
+こちらも Actions では引き継がないので既定では作らない（索引を置くマシンで実行するとき用）。
 """
 
 import os
 import sys
 import time
+import atexit
 import json
 import hashlib
 import argparse
+import zlib
+import sqlite3
+import threading
+import multiprocessing
 import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from itertools import islice
 from supabase import create_client
+from lookup_cache import IN_CHUNK_SIZE, LookupCache, fetch_in_chunks
+from metrics import metrics
+from supabase_writer import BatchWriter, execute_with_retry
+from speech_archive import ARCHIVE_DIR, SpeechArchive
+from row_types import MeetingRow, SpeechRow, LegislatorRow, intern
+from speaker_index import (LEGISLATOR_COLUMNS, SpeakerIndex, format_counts, legislator_item, load_index,
+                           normalize_name, report_review, resolve_many, save_aliases)
 
 # === 設定 ===
-KOKKAI_API = "https://kokkai.ndl.go.jp/api/speech"
+KOKKAI_API = os.environ.get("KOKKAI_API", "https://kokkai.ndl.go.jp/api/speech")
+KOKKAI_MEETING_API = os.environ.get("KOKKAI_MEETING_API", KOKKAI_API.rsplit("/", 1)[0] + "/meeting")
 MAX_RECORDS_PER_REQUEST = 100
-REQUEST_INTERVAL = 3  # API礼儀: 3秒間隔
+MAX_MEETINGS_PER_REQUEST = 10  # 会議単位出力（meeting API）の maximumRecords 上限
+REQUEST_INTERVAL = float(os.environ.get("KOKKAI_REQUEST_INTERVAL", 3))  # API礼儀: 3秒間隔（ベンチではローカルのスタンドインを向けて短くする）
+FETCH_CONCURRENCY = 3  # 同時リクエスト数（レート上限は REQUEST_INTERVAL のまま）
+STREAM_CHUNK_RECORDS = 1000  # --stream 時に1回の書き込みで扱う発言数
+CHECKPOINT_PATH = ".collect_checkpoint.sqlite3"  # --shard 時の進捗記録
+MEETING_CHECKPOINT_PATH = ".collect_checkpoint.meeting.sqlite3"  # --api meeting では startRecord が会議の番号なので別にする
+RESPONSE_CACHE_PATH = os.environ.get("KOKKAI_CACHE_PATH", ".kokkai_cache.sqlite3")  # 空なら無効
+RESPONSE_CACHE_TTL = float(os.environ.get("KOKKAI_CACHE_TTL", 3600))  # 秒。これより新しいキャッシュは確認せずに使う
+IMMUTABLE_DAYS = int(os.environ.get("KOKKAI_IMMUTABLE_DAYS", 30))  # 取得時点でこれより前に終わっていた期間は変わらない扱い
 
 SUPABASE_URL = os.environ.get("SUPABASE_URL", "")
 SUPABASE_KEY = os.environ.get("SUPABASE_SERVICE_KEY", "")
@@ -32,54 +70,317 @@ if not SUPABASE_URL or not SUPABASE_KEY:
     sys.exit(1)
 
 supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+lookup_cache = LookupCache()
+writer = BatchWriter(supabase)
+archive = None  # --archive / --replay のときだけ開く（SpeechArchive(ARCHIVE_DIR)）
+speech_index = None  # --index のときだけ開く（open_speech_index()）
 
 
 # === API取得 ===
 
+class RateLimiter:
+    """トークンバケット方式のレートリミッタ（スレッドセーフ）
+    rate: 1秒あたりのトークン補充数, capacity: バケット容量（バースト上限）
+    """
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """トークンを1つ取得。足りなければ補充されるまで待つ"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# 全リクエストで共有（3秒に1回の礼儀上限はスレッド数に関係なく維持）
+rate_limiter = RateLimiter(rate=1 / REQUEST_INTERVAL)
+
+# コネクションプール付きセッション（TCP/TLS接続を使い回す）
+http = requests.Session()
+
+
+def mount_http(concurrency: int):
+    """プールの大きさを同時リクエスト数に合わせる（小さいと余った接続を捨てて張り直すことになる）"""
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(1, concurrency))
+    http.mount("https://", adapter)
+    http.mount("http://", adapter)
+
+
+mount_http(FETCH_CONCURRENCY)
+
+
+class ResponseCache:
+    """
+    国会会議録APIのレスポンスを、クエリパラメータをキーに SQLite に保存する。
+    使ってよいかの判定（fresh）:
+      - 取得時点で until が IMMUTABLE_DAYS 日以上前だった期間 → 以後変わらないので常に使う
+      - 取得から RESPONSE_CACHE_TTL 秒以内 → 確認せずに使う（再実行・リトライ）
+      - それ以外は、同じ期間の1ページ目を取り直して numberOfRecords が変わっていなければ使う
+    ETag / Last-Modified が返ってきていれば、取り直すときに条件付きリクエストにする。
+    """
+
+    def __init__(self, path: str = RESPONSE_CACHE_PATH, ttl: float = RESPONSE_CACHE_TTL,
+                 immutable_days: int = IMMUTABLE_DAYS):
+        self.ttl = ttl
+        self.immutable_days = immutable_days
+        self.lock = threading.Lock()
+        self.totals: dict[tuple, int] = {}  # この実行で確認した (API, 期間) ごとの numberOfRecords
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                until_date TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                body BLOB NOT NULL
+            );
+        """)
+
+    @staticmethod
+    def key(params: dict) -> str:
+        return json.dumps(sorted(params.items()), ensure_ascii=False)
+
+    def get(self, params: dict) -> dict | None:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT until_date, total, fetched_at, etag, last_modified, body FROM responses WHERE key = ?",
+                (self.key(params),),
+            ).fetchone()
+        if row is None:
+            return None
+        until_date, total, fetched_at, etag, last_modified, body = row
+        return {"until": until_date, "total": total, "fetched_at": fetched_at, "etag": etag,
+                "last_modified": last_modified, "data": json.loads(zlib.decompress(body))}
+
+    def fresh(self, entry: dict, params: dict) -> bool:
+        fetched = datetime.fromtimestamp(entry["fetched_at"])
+        if entry["until"] <= (fetched - timedelta(days=self.immutable_days)).strftime("%Y-%m-%d"):
+            return True
+        if time.time() - entry["fetched_at"] < self.ttl:
+            return True
+        current = self.totals.get((params.get("api"), params["from"], params["until"]))
+        return params["startRecord"] > 1 and current is not None and current == entry["total"]
+
+    def put(self, params: dict, data: dict, headers=None):
+        headers = headers or {}
+        body = zlib.compress(json.dumps(data, ensure_ascii=False).encode())
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.key(params), params["until"], data.get("numberOfRecords", 0), time.time(),
+                 headers.get("ETag"), headers.get("Last-Modified"), body),
+            )
+
+    def touch(self, params: dict):
+        """内容が変わっていないと確認できたので、取得時刻だけ更新する"""
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE responses SET fetched_at = ? WHERE key = ?", (time.time(), self.key(params)))
+
+    def cached_windows(self, api_url: str, page_size: int, from_date: str, until_date: str) -> list[tuple[str, str]]:
+        """from_date ~ until_date に収まる期間のうち、1ページ目を保存済みのもの（開始日の順。同じ開始日なら長い方）"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT key FROM responses WHERE until_date BETWEEN ? AND ?", (from_date, until_date)
+            ).fetchall()
+        windows = {}
+        for (key,) in rows:
+            params = dict(json.loads(key))
+            if (params.get("api") == api_url and params["startRecord"] == 1 and params["maximumRecords"] == page_size
+                    and params["from"] >= from_date):
+                windows[params["from"]] = max(windows.get(params["from"], ""), params["until"])
+        return sorted(windows.items())
+
+    def observe_total(self, params: dict, data: dict):
+        self.totals[(params.get("api"), params["from"], params["until"])] = data.get("numberOfRecords", 0)
+
+
+response_cache = ResponseCache() if RESPONSE_CACHE_PATH else None
+
+# 取得に使うAPI（--api で切り替え）。どちらも page_records() で同じ形の発言レコードになる
+#   speech   発言単位出力。1レコードごとに会議の情報が繰り返される
+#   meeting  会議単位出力。会議の情報は1回で、発言はその中に入っている（1リクエストで10会議）
+API_MODES = {
+    "speech": {"url": KOKKAI_API, "page_size": MAX_RECORDS_PER_REQUEST, "unit": "発言", "stage": "fetch_speeches"},
+    "meeting": {"url": KOKKAI_MEETING_API, "page_size": MAX_MEETINGS_PER_REQUEST, "unit": "会議",
+                "stage": "fetch_meetings"},
+}
+collection_api = "speech"
+
+
 def fetch_speeches(from_date: str, until_date: str, start_record: int = 1) -> dict:
-    """国会会議録APIから発言を取得"""
+    """
+    国会会議録API（collection_api）から1ページ取得（レスポンスキャッシュがあれば使う）。
+    --archive なら、キャッシュから返したページもアーカイブに足す（同じ内容のレコードは追記されない）
+    """
+    api = API_MODES[collection_api]
     params = {
         "from": from_date,
         "until": until_date,
         "recordPacking": "json",
-        "maximumRecords": MAX_RECORDS_PER_REQUEST,
+        "maximumRecords": api["page_size"],
         "startRecord": start_record,
     }
-    resp = requests.get(KOKKAI_API, params=params, timeout=60)
-    resp.raise_for_status()
-    return resp.json()
+    data = get_page(api, params)
+    if archive:
+        archive.append(page_records(data))
+    return data
+
+
+def get_page(api: dict, params: dict) -> dict:
+    """1ページ分のレスポンス。キャッシュが使えればそれを、なければ（条件付きで）取り直して保存する"""
+    cache_params = {**params, "api": api["url"]}
+    cached = response_cache.get(cache_params) if response_cache else None
+    if cached and response_cache.fresh(cached, cache_params):
+        metrics.incr("kokkai_cache_hits")
+        response_cache.observe_total(cache_params, cached["data"])
+        return cached["data"]
+
+    headers = {}
+    if cached and cached["etag"]:
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached["last_modified"]:
+        headers["If-Modified-Since"] = cached["last_modified"]
+    with metrics.stage("rate_limit_wait"):
+        rate_limiter.acquire()
+    with metrics.stage(api["stage"]) as stage:
+        resp = http.get(api["url"], params=params, headers=headers, timeout=60)
+        if resp.status_code == 304:
+            data = cached["data"]
+        else:
+            resp.raise_for_status()
+            data = resp.json()
+        stage.rows = len(page_records(data))
+
+    if response_cache:
+        response_cache.observe_total(cache_params, data)
+        if resp.status_code == 304 or (cached and cached["data"] == data):
+            metrics.incr("kokkai_cache_revalidated")
+            response_cache.touch(cache_params)
+            return data
+        metrics.incr("kokkai_cache_misses")
+        response_cache.put(cache_params, data, resp.headers)
+    return data
+
+
+def as_list(value) -> list:
+    """APIは1件だとリストでなく dict で返す"""
+    if value is None:
+        return []
+    return [value] if isinstance(value, dict) else value
 
 
-def fetch_all_speeches(from_date: str, until_date: str) -> list:
-    """全ページを巡回して発言を取得"""
-    all_records = []
-    start = 1
+def page_records(data: dict) -> list:
+    """
+    APIレスポンスから発言レコードをリストで取り出す。
+    会議単位出力（meetingRecord）は、会議の項目を各発言にコピーして発言単位出力と同じ形にする
+    """
+    if "meetingRecord" not in data:
+        return as_list(data.get("speechRecord"))
+    records = []
+    for meeting in as_list(data["meetingRecord"]):
+        header = {k: v for k, v in meeting.items() if k != "speechRecord"}
+        records += [{**header, **speech} for speech in as_list(meeting.get("speechRecord"))]
+    return records
+
 
-    first = fetch_speeches(from_date, until_date, start_record=1)
-    total = first.get("numberOfRecords", 0)
-    print(f"  期間 {from_date} ~ {until_date}: {total}件の発言")
+def iter_speech_pages(from_date: str, until_date: str, concurrency: int = FETCH_CONCURRENCY,
+                      start_record: int = 1):
+    """
+    全ページを (startRecord, records) の順に yield する。
+    1ページ目で numberOfRecords が分かれば残りのオフセットは確定するので、
+    最大 concurrency 本を先行リクエストしつつ、出力順は startRecord 順を保つ。
+    start_record を指定すると途中のページから再開する。
+    """
+    api = API_MODES[collection_api]
+    first = fetch_speeches(from_date, until_date, start_record=start_record)
+    total = int(first.get("numberOfRecords", 0))
+    print(f"  期間 {from_date} ~ {until_date}: {total}件の{api['unit']}")
 
     if total == 0:
-        return []
+        return
 
-    records = first.get("speechRecord", [])
-    if isinstance(records, dict):
-        records = [records]
-    all_records.extend(records)
-
-    while len(all_records) < total:
-        start += MAX_RECORDS_PER_REQUEST
-        time.sleep(REQUEST_INTERVAL)
-        print(f"    取得中... {len(all_records)}/{total}")
-        data = fetch_speeches(from_date, until_date, start_record=start)
-        records = data.get("speechRecord", [])
-        if isinstance(records, dict):
-            records = [records]
-        if not records:
-            break
+    yield start_record, page_records(first)
+
+    offsets = iter(range(start_record + api["page_size"], total + 1, api["page_size"]))
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = deque(
+            (start, pool.submit(fetch_speeches, from_date, until_date, start))
+            for start in islice(offsets, concurrency)
+        )
+        try:
+            while pending:
+                start, future = pending.popleft()
+                records = page_records(future.result())
+                if not records:
+                    return
+                next_start = next(offsets, None)
+                if next_start is not None:
+                    pending.append((next_start, pool.submit(fetch_speeches, from_date, until_date, next_start)))
+                print(f"    取得中... {min(start - 1 + api['page_size'], total)}/{total}")
+                yield start, records
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def cache_windows(from_date: str, until_date: str) -> list[tuple[str, str]]:
+    """
+    レスポンスキャッシュが効くように期間を区切る。
+    キャッシュはクエリ単位なので、前回までの実行と同じ期間（1ページ目を保存済みのもの）はそのまま使い、
+    その間のキャッシュのない日はまとめて1つの期間にする。キャッシュが空（Actions の毎回新しい環境）なら区切らない。
+    """
+    if not response_cache:
+        return [(from_date, until_date)]
+    api = API_MODES[collection_api]
+    cached = response_cache.cached_windows(api["url"], api["page_size"], from_date, until_date)
+
+    def shift(date: str, days: int) -> str:
+        return (datetime.strptime(date, "%Y-%m-%d") + timedelta(days=days)).strftime("%Y-%m-%d")
+
+    # 開始日の早い順に、重ならないものを拾っていく
+    windows = []
+    position = from_date
+    for f, u in cached:
+        if f < position:
+            continue
+        if f > position:
+            windows.append((position, shift(f, -1)))
+        windows.append((f, u))
+        position = shift(u, 1)
+    if position <= until_date:
+        windows.append((position, until_date))
+    return windows
+
+
+def iter_window_pages(from_date: str, until_date: str, concurrency: int = FETCH_CONCURRENCY):
+    """cache_windows() の区切りごとに iter_speech_pages() を続けて回す"""
+    for f, u in cache_windows(from_date, until_date):
+        yield from iter_speech_pages(f, u, concurrency)
+
+
+def fetch_all_speeches(from_date: str, until_date: str, concurrency: int = FETCH_CONCURRENCY) -> list:
+    """全ページを巡回して発言を取得"""
+    all_records = []
+    for _, records in iter_window_pages(from_date, until_date, concurrency):
         all_records.extend(records)
 
-    print(f"  取得完了: {len(all_records)}件")
+    if all_records:
+        print(f"  取得完了: {len(all_records)}件")
     return all_records
 
 
@@ -96,20 +397,20 @@ def make_speech_id(record: dict) -> str:
     return key
 
 
-def record_to_meeting(record: dict) -> dict:
+def record_to_meeting(record: dict) -> MeetingRow:
     """API レコード → meetings テーブル（idは含めない、DBに任せる）"""
-    return {
-        "issue_id": record.get("issueID", ""),
-        "session": int(record.get("session", 0)) if record.get("session") else None,
-        "house": record.get("nameOfHouse", ""),
-        "meeting_name": record.get("nameOfMeeting", ""),
-        "issue_number": record.get("issue", ""),
-        "date": record.get("date", ""),
-        "meeting_url": record.get("meetingURL", ""),
-    }
-
-
-def record_to_speech(record: dict, issue_id_to_meeting_id: dict) -> dict | None:
+    return MeetingRow(
+        issue_id=record.get("issueID", ""),
+        session=int(record.get("session", 0)) if record.get("session") else None,
+        house=intern(record.get("nameOfHouse", "")),
+        meeting_name=intern(record.get("nameOfMeeting", "")),
+        issue_number=intern(record.get("issue", "")),
+        date=intern(record.get("date", "")),
+        meeting_url=record.get("meetingURL", ""),
+    )
+
+
+def record_to_speech(record: dict, issue_id_to_meeting_id: dict) -> SpeechRow | None:
     """API レコード → speeches テーブル
     meeting_id はDBの実値を使う（uuid5やmd5ではなく）
     """
@@ -119,44 +420,46 @@ def record_to_speech(record: dict, issue_id_to_meeting_id: dict) -> dict | None:
         print(f"  WARNING: issue_id={issue_id} のmeetingが見つからない、スキップ")
         return None
 
-    return {
-        "speech_id": make_speech_id(record),
-        "meeting_id": meeting_id,  # ★ DBの実際のIDを使用
-        "speech_order": int(record.get("speechOrder", 0)) if record.get("speechOrder") else None,
-        "speaker_name": record.get("speaker", ""),
-        "speaker_group": record.get("speakerGroup", ""),
-        "speaker_position": record.get("speakerPosition", ""),
-        "content": record.get("speech", ""),
-        "speech_url": record.get("speechURL", ""),
-        "date": record.get("date", ""),
-    }
+    return SpeechRow(
+        speech_id=make_speech_id(record),
+        meeting_id=meeting_id,  # ★ DBの実際のIDを使用
+        speech_order=int(record.get("speechOrder", 0)) if record.get("speechOrder") else None,
+        speaker_name=intern(record.get("speaker", "")),
+        speaker_group=intern(record.get("speakerGroup", "")),
+        speaker_position=intern(record.get("speakerPosition", "")),
+        content=record.get("speech", ""),
+        speech_url=record.get("speechURL", ""),
+        date=intern(record.get("date", "")),
+    )
 
 
-def record_to_legislator(record: dict) -> dict | None:
+def record_to_legislator(record: dict) -> LegislatorRow | None:
     """API レコード → legislators テーブル"""
     name = record.get("speaker", "").strip()
     if not name:
         return None
 
     group = record.get("speakerGroup", "")
+    yomi = record.get("speakerYomi") or ""
     position = record.get("speakerPosition", "")
     date = record.get("date", "")
     house = record.get("nameOfHouse", "")
     is_member = bool(group) and "大臣官房" not in (position or "")
 
-    return {
-        "name": name,
-        "current_party": group if group else None,
-        "current_position": position if position else None,
-        "house": house if house else None,
-        "is_member": is_member,
-        "last_seen": date,
-    }
+    return LegislatorRow(
+        name=intern(name),
+        current_party=intern(group) if group else None,
+        current_position=intern(position) if position else None,
+        house=intern(house) if house else None,
+        is_member=is_member,
+        last_seen=intern(date),
+        name_yomi=yomi or None,
+    )
 
 
 # === Supabase 書き込み ===
 
-def upsert_meetings(meetings: list[dict]) -> dict:
+def upsert_meetings(meetings: list[MeetingRow]) -> dict:
     """
     会議を upsert し、issue_id → meetings.id のマッピングを返す。
     既存行はスキップ（idを変更しない）。
@@ -167,38 +470,30 @@ def upsert_meetings(meetings: list[dict]) -> dict:
     # 重複除去（issue_id ベース）
     seen = {}
     for m in meetings:
-        if m["issue_id"]:
-            seen[m["issue_id"]] = m
+        if m.issue_id:
+            seen[m.issue_id] = m
     unique = list(seen.values())
 
-    # INSERT ... ON CONFLICT DO NOTHING
-    batch_size = 500
-    for i in range(0, len(unique), batch_size):
-        batch = unique[i:i + batch_size]
-        supabase.table("meetings").upsert(
-            batch, on_conflict="issue_id", ignore_duplicates=True
-        ).execute()
+    # INSERT ... ON CONFLICT DO NOTHING（並行して送り、マッピング取得の前に完了を待つ）
+    writer.write("meetings", (m.as_row() for m in unique), on_conflict="issue_id", ignore_duplicates=True,
+                 stage="upsert_meetings")
+    writer.flush("meetings")
     print(f"  会議: {len(unique)}件 upserted")
 
-    # ★ DBから実際の issue_id → id マッピングを取得
-    issue_ids = list(seen.keys())
-    issue_id_to_meeting_id = {}
-
-    chunk_size = 200  # PostgREST IN句の制限対策
-    for i in range(0, len(issue_ids), chunk_size):
-        chunk = issue_ids[i:i + chunk_size]
-        result = supabase.table("meetings") \
-            .select("id, issue_id") \
-            .in_("issue_id", chunk) \
-            .execute()
-        for row in (result.data or []):
-            issue_id_to_meeting_id[row["issue_id"]] = row["id"]
+    # ★ DBから実際の issue_id → id マッピングを取得（ローカルキャッシュにないものだけ）
+    with metrics.stage("meeting_mapping") as stage:
+        issue_id_to_meeting_id = lookup_cache.lookup(
+            "meetings", seen.keys(),
+            lambda missing: fetch_in_chunks(supabase, "meetings", "id, issue_id", "issue_id", missing,
+                                            lambda row: (row["issue_id"], row["id"])),
+        )
+        stage.rows = len(issue_id_to_meeting_id)
 
     print(f"  マッピング取得: {len(issue_id_to_meeting_id)}件")
     return issue_id_to_meeting_id
 
 
-def upsert_speeches(speeches: list[dict]):
+def upsert_speeches(speeches: list[SpeechRow]):
     """発言を upsert（speech_id UNIQUE制約で冪等）"""
     if not speeches:
         return
@@ -206,77 +501,472 @@ def upsert_speeches(speeches: list[dict]):
     # 重複除去
     seen = {}
     for s in speeches:
-        seen[s["speech_id"]] = s
+        seen[s.speech_id] = s
     unique = list(seen.values())
 
-    # upsert: speech_id が既に存在すればスキップ
-    batch_size = 200
-    inserted = 0
-    for i in range(0, len(unique), batch_size):
-        batch = unique[i:i + batch_size]
-        supabase.table("speeches").upsert(
-            batch, on_conflict="speech_id", ignore_duplicates=True
-        ).execute()
-        inserted += len(batch)
+    # upsert: speech_id が既に存在すればスキップ（並行して送り、全部終わるまで待つ）
+    # 本文が長いので、バッチは行数ではなく送信バイト数で区切られる。dict にするのは送るバッチの分だけ
+    writer.write("speeches", (s.as_row() for s in unique), on_conflict="speech_id", ignore_duplicates=True,
+                 stage="upsert_speeches")
+    writer.flush("speeches")
     print(f"  発言: {len(unique)}件 upserted")
 
+    # 書き込めた分だけ全文検索インデックスに足す（メモリに溜め、一定量ごと・flush_index でセグメントに書き出す）
+    if speech_index is not None:
+        with metrics.stage("index_speeches") as stage:
+            stage.rows = speech_index.add_many((s.speech_id, s.content) for s in unique)
+
+
+def open_speech_index():
+    """全文検索インデックスを開く。speech_index.py はロックに fcntl を使うので、--index のときだけ import する"""
+    from speech_index import INDEX_DIR, SpeechIndex
+    if not INDEX_DIR:
+        print("ERROR: --index には索引の保存先が必要です（SPEECH_INDEX_DIR）")
+        sys.exit(1)
+    return SpeechIndex(INDEX_DIR)
+
+
+def flush_index():
+    """溜めた発言を全文検索インデックスに書き出す（終了時・シャードの終わりに呼ぶ）"""
+    if speech_index is None:
+        return
+    with metrics.stage("index_flush") as stage:
+        stage.rows = len(speech_index.buffer_ids)
+        speech_index.flush()
 
-def upsert_legislators(legislators: list[dict]):
-    """議員を upsert"""
+
+def load_speaker_index() -> SpeakerIndex:
+    """legislators のキャッシュを差分更新して、発言者名の名寄せ索引を作る"""
+    lookup_cache.refresh("legislators", supabase, "legislators", LEGISLATOR_COLUMNS, "last_seen", legislator_item)
+    return load_index(lookup_cache)
+
+
+def upsert_legislators(legislators: list[LegislatorRow]):
+    """
+    議員を upsert。
+    発言者名を名寄せ索引で既存の議員に寄せ（表記揺れで重複登録しない）、差分を手元で計算し、
+    新規は複数行 insert、last_seen が進んだ既存行は id 指定の複数行 upsert でまとめて送る。
+    """
     if not legislators:
         return
 
     by_name = {}
-    for leg in legislators:
-        name = leg["name"]
-        if name not in by_name or (leg.get("last_seen", "") > by_name[name].get("last_seen", "")):
-            by_name[name] = leg
+    merge_legislators(by_name, legislators)
+
+    with metrics.stage("legislator_mapping") as stage:
+        index = load_speaker_index()
+        existing, counts = resolve_many(index, lookup_cache, supabase,
+                                        {name: (l.name_yomi, l.current_party) for name, l in by_name.items()})
+        stage.rows = len(existing)
+    save_aliases(lookup_cache, index, existing)
+    print(f"  名寄せ: {format_counts(counts)}")
+    report_review(index)
+
+    new = {}  # 正規化キー → 議員（表記だけ違う新人は1行にまとめる）
+    latest = {}  # 既存の議員ID → その議員として見た最新の発言者
+    for name, leg in by_name.items():
+        ex = existing.get(name)
+        group, key = (new, normalize_name(name)) if ex is None else (latest, ex["id"])
+        if key not in group or leg.last_seen > group[key].last_seen:
+            group[key] = leg
+    inserts = list(new.values())
+
+    updates = []
+    for leg_id, leg in latest.items():
+        ex = index.by_id[leg_id]
+        if leg.last_seen > (ex.get("last_seen") or ""):
+            updates.append({
+                "id": leg_id,
+                "name": ex["name"],  # 表記はDBのまま
+                "name_yomi": ex.get("name_yomi") or leg.name_yomi,
+                "last_seen": leg.last_seen,
+                "current_party": leg.current_party,
+            })
+
+    inserted = writer.write("legislators", (l.as_row() for l in inserts), returning="representation",
+                            stage="insert_legislators")
+    updated = writer.write("legislators", updates, on_conflict="id", stage="update_legislators")
+    requests_made = len(inserted) + len(updated)
+    writer.flush("legislators")
+    inserted_ids = {}  # 正規化キー → 新規に登録した議員ID
+    for batch in inserted:
+        rows = batch.result().data or []
+        lookup_cache.put_many("legislators", dict(legislator_item(r) for r in rows))
+        inserted_ids.update((normalize_name(r["name"]), r["id"]) for r in rows)
+    lookup_cache.put_many("legislators", dict(legislator_item(r) for r in updates))
+
+    # 従来の1行1リクエスト方式なら新規/更新ごとに1回
+    per_row_requests = len(inserts) + len(updates)
+    print(f"  議員: 新規{len(inserts)}件, 更新{len(updates)}件 "
+          f"(書き込みリクエスト {requests_made}回, 1行ずつなら {per_row_requests}回)")
+
+    ids = {name: existing[name]["id"] if name in existing else inserted_ids.get(normalize_name(name))
+           for name in by_name}
+    link_legislators_to_speeches({name: leg_id for name, leg_id in ids.items() if leg_id is not None})
+
+
+def fetch_unlinked_speakers(names: list[str] | None = None, page_size: int = 1000) -> dict[str, int]:
+    """
+    legislator_id が NULL の発言を id のキーセットで走査し、speaker_name → 件数 を返す。
+    names を渡せばその発言者の分だけ（IN_CHUNK_SIZE 人ずつ）、省略すれば全件
+    """
+    speakers = {}
+    chunks = [names[i:i + IN_CHUNK_SIZE] for i in range(0, len(names), IN_CHUNK_SIZE)] if names is not None else [None]
+    for chunk in chunks:
+        last_id = None
+        while True:
+            query = supabase.table("speeches") \
+                .select("id, speaker_name") \
+                .is_("legislator_id", "null")
+            if chunk is not None:
+                query = query.in_("speaker_name", chunk)
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            result = query.order("id").limit(page_size).execute()
+            rows = result.data or []
+            for r in rows:
+                speakers[r["speaker_name"]] = speakers.get(r["speaker_name"], 0) + 1
+            if len(rows) < page_size:
+                break
+            last_id = rows[-1]["id"]
+    return speakers
+
+
+def link_speakers(names_by_id: dict[int, list[str]], speakers: dict[str, int]) -> tuple[int, int]:
+    """議員1人につき1回の UPDATE で、その議員の表記（speaker_name）の未リンク発言を紐付ける。(件数, UPDATE回数) を返す"""
+    linked = 0
+    for leg_id, names in names_by_id.items():
+        with metrics.stage("link_legislators") as stage:
+            query = supabase.table("speeches") \
+                .update({"legislator_id": leg_id}, count="exact", returning="minimal") \
+                .in_("speaker_name", names) \
+                .is_("legislator_id", "null")
+            result = execute_with_retry(query, "speeches")
+            stage.rows = result.count if result.count is not None else sum(speakers[n] for n in names)
+        linked += stage.rows
+    return linked, len(names_by_id)
+
+
+def report_linked(linked: int, updates: int, started: float):
+    """リンクした件数と速さを表示"""
+    if linked:
+        elapsed = time.monotonic() - started
+        print(f"  リンク: {linked}件の発言に議員IDを紐付け "
+              f"(UPDATE {updates}回, {elapsed:.1f}秒, {linked / max(elapsed, 0.001):.0f}件/秒)")
 
-    existing = {}
-    result = supabase.table("legislators").select("id, name, last_seen").execute()
-    for r in (result.data or []):
-        existing[r["name"]] = r
 
-    new_count = 0
-    update_count = 0
+def link_legislators_to_speeches(legislator_ids: dict[str, int]):
+    """
+    この実行で書き込んだ発言に議員をリンク。
+    発言者名 → 議員ID は upsert_legislators で名寄せ・登録した結果をそのまま使い（名寄せはやり直さない）、
+    未リンク発言はこの実行の発言者の分だけ走査して、残っている議員にだけ UPDATE を送る
+    （過去の取りこぼしは --link-all で補修）。
+    """
+    started = time.monotonic()
+    with metrics.stage("unlinked_scan") as stage:
+        speakers = fetch_unlinked_speakers(list(legislator_ids))
+        stage.rows = sum(speakers.values())
+    names_by_id = {}
+    for name in speakers:
+        names_by_id.setdefault(legislator_ids[name], []).append(name)
+    report_linked(*link_speakers(names_by_id, speakers), started)
 
-    for name, leg in by_name.items():
-        if name in existing:
-            ex = existing[name]
-            if leg.get("last_seen", "") > (ex.get("last_seen") or ""):
-                supabase.table("legislators").update({
-                    "last_seen": leg["last_seen"],
-                    "current_party": leg["current_party"],
-                }).eq("id", ex["id"]).execute()
-                update_count += 1
-        else:
-            supabase.table("legislators").insert(leg).execute()
-            new_count += 1
 
-    print(f"  議員: 新規{new_count}件, 更新{update_count}件")
+def link_all_unlinked_speeches():
+    """
+    legislator_id が NULL の発言を全件走査してリンクする（--link-all。過去の実行の取りこぼしの補修用）。
+    未リンク発言を speaker_name でまとめて名寄せ索引で引き、議員1人につき1回の UPDATE で紐付ける。
+    走査中に増えた分も拾えるよう、リンクできる発言がなくなるまで繰り返す。
+    前の周で引いた名前（引けなかった名前も）は覚えておき、次の周では問い合わせない。
+    """
+    started = time.monotonic()
+    index = load_speaker_index()
+
+    resolved = {}  # 名前 → 議員
+    tried = set()  # 引いた名前（引けなかったものも）
+    linked = 0
+    updates = 0
+    while True:
+        with metrics.stage("unlinked_scan") as stage:
+            speakers = fetch_unlinked_speakers()
+            stage.rows = sum(speakers.values())
+        with metrics.stage("legislator_mapping") as stage:
+            fresh = [name for name in speakers if name not in tried]
+            found, _ = resolve_many(index, lookup_cache, supabase, dict.fromkeys(fresh, (None, None)))
+            resolved.update(found)
+            tried.update(fresh)
+            stage.rows = len(found)
+        names_by_id = {}
+        for name in speakers:
+            if name in resolved:
+                names_by_id.setdefault(resolved[name]["id"], []).append(name)
+        if not names_by_id:
+            break
+
+        linked_this_round, updates_this_round = link_speakers(names_by_id, speakers)
+        linked += linked_this_round
+        updates += updates_this_round
+        if not linked_this_round:
+            break
 
-    link_legislators_to_speeches()
+    unresolved = len(tried) - len(resolved)
+    print(f"  未リンクの発言者: {len(tried)}名（議員が見つからない {unresolved}名）")
+    report_linked(linked, updates, started)
 
 
-def link_legislators_to_speeches():
-    """legislator_id が NULL の speeches に議員をリンク"""
-    result = supabase.table("speeches").select("id, speaker_name").is_("legislator_id", "null").limit(1000).execute()
-    unlinked = result.data or []
-    if not unlinked:
-        return
+# === ストリーミング収集 ===
 
-    legs_result = supabase.table("legislators").select("id, name").execute()
-    name_to_id = {r["name"]: r["id"] for r in (legs_result.data or [])}
+def merge_legislators(by_name: dict, legislators):
+    """名前ごとに last_seen が最新の議員だけ残す"""
+    for leg in legislators:
+        current = by_name.get(leg.name)
+        if current is None or leg.last_seen > current.last_seen:
+            by_name[leg.name] = leg
 
-    linked = 0
-    for sp in unlinked:
-        leg_id = name_to_id.get(sp["speaker_name"])
-        if leg_id:
-            supabase.table("speeches").update({"legislator_id": leg_id}).eq("id", sp["id"]).execute()
-            linked += 1
 
-    if linked:
-        print(f"  リンク: {linked}件の発言に議員IDを紐付け")
+def write_chunk(records: list, stats: dict):
+    """レコード1チャンクを meetings → speeches の順に書き込む"""
+    meetings_data = [record_to_meeting(r) for r in records]
+    issue_id_to_meeting_id = upsert_meetings(meetings_data)
+    stats["issue_ids"].update(m.issue_id for m in meetings_data if m.issue_id)
+
+    speeches = []
+    for r in records:
+        sp = record_to_speech(r, issue_id_to_meeting_id)
+        if sp:
+            speeches.append(sp)
+        else:
+            stats["skipped"] += 1
+    upsert_speeches(speeches)
+    stats["speeches"] += len(speeches)
+
+
+def collect_streaming(from_date: str, until_date: str, concurrency: int = FETCH_CONCURRENCY,
+                      start_record: int = 1, on_commit=None, pages=None) -> dict:
+    """
+    取得 → 変換 → upsert をページ単位で流す（pages を渡せば API の代わりにそれを使う）。
+    手元に持つのは未書き込みの1チャンク（STREAM_CHUNK_RECORDS件）と先読み中のページ、
+    名前で重複除去した議員だけなので、期間が長くてもメモリはほぼ一定。
+    チャンクを書き込むたびに on_commit(次のstartRecord, チャンク内の議員) を呼ぶ。
+    議員の upsert は呼び出し側で stats["legislators"] を使って行う。
+    """
+    stats = {"issue_ids": set(), "speeches": 0, "skipped": 0}
+    legislators_by_name = {}
+    chunk = []
+    next_start = start_record
+
+    def commit():
+        write_chunk(chunk, stats)
+        chunk_legislators = {}
+        merge_legislators(chunk_legislators, filter(None, map(record_to_legislator, chunk)))
+        merge_legislators(legislators_by_name, chunk_legislators.values())
+        if on_commit:
+            on_commit(next_start, list(chunk_legislators.values()))
+
+    if pages is None:
+        pages = iter_speech_pages(from_date, until_date, concurrency, start_record)  # 再開位置があるので区切らない
+    for start, records in pages:
+        chunk.extend(records)
+        next_start = start + API_MODES[collection_api]["page_size"]  # 会議単位出力では発言数でなく会議数で進む
+        if len(chunk) >= STREAM_CHUNK_RECORDS:
+            commit()
+            chunk = []
+    if chunk:
+        commit()
+
+    if stats["skipped"]:
+        print(f"  WARNING: {stats['skipped']}件の発言がmeetingマッピング欠損でスキップ")
+
+    stats["legislators"] = legislators_by_name
+    return stats
+
+
+# === シャード分割バックフィル ===
+
+class Checkpoint:
+    """
+    シャードごとの進捗（次の startRecord / 完了フラグ・完了日）と、
+    まだ legislators に反映していない議員を SQLite に記録する。
+    複数のワーカープロセスから同時に書き込まれる前提。
+    完了扱いが続くのは、完了した時点で until が IMMUTABLE_DAYS 日以上前だったシャードだけ
+    （それより新しい期間は、あとから公開される発言を拾うため次の実行でもう一度取る）。
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH, immutable_days: int = IMMUTABLE_DAYS):
+        self.immutable_days = immutable_days
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS shards (
+                from_date TEXT NOT NULL,
+                until_date TEXT NOT NULL,
+                next_start INTEGER NOT NULL DEFAULT 1,
+                done INTEGER NOT NULL DEFAULT 0,
+                finished_at TEXT,
+                PRIMARY KEY (from_date, until_date)
+            );
+            CREATE TABLE IF NOT EXISTS pending_legislators (
+                name TEXT PRIMARY KEY,
+                last_seen TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+        """)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(shards)")}
+        if "finished_at" not in columns:  # 完了日を記録する前のチェックポイント
+            with self.conn:
+                self.conn.execute("ALTER TABLE shards ADD COLUMN finished_at TEXT")
+
+    def status(self, from_date: str, until_date: str) -> tuple[int, bool]:
+        """(次の startRecord, 完了済みか) を返す。完了していても直近の期間なら (1, False)（最初から取り直す）"""
+        row = self.conn.execute(
+            "SELECT next_start, done, finished_at FROM shards WHERE from_date = ? AND until_date = ?",
+            (from_date, until_date),
+        ).fetchone()
+        if row is None:
+            return 1, False
+        next_start, done, finished_at = row
+        if not done:
+            return next_start, False
+        # 完了日を記録する前の行は今日を完了日とみなす
+        finished = datetime.strptime(finished_at, "%Y-%m-%d") if finished_at else datetime.now()
+        if until_date <= (finished - timedelta(days=self.immutable_days)).strftime("%Y-%m-%d"):
+            return next_start, True
+        return 1, False
+
+    def commit(self, from_date: str, until_date: str, next_start: int, legislators: list[LegislatorRow]):
+        """チャンク書き込み完了を記録（進捗と議員を同一トランザクションで）"""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO shards (from_date, until_date, next_start) VALUES (?, ?, ?) "
+                "ON CONFLICT (from_date, until_date) DO UPDATE SET next_start = excluded.next_start",
+                (from_date, until_date, next_start),
+            )
+            self.conn.executemany(
+                "INSERT INTO pending_legislators (name, last_seen, data) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET last_seen = excluded.last_seen, data = excluded.data "
+                "WHERE excluded.last_seen > pending_legislators.last_seen",
+                [(l.name, l.last_seen, json.dumps(l.as_row(), ensure_ascii=False)) for l in legislators],
+            )
+
+    def finish(self, from_date: str, until_date: str):
+        """シャード完了を記録（完了日も）"""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO shards (from_date, until_date, done, finished_at) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT (from_date, until_date) DO UPDATE SET done = 1, finished_at = excluded.finished_at",
+                (from_date, until_date, datetime.now().strftime("%Y-%m-%d")),
+            )
+
+    def reset(self) -> int:
+        """シャードの進捗を消す（未反映の議員は残す）。消した件数を返す"""
+        with self.conn:
+            return self.conn.execute("DELETE FROM shards").rowcount
+
+    def pending_legislators(self) -> list[LegislatorRow]:
+        return [LegislatorRow(**json.loads(row[0])) for row in self.conn.execute("SELECT data FROM pending_legislators")]
+
+    def clear_legislators(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM pending_legislators")
+
+
+def split_range(from_date: str, until_date: str, shard: str) -> list[tuple[str, str]]:
+    """期間を day / week 単位のシャードに分割"""
+    step = timedelta(days=7 if shard == "week" else 1)
+    start = datetime.strptime(from_date, "%Y-%m-%d")
+    end = datetime.strptime(until_date, "%Y-%m-%d")
+    shards = []
+    while start <= end:
+        shard_end = min(start + step - timedelta(days=1), end)
+        shards.append((start.strftime("%Y-%m-%d"), shard_end.strftime("%Y-%m-%d")))
+        start = shard_end + timedelta(days=1)
+    return shards
+
+
+def run_shard(from_date: str, until_date: str, checkpoint_path: str,
+              concurrency: int = FETCH_CONCURRENCY, workers: int = 1, archive_raw: bool = False,
+              use_cache: bool = True, api: str = "speech", build_index: bool = False) -> tuple[int, dict]:
+    """
+    1シャードを取得・書き込みし、(書き込んだ発言数, 計測値) を返す。
+    ワーカープロセスから呼ばれる。プロセス数だけ間隔を広げて、全体のAPI礼儀上限を保つ。
+    計測値は親プロセスで metrics.merge() する（ワーカーは使い回されるのでシャードごとにリセット）。
+    """
+    global rate_limiter, archive, response_cache, collection_api, speech_index
+    rate_limiter = RateLimiter(rate=1 / (REQUEST_INTERVAL * workers))
+    mount_http(concurrency)
+    collection_api = api
+    if not archive_raw:
+        archive = None
+    elif archive is None:  # ワーカーは使い回されるので、開くのは最初のシャードだけ
+        archive = SpeechArchive(ARCHIVE_DIR)
+    if not build_index:
+        speech_index = None
+    elif speech_index is None:
+        speech_index = open_speech_index()
+    if not use_cache:
+        response_cache = None
+    metrics.reset()
+
+    checkpoint = Checkpoint(checkpoint_path)
+    start_record, done = checkpoint.status(from_date, until_date)
+    if done:
+        return 0, metrics.snapshot()
+    if start_record > 1:
+        print(f"  [{from_date}] startRecord={start_record} から再開")
+
+    stats = collect_streaming(
+        from_date, until_date, concurrency, start_record,
+        on_commit=lambda next_start, legs: checkpoint.commit(from_date, until_date, next_start, legs),
+    )
+    flush_index()
+    checkpoint.finish(from_date, until_date)
+    return stats["speeches"], metrics.snapshot()
+
+
+def collect_sharded(from_date: str, until_date: str, shard: str, workers: int,
+                    concurrency: int = FETCH_CONCURRENCY, checkpoint_path: str = CHECKPOINT_PATH,
+                    archive_raw: bool = False, use_cache: bool = True, build_index: bool = False) -> bool:
+    """
+    期間をシャードに分けて並列に収集する。完了済みシャードはスキップ、途中のものは続きから。
+    議員はチェックポイントに溜めておき、最後にまとめて upsert する。
+    全シャード成功なら True。
+    """
+    checkpoint = Checkpoint(checkpoint_path)
+    shards = split_range(from_date, until_date, shard)
+    todo = [s for s in shards if not checkpoint.status(*s)[1]]
+    print(f"シャード: {len(shards)}件 (完了済み {len(shards) - len(todo)}件, ワーカー {workers})")
+
+    speeches = 0
+    failed = []
+    # fork だと Supabase クライアントの接続を子プロセスと共有してしまうので spawn
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = {
+            pool.submit(run_shard, f, u, checkpoint_path, concurrency, workers, archive_raw, use_cache,
+                        collection_api, build_index): (f, u)
+            for f, u in todo
+        }
+        for future in as_completed(futures):
+            f, u = futures[future]
+            try:
+                written, snapshot = future.result()
+                speeches += written
+                metrics.merge(snapshot)
+            except Exception as e:
+                print(f"  ERROR: シャード {f} ~ {u} 失敗: {e}")
+                failed.append((f, u))
+
+    # 失敗シャードがあっても、書き込み済みチャンクの議員は反映しておく
+    legislators = checkpoint.pending_legislators()
+    upsert_legislators(legislators)
+    checkpoint.clear_legislators()
+
+    print()
+    print(f"  発言: {speeches}件")
+    print(f"  発言者: {len(legislators)}人")
+    if failed:
+        print(f"  失敗シャード: {len(failed)}件（再実行すると続きから再開）")
+    return not failed
 
 
 # === メイン ===
@@ -294,15 +984,71 @@ def main():
     parser.add_argument("--days", type=int, default=3, help="最新N日分を取得 (デフォルト: 3)")
     parser.add_argument("--from", dest="from_date", help="開始日 (YYYY-MM-DD)")
     parser.add_argument("--until", dest="until_date", help="終了日 (YYYY-MM-DD)")
+    parser.add_argument("--concurrency", type=int, default=FETCH_CONCURRENCY,
+                        help=f"API同時リクエスト数 (デフォルト: {FETCH_CONCURRENCY})")
+    parser.add_argument("--stream", action="store_true",
+                        help="ページごとに変換・書き込みする（長期間のバックフィル向け）")
+    parser.add_argument("--shard", choices=["day", "week"],
+                        help="期間を日/週単位に分割し、チェックポイント付きで収集（中断しても再開可能）")
+    parser.add_argument("--workers", type=int, default=1, help="--shard 時の並列プロセス数 (デフォルト: 1)")
+    parser.add_argument("--checkpoint",
+                        help=f"--shard 時のチェックポイントファイル (デフォルト: {CHECKPOINT_PATH}、"
+                             f"--api meeting では {MEETING_CHECKPOINT_PATH})")
+    parser.add_argument("--reset-checkpoint", action="store_true",
+                        help="--shard の進捗を消して全シャードを取り直す（変換を直したあとなど）")
+    parser.add_argument("--api", choices=list(API_MODES), default="speech",
+                        help="speech: 発言単位で100件ずつ, meeting: 会議単位で10会議ずつ (デフォルト: speech)")
+    parser.add_argument("--metrics", help="計測結果の出力先（.prom なら Prometheus 形式、それ以外は JSON lines）")
+    parser.add_argument("--replay", action="store_true",
+                        help="APIを叩かず、保存済みの生レコード（アーカイブ）から変換・書き込みする")
+    parser.add_argument("--archive", action="store_true",
+                        help="取得した生レコードをアーカイブ（SPEECH_ARCHIVE_DIR）に保存する（--replay 用）")
+    parser.add_argument("--no-cache", action="store_true", help="APIレスポンスのキャッシュを使わない（必ず取り直す）")
+    parser.add_argument("--index", action="store_true",
+                        help="書き込んだ発言を全文検索インデックス（SPEECH_INDEX_DIR）に足す")
+    parser.add_argument("--link-all", action="store_true",
+                        help="収集はせず、議員IDのない発言を全件走査してリンクする（過去の取りこぼしの補修）")
     args = parser.parse_args()
+    if args.replay and args.shard:
+        parser.error("--replay と --shard は同時に指定できません（長期間の作り直しは --replay --stream）")
+    if args.reset_checkpoint and not args.shard:
+        parser.error("--reset-checkpoint は --shard と一緒に指定してください")
+
+    global archive, response_cache, collection_api, speech_index
+    collection_api = args.api
+    mount_http(args.concurrency)
+    checkpoint_path = args.checkpoint or (MEETING_CHECKPOINT_PATH if args.api == "meeting" else CHECKPOINT_PATH)
+    if args.archive or args.replay:
+        if not ARCHIVE_DIR:
+            print("ERROR: --archive / --replay にはアーカイブの保存先が必要です（SPEECH_ARCHIVE_DIR）")
+            sys.exit(1)
+        archive = SpeechArchive(ARCHIVE_DIR)
+    if args.no_cache:
+        response_cache = None
+    if args.index:
+        speech_index = open_speech_index()
+
+    # 途中の return / sys.exit でも最後に書き出す（インデックスを先に書き出して、その計測も残す）
+    atexit.register(metrics.write, "collect_daily", args.metrics)
+    atexit.register(flush_index)
 
     print("=" * 50)
     print("国会会議録 自動収集")
     print("=" * 50)
 
+    if args.link_all:
+        link_all_unlinked_speeches()
+        return
+
     if args.from_date and args.until_date:
         from_date = args.from_date
         until_date = args.until_date
+    elif args.replay:
+        stats = archive.stats()
+        if not stats["records"]:
+            print("アーカイブが空です")
+            return
+        from_date, until_date = args.from_date or stats["from"], args.until_date or stats["until"]
     else:
         latest = get_latest_date()
         from_dt = datetime.strptime(latest, "%Y-%m-%d") - timedelta(days=1)
@@ -313,8 +1059,40 @@ def main():
     print(f"取得期間: {from_date} ~ {until_date}")
     print()
 
-    # API から取得
-    records = fetch_all_speeches(from_date, until_date)
+    if args.shard:
+        if args.reset_checkpoint:
+            print(f"チェックポイントを消去: {Checkpoint(checkpoint_path).reset()}シャード")
+        ok = collect_sharded(from_date, until_date, args.shard, args.workers,
+                             args.concurrency, checkpoint_path, archive_raw=archive is not None,
+                             use_cache=response_cache is not None, build_index=speech_index is not None)
+        print()
+        print("完了!" if ok else "一部のシャードが失敗しました")
+        if not ok:
+            sys.exit(1)
+        return
+
+    if args.stream:
+        if args.replay:
+            pages = archive.iter_pages(from_date, until_date)
+        else:
+            pages = iter_window_pages(from_date, until_date, args.concurrency)
+        stats = collect_streaming(from_date, until_date, args.concurrency, pages=pages)
+        if not stats["issue_ids"]:
+            print("新着データなし")
+            return
+        upsert_legislators(list(stats["legislators"].values()))
+        print()
+        print("完了!")
+        print(f"  会議: {len(stats['issue_ids'])}件")
+        print(f"  発言: {stats['speeches']}件")
+        print(f"  発言者: {len(stats['legislators'])}人")
+        return
+
+    # API（--replay ならアーカイブ）から取得
+    if args.replay:
+        records = [r for _, page in archive.iter_pages(from_date, until_date) for r in page]
+    else:
+        records = fetch_all_speeches(from_date, until_date, args.concurrency)
     if not records:
         print("新着データなし")
         return
@@ -350,9 +1128,9 @@ def main():
 
     print()
     print("完了!")
-    print(f"  会議: {len(set(m['issue_id'] for m in meetings_data if m['issue_id']))}件")
+    print(f"  会議: {len(set(m.issue_id for m in meetings_data if m.issue_id))}件")
     print(f"  発言: {len(speeches)}件")
-    print(f"  発言者: {len(set(l['name'] for l in legislators))}人")
+    print(f"  発言者: {len(set(l.name for l in legislators))}人")
 
 
 if __name__ == "__main__":
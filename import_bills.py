@@ -7,13 +7,28 @@ import_bills.py - SmartNews SMRI の議案データをSupabaseにインポート
   python import_bills.py --shu house-of-representatives/data/gian.csv
   python import_bills.py --san house-of-councillors/data/gian.csv
   python import_bills.py --shu house-of-representatives/data/gian.csv --san house-of-councillors/data/gian.csv
+  python import_bills.py --shu house-of-representatives/data/gian.csv --delta  # 前回から変わった議案だけ送信
+  python import_bills.py --source shu=gian_1-150.csv --source shu=gian_151-.csv --jobs 2  # 追加のCSV・同時実行数
+
+ファイルが複数あるときは、ファイルごとに別のワーカープロセスで同時に取り込む（出力の行頭に [院:ファイル名]）。
+同じ議案が複数のファイルにあると、どちらの内容が残るかは決まらないので、ファイルは会期などで重ならないように分ける。
 """
 
 import os
 import sys
 import csv
+import json
+import atexit
+import hashlib
 import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from supabase import create_client
+from lookup_cache import LookupCache
+from metrics import metrics
+from supabase_writer import BatchWriter
+from row_types import BillRow, VoteRow, intern
 
 SUPABASE_URL = os.environ.get("SUPABASE_URL", "")
 SUPABASE_KEY = os.environ.get("SUPABASE_SERVICE_KEY", "")
@@ -23,6 +38,12 @@ if not SUPABASE_URL or not SUPABASE_KEY:
     sys.exit(1)
 
 supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+lookup_cache = LookupCache()
+writer = BatchWriter(supabase)
+
+PARSE_CHUNK_ROWS = 2000  # ワーカーに渡す1チャンクの行数
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024  # これより小さいCSVは1プロセスでパース（1プロセスで約10MB/秒。ワーカーの起動が割に合わない）
+HOUSES = {"shu": "衆議院", "san": "参議院", "衆議院": "衆議院", "参議院": "参議院"}
 
 
 def parse_int(val: str) -> int | None:
@@ -68,8 +89,8 @@ def parse_parties(party_str: str) -> list[str]:
     return [p.strip() for p in parties if p.strip()]
 
 
-def process_shu_row(row: dict) -> tuple[dict, list[dict]]:
-    """衆議院CSV 1行 → (bill_dict, vote_list)"""
+def process_shu_row(row: dict) -> tuple[BillRow, list[VoteRow]]:
+    """衆議院CSV 1行 → (BillRow, [VoteRow])"""
     # 審議結果を抽出
     date_result = row.get('衆議院審議終了年月日／衆議院審議結果', '')
     date_passed, result = extract_result(date_result)
@@ -80,156 +101,318 @@ def process_shu_row(row: dict) -> tuple[dict, list[dict]]:
     # 議案受理日
     date_submitted = row.get('衆議院議案受理年月日', '').strip()
 
-    bill = {
-        'house': '衆議院',
-        'session': parse_int(row.get('掲載回次', '')),
-        'submit_session': parse_int(row.get('提出回次', '')),
-        'bill_type': row.get('議案種類', '').strip() or row.get('種類', '').strip(),
-        'bill_number': parse_int(row.get('番号', '')),
-        'bill_name': row.get('議案件名', '').strip(),
-        'caption': row.get('キャプション', '').strip(),
-        'status': row.get('審議状況', '').strip(),
-        'proposer': row.get('議案提出者', '').strip(),
-        'proposer_party': row.get('議案提出会派', '').strip(),
-        'committee': committee,
-        'date_submitted': date_submitted,
-        'date_passed': date_passed,
-        'result': result,
-        'law_number': row.get('公布年月日／法律番号', '').strip(),
-        'progress_url': row.get('経過情報URL', '').strip(),
-    }
+    bill = BillRow(
+        house='衆議院',
+        session=parse_int(row.get('掲載回次', '')),
+        submit_session=parse_int(row.get('提出回次', '')),
+        bill_type=intern(row.get('議案種類', '').strip() or row.get('種類', '').strip()),
+        bill_number=parse_int(row.get('番号', '')),
+        bill_name=row.get('議案件名', '').strip(),
+        caption=row.get('キャプション', '').strip(),
+        status=intern(row.get('審議状況', '').strip()),
+        proposer=row.get('議案提出者', '').strip(),
+        proposer_party=intern(row.get('議案提出会派', '').strip()),
+        committee=intern(committee),
+        date_submitted=intern(date_submitted),
+        date_passed=intern(date_passed),
+        result=intern(result),
+        law_number=row.get('公布年月日／法律番号', '').strip(),
+        progress_url=row.get('経過情報URL', '').strip(),
+    )
 
     # 賛否データ
     votes = []
     for party in parse_parties(row.get('衆議院審議時賛成会派', '')):
-        votes.append({'party_name': party, 'vote': '賛成', 'chamber': '衆議院'})
+        votes.append(VoteRow(party_name=intern(party), vote='賛成', chamber='衆議院'))
     for party in parse_parties(row.get('衆議院審議時反対会派', '')):
-        votes.append({'party_name': party, 'vote': '反対', 'chamber': '衆議院'})
+        votes.append(VoteRow(party_name=intern(party), vote='反対', chamber='衆議院'))
 
     return bill, votes
 
 
-def process_san_row(row: dict) -> tuple[dict, list[dict]]:
-    """参議院CSV 1行 → (bill_dict, vote_list)"""
-    # 参議院CSVのカラム名は異なる可能性がある
-    # まずキー一覧から推測
-    keys = list(row.keys())
+def resolve_san_columns(fieldnames) -> dict:
+    """
+    参議院CSVはカラム名が揺れるので、ヘッダーから使うカラムを推測する。
+    ファイルごとに1回だけ呼べばよい。
+    """
+    keys = list(fieldnames)
+    result_key = [k for k in keys if '審議終了' in k or '審議結果' in k]
+    committee_key = [k for k in keys if '付託' in k and '予備' not in k]
+    date_key = [k for k in keys if '受理年月日' in k and '予備' not in k]
+
+    # 賛否カラム（ヘッダー順）
+    vote_keys = []
+    for key in keys:
+        if '賛成会派' in key:
+            vote_keys.append((key, '賛成'))
+        elif '反対会派' in key:
+            vote_keys.append((key, '反対'))
+
+    return {
+        'result': result_key[0] if result_key else None,
+        'committee': committee_key[0] if committee_key else None,
+        'date': date_key[0] if date_key else None,
+        'votes': vote_keys,
+    }
+
+
+def process_san_row(row: dict, columns: dict | None = None) -> tuple[BillRow, list[VoteRow]]:
+    """参議院CSV 1行 → (BillRow, [VoteRow])
+    columns は resolve_san_columns() の結果。省略時はこの行のキーから推測する。
+    """
+    if columns is None:
+        columns = resolve_san_columns(row.keys())
 
     # 審議結果
-    result_key = [k for k in keys if '審議終了' in k or '審議結果' in k]
-    date_result = row.get(result_key[0], '') if result_key else ''
+    date_result = row.get(columns['result'], '') if columns['result'] else ''
     date_passed, result = extract_result(date_result)
 
     # 付託委員会
-    committee_key = [k for k in keys if '付託' in k and '予備' not in k]
     committee = ''
-    if committee_key:
-        committee = extract_committee(row.get(committee_key[0], ''))
+    if columns['committee']:
+        committee = extract_committee(row.get(columns['committee'], ''))
 
     # 議案受理日
-    date_key = [k for k in keys if '受理年月日' in k and '予備' not in k]
-    date_submitted = row.get(date_key[0], '').strip() if date_key else ''
+    date_submitted = row.get(columns['date'], '').strip() if columns['date'] else ''
 
     # 議案種類
     bill_type = row.get('議案種類', '').strip()
     if not bill_type:
         bill_type = row.get('種類', '').strip()
 
-    bill = {
-        'house': '参議院',
-        'session': parse_int(row.get('掲載回次', '')),
-        'submit_session': parse_int(row.get('提出回次', '')),
-        'bill_type': bill_type,
-        'bill_number': parse_int(row.get('番号', '')),
-        'bill_name': row.get('議案件名', '').strip(),
-        'caption': row.get('キャプション', '').strip(),
-        'status': row.get('審議状況', '').strip(),
-        'proposer': row.get('議案提出者', '').strip(),
-        'proposer_party': row.get('議案提出会派', '').strip(),
-        'committee': committee,
-        'date_submitted': date_submitted,
-        'date_passed': date_passed,
-        'result': result,
-        'law_number': row.get('公布年月日／法律番号', '').strip(),
-        'progress_url': row.get('経過情報URL', '').strip(),
-    }
+    bill = BillRow(
+        house='参議院',
+        session=parse_int(row.get('掲載回次', '')),
+        submit_session=parse_int(row.get('提出回次', '')),
+        bill_type=intern(bill_type),
+        bill_number=parse_int(row.get('番号', '')),
+        bill_name=row.get('議案件名', '').strip(),
+        caption=row.get('キャプション', '').strip(),
+        status=intern(row.get('審議状況', '').strip()),
+        proposer=row.get('議案提出者', '').strip(),
+        proposer_party=intern(row.get('議案提出会派', '').strip()),
+        committee=intern(committee),
+        date_submitted=intern(date_submitted),
+        date_passed=intern(date_passed),
+        result=intern(result),
+        law_number=row.get('公布年月日／法律番号', '').strip(),
+        progress_url=row.get('経過情報URL', '').strip(),
+    )
 
     # 参議院の賛否カラム
     votes = []
-    for key in keys:
-        if '賛成会派' in key:
-            for party in parse_parties(row.get(key, '')):
-                votes.append({'party_name': party, 'vote': '賛成', 'chamber': '参議院'})
-        elif '反対会派' in key:
-            for party in parse_parties(row.get(key, '')):
-                votes.append({'party_name': party, 'vote': '反対', 'chamber': '参議院'})
+    for key, vote in columns['votes']:
+        for party in parse_parties(row.get(key, '')):
+            votes.append(VoteRow(party_name=intern(party), vote=vote, chamber='参議院'))
 
     return bill, votes
 
 
-def deduplicate_bills(bills_and_votes: list[tuple[dict, list[dict]]]) -> list[tuple[dict, list[dict]]]:
+def bill_key(bill: dict) -> tuple:
+    """DBの bills 行 → 議案の一意キー (house, submit_session, bill_type, bill_number)。BillRow は .key"""
+    return (bill['house'], bill.get('submit_session'), bill.get('bill_type'), bill.get('bill_number'))
+
+
+def merge_bill(seen: dict, bill: BillRow, votes: list[VoteRow]):
+    """同一キーの議案は掲載回次が大きい（同じなら後の行の）方を残す"""
+    key = bill.key
+    existing = seen.get(key)
+    if existing is None or (bill.session or 0) >= (existing[0].session or 0):
+        seen[key] = (bill, votes)
+
+
+def deduplicate_bills(bills_and_votes: list[tuple[BillRow, list[VoteRow]]]) -> list[tuple[BillRow, list[VoteRow]]]:
     """
     gian.csvは途中経過も含むため、同一議案が複数行ある。
     (submit_session, bill_type, bill_number) で重複除去し、最新（掲載回次が大きい）を優先。
     """
     seen = {}
     for bill, votes in bills_and_votes:
-        key = (bill['house'], bill.get('submit_session'), bill.get('bill_type'), bill.get('bill_number'))
-        existing = seen.get(key)
-        if existing is None or (bill.get('session') or 0) >= (existing[0].get('session') or 0):
-            seen[key] = (bill, votes)
+        merge_bill(seen, bill, votes)
     return list(seen.values())
 
 
-def import_csv(filepath: str, house: str):
-    """CSVファイルを読み込んでSupabaseに投入"""
-    print(f"\n{'='*50}")
-    print(f"  {house} データ読み込み: {filepath}")
-    print(f"{'='*50}")
-
-    # CSV読み込み
-    with open(filepath, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
-    print(f"  CSV行数: {len(rows)}")
-
-    # パース
-    processor = process_shu_row if house == '衆議院' else process_san_row
-    bills_and_votes = []
-    for row in rows:
+def parse_chunk(house: str, header: list[str], rows: list[list[str]], columns: dict | None) -> tuple[list, int, list[str]]:
+    """
+    CSV行のチャンクをパースして ([(bill, votes)], パース成功数, [警告]) を返す。
+    チャンク内で先に重複除去しておき、プロセス間で受け渡す量を減らす。
+    ワーカープロセスで実行されるので、print せず警告は呼び出し元に返す。
+    """
+    seen = {}
+    parsed = 0
+    warnings = []
+    for values in rows:
+        row = dict(zip(header, values))
         try:
-            bill, votes = processor(row)
-            if bill['bill_name']:  # 件名がないものはスキップ
-                bills_and_votes.append((bill, votes))
+            if house == '衆議院':
+                bill, votes = process_shu_row(row)
+            else:
+                bill, votes = process_san_row(row, columns)
+            if bill.bill_name:  # 件名がないものはスキップ
+                merge_bill(seen, bill, votes)
+                parsed += 1
         except Exception as e:
-            print(f"  WARNING: パースエラー: {e}")
-            continue
+            warnings.append(f"パースエラー: {e}")
+    return list(seen.values()), parsed, warnings
+
+
+def iter_csv_chunks(reader, size: int = PARSE_CHUNK_ROWS):
+    """csv.reader を size 行ずつのリストにまとめて yield"""
+    chunk = []
+    for values in reader:
+        chunk.append(values)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
-    print(f"  パース成功: {len(bills_and_votes)}件")
 
-    # 重複除去
-    unique = deduplicate_bills(bills_and_votes)
+def parse_csv(filepath: str, house: str, workers: int = 1) -> tuple[dict, int]:
+    """
+    CSVをチャンク単位でストリーム読み込みし、プロセスプールでパースしながら重複除去する。
+    PARALLEL_MIN_BYTES 未満のファイルはプールを作らずこのプロセスでパースする。
+    手元に残るのは議案キーごとの最新1行だけ。({key: (bill, votes)}, CSV行数) を返す。
+    """
+    seen = {}
+    total_rows = 0
+    parsed_rows = 0
+
+    with open(filepath, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        columns = resolve_san_columns(header) if house == '参議院' else None
+
+        def consume(result):
+            nonlocal parsed_rows
+            parsed, count, warnings = result
+            for w in warnings:
+                print(f"  WARNING: {w}")
+            for bill, votes in parsed:
+                merge_bill(seen, bill, votes)
+            parsed_rows += count
+
+        if workers > 1 and os.path.getsize(filepath) < PARALLEL_MIN_BYTES:
+            workers = 1
+        if workers <= 1:
+            for chunk in iter_csv_chunks(reader):
+                total_rows += len(chunk)
+                consume(parse_chunk(house, header, chunk, columns))
+        else:
+            # 先読みは workers*2 チャンクまで（ファイル全体をキューに積まない）。
+            # 結果は投入順に取り出すので、同じ掲載回次の重複は従来どおり後の行が勝つ。
+            # fork だと Supabase クライアントの接続・BatchWriter のスレッドの途中の状態を子プロセスに持ち込むので spawn
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+                pending = deque()
+                for chunk in iter_csv_chunks(reader):
+                    total_rows += len(chunk)
+                    pending.append(pool.submit(parse_chunk, house, header, chunk, columns))
+                    if len(pending) >= workers * 2:
+                        consume(pending.popleft().result())
+                while pending:
+                    consume(pending.popleft().result())
+
+    print(f"  CSV行数: {total_rows}")
+    print(f"  パース成功: {parsed_rows}件")
+    return seen, total_rows
+
+
+def eq_or_null(query, column: str, value):
+    """value が None なら IS NULL、それ以外は = で絞り込む"""
+    return query.is_(column, "null") if value is None else query.eq(column, value)
+
+
+def fetch_bill_ids(keys: list[tuple]) -> dict:
+    """
+    指定したキーの bills だけを取得し (house, submit_session, bill_type, bill_number) → id を返す。
+    (house, submit_session, bill_type) ごとにまとめ、bill_number の IN 句で引く。
+    """
+    groups = {}
+    for house, submit_session, bill_type, bill_number in keys:
+        groups.setdefault((house, submit_session, bill_type), []).append(bill_number)
+
+    bill_id_map = {}
+    chunk_size = 200  # PostgREST IN句の制限対策
+    for (house, submit_session, bill_type), numbers in groups.items():
+        def query():
+            q = supabase.table("bills").select("id, house, submit_session, bill_type, bill_number").eq("house", house)
+            q = eq_or_null(q, "submit_session", submit_session)
+            return eq_or_null(q, "bill_type", bill_type)
+
+        values = [n for n in numbers if n is not None]
+        results = [query().in_("bill_number", values[i:i + chunk_size]).execute()
+                   for i in range(0, len(values), chunk_size)]
+        if len(values) < len(numbers):
+            results.append(query().is_("bill_number", "null").execute())
+        for result in results:
+            for row in (result.data or []):
+                bill_id_map[bill_key(row)] = row['id']
+    return bill_id_map
+
+
+def content_hash(bill: BillRow, votes: list[VoteRow]) -> str:
+    """正規化済みの議案と賛否リストのハッシュ（差分インポート用。dict だった頃と同じ値になる）"""
+    payload = json.dumps([bill.as_row(), [v.as_row() for v in votes]], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def import_csv(filepath: str, house: str, workers: int = 1, delta: bool = False):
+    """CSVファイルを読み込んでSupabaseに投入
+    delta=True なら、前回送信時と内容ハッシュが同じ議案（と賛否）は送らない。
+    """
+    print(f"\n{'='*50}")
+    print(f"  {house} データ読み込み: {filepath}")
+    print(f"{'='*50}")
+
+    # CSV読み込み・パース・重複除去
+    with metrics.stage("parse_csv") as stage:
+        seen, stage.rows = parse_csv(filepath, house, workers)
+    unique = list(seen.values())
     print(f"  重複除去後: {len(unique)}件")
 
+    # 差分モード: ローカルに記録した前回のハッシュと比べ、新規・変更分だけ残す
+    hashes = {}
+    if delta:
+        hashes = {key: content_hash(bill, votes) for key, (bill, votes) in seen.items()}
+        stored = lookup_cache.get_many("bill_hashes", hashes)
+        inserted = sum(1 for key in hashes if key not in stored)
+        changed = sum(1 for key in hashes if key in stored and stored[key] != hashes[key])
+        print(f"  差分: 新規{inserted}件, 変更{changed}件, 変更なし{len(hashes) - inserted - changed}件")
+        metrics.incr("delta_unchanged", len(hashes) - inserted - changed)
+        hashes = {key: h for key, h in hashes.items() if stored.get(key) != h}
+        unique = [seen[key] for key in hashes]
+        if not unique:
+            print("  送信対象なし")
+            return
+
     # bills upsert
     print(f"\n  --- bills upsert ---")
     bill_batch = []
     votes_by_key = {}
 
     for bill, votes in unique:
-        key = (bill['house'], bill.get('submit_session'), bill.get('bill_type'), bill.get('bill_number'))
+        key = bill.key
         bill_batch.append(bill)
         if votes:
             votes_by_key[key] = votes
 
-    batch_size = 200
-    for i in range(0, len(bill_batch), batch_size):
-        batch = bill_batch[i:i + batch_size]
-        supabase.table("bills").upsert(
-            batch, on_conflict="house,submit_session,bill_type,bill_number"
-        ).execute()
-        print(f"    bills: {min(i + batch_size, len(bill_batch))}/{len(bill_batch)}")
-
+    # upsert のレスポンスに id が返ってくるので、そのまま bill_id マッピングにする
+    # バッチは並行して送り、結果は投入順に受け取る
+    bill_id_map = {}
+    batches = writer.write("bills", (b.as_row() for b in bill_batch),
+                           on_conflict="house,submit_session,bill_type,bill_number",
+                           returning="representation", stage="upsert_bills")
+    done = 0
+    for batch in batches:
+        result = batch.result()
+        returned = {bill_key(row): row['id'] for row in (result.data or [])}
+        lookup_cache.put_many("bills", returned)
+        bill_id_map.update(returned)
+        done += batch.size
+        print(f"    bills: {done}/{len(bill_batch)}")
+
+    writer.flush("bills")
     print(f"  bills完了: {len(bill_batch)}件")
 
     # bill_id マッピング取得
@@ -237,75 +420,158 @@ def import_csv(filepath: str, house: str):
     total_votes = sum(len(v) for v in votes_by_key.values())
     if total_votes == 0:
         print("  賛否データなし")
+        lookup_cache.put_many("bill_hashes", hashes)
         return
 
-    # DBから bill の (house, submit_session, bill_type, bill_number) → id マッピング
-    print(f"  マッピング取得中...")
-    bill_id_map = {}
-    page_size = 1000
-    offset = 0
-    while True:
-        result = supabase.table("bills") \
-            .select("id, house, submit_session, bill_type, bill_number") \
-            .eq("house", house) \
-            .range(offset, offset + page_size - 1) \
-            .execute()
-        rows = result.data or []
-        for row in rows:
-            key = (row['house'], row.get('submit_session'), row.get('bill_type'), row.get('bill_number'))
-            bill_id_map[key] = row['id']
-        if len(rows) < page_size:
-            break
-        offset += page_size
+    # upsert レスポンスで取れなかったキーだけ、キャッシュ → DB（そのキーに限定した IN 句）の順で引く
+    unresolved = [key for key in votes_by_key if key not in bill_id_map]
+    if unresolved:
+        print(f"  マッピング取得中... ({len(unresolved)}件)")
+        with metrics.stage("bill_mapping") as stage:
+            resolved = lookup_cache.lookup("bills", unresolved, fetch_bill_ids)
+            stage.rows = len(resolved)
+        bill_id_map.update(resolved)
     print(f"  マッピング: {len(bill_id_map)}件")
 
     # votes upsert
-    vote_batch = []
-    missing = 0
-    for key, votes in votes_by_key.items():
-        bill_id = bill_id_map.get(key)
-        if not bill_id:
-            missing += 1
-            continue
-        for v in votes:
-            v['bill_id'] = bill_id
-            vote_batch.append(v)
-
+    with_votes = len(votes_by_key)
+    missing = [key for key in votes_by_key if not bill_id_map.get(key)]
+    for key in missing:
+        del votes_by_key[key]
+        hashes.pop(key, None)  # 次回また送る
     if missing:
-        print(f"  WARNING: {missing}件のbillマッピング欠損")
+        print(f"  WARNING: {len(missing)}件のbillマッピング欠損")
+        metrics.incr("bill_mapping_missing", len(missing))
 
-    for i in range(0, len(vote_batch), batch_size):
-        batch = vote_batch[i:i + batch_size]
-        supabase.table("bill_votes").upsert(
-            batch, on_conflict="bill_id,party_name,chamber"
-        ).execute()
-        if (i + batch_size) % 1000 < batch_size:
-            print(f"    votes: {min(i + batch_size, len(vote_batch))}/{len(vote_batch)}")
+    # bill_id を付けた dict にするのは送るときだけ
+    vote_rows = (v.as_row(bill_id=bill_id_map[key]) for key, votes in votes_by_key.items() for v in votes)
+    vote_count = sum(len(votes) for votes in votes_by_key.values())
+    batches = writer.write("bill_votes", vote_rows, on_conflict="bill_id,party_name,chamber",
+                           stage="upsert_bill_votes")
+    writer.flush("bill_votes")
 
-    print(f"  bill_votes完了: {len(vote_batch)}件")
+    print(f"  bill_votes完了: {vote_count}件 ({len(batches)}リクエスト)")
+
+    # 送信できた分のハッシュを記録（途中で例外になった場合は記録しない）
+    lookup_cache.put_many("bill_hashes", hashes)
 
     # 統計
-    with_votes = len([v for v in votes_by_key.values() if v])
     print(f"\n  === 統計 ===")
     print(f"  議案数: {len(bill_batch)}")
     print(f"  賛否データあり: {with_votes}件")
-    print(f"  投票レコード: {len(vote_batch)}件")
+    print(f"  投票レコード: {vote_count}件")
+
+
+# === 複数ファイルの同時取り込み ===
+
+def parse_source(text: str) -> tuple[str, str]:
+    """'san=path/to/gian.csv' → ('参議院', 'path/to/gian.csv')"""
+    house, sep, path = text.partition("=")
+    if not sep or not path or house not in HOUSES:
+        raise argparse.ArgumentTypeError(f"院=パス の形式で指定してください (院は {', '.join(HOUSES)}): {text}")
+    return HOUSES[house], path
+
+
+class PrefixedOutput:
+    """行頭にラベルを付ける stdout。並列ワーカーの出力が行の途中で混ざらないよう、1行ずつまとめて書く"""
+
+    def __init__(self, label: str, stream):
+        self.label = label
+        self.stream = stream
+        self.buffer = ""
+
+    def write(self, text: str) -> int:
+        self.buffer += text
+        *lines, self.buffer = self.buffer.split("\n")
+        if lines:
+            self.stream.write("".join(f"[{self.label}] {line}\n" for line in lines))
+            self.stream.flush()
+        return len(text)
+
+    def flush(self):
+        if self.buffer:
+            self.write("\n")
+        self.stream.flush()
+
+
+def run_import(filepath: str, house: str, workers: int, delta: bool, label: str) -> dict:
+    """
+    1ファイルを取り込み、計測値を返す。import_sources のワーカープロセスから呼ばれる。
+    計測値は親プロセスで metrics.merge() する（ワーカーは使い回されるのでファイルごとにリセット）。
+    """
+    sys.stdout = PrefixedOutput(label, sys.__stdout__)
+    metrics.reset()
+    try:
+        import_csv(filepath, house, workers, delta)
+    finally:
+        sys.stdout.flush()
+    return metrics.snapshot()
+
+
+def import_sources(sources: list[tuple[str, str]], jobs: int, workers: int = 1, delta: bool = False) -> bool:
+    """
+    [(院, CSVパス)] を取り込む。jobs > 1 ならファイルごとに別プロセスで同時に取り込む
+    （衆・参や会期で分けたファイルは書く行が重ならず、互いに依存しない）。
+    CSVパースの並列数 workers はジョブ数で分け合う。1つ失敗しても他は最後まで取り込み、全部成功なら True。
+    """
+    if jobs <= 1 or len(sources) <= 1:
+        for house, path in sources:
+            import_csv(path, house, workers, delta)
+        return True
+
+    labels = [f"{house}:{os.path.basename(path)}" for house, path in sources]
+    labels = [label if labels.count(label) == 1 else f"{label}#{i + 1}" for i, label in enumerate(labels)]
+    print(f"ファイル: {len(sources)}件 (同時 {jobs}件)")
+
+    failed = []
+    # fork だと Supabase クライアントの接続を子プロセスと共有してしまうので spawn
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=ctx) as pool:
+        futures = {
+            pool.submit(run_import, path, house, max(1, workers // jobs), delta, label): label
+            for (house, path), label in zip(sources, labels)
+        }
+        for future in as_completed(futures):
+            label = futures[future]
+            try:
+                metrics.merge(future.result())
+                print(f"[{label}] 完了")
+            except Exception as e:
+                print(f"  ERROR: [{label}] 失敗: {e}")
+                failed.append(label)
+
+    if failed:
+        print(f"\n  失敗したファイル: {', '.join(failed)}（他のファイルは取り込み済み。--delta を付けて再実行すると差分だけ送る）")
+    return not failed
 
 
 def main():
     parser = argparse.ArgumentParser(description="議案データ インポート")
     parser.add_argument("--shu", help="衆議院 gian.csv パス")
     parser.add_argument("--san", help="参議院 gian.csv パス")
+    parser.add_argument("--source", action="append", type=parse_source, default=[], metavar="院=パス",
+                        help="追加のCSV（shu=パス / san=パス。会期で分けた過去分など、複数指定可）")
+    parser.add_argument("--jobs", type=int,
+                        help="同時に取り込むファイル数 (デフォルト: ファイル数とCPU数の小さい方)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help=f"CSVパースの並列プロセス数 (デフォルト: CPU数。{PARALLEL_MIN_BYTES // 2**20}MB 未満のCSVは並列にしない)")
+    parser.add_argument("--delta", action="store_true",
+                        help="前回送信時から内容が変わった議案・賛否だけ送信")
+    parser.add_argument("--metrics", help="計測結果の出力先（.prom なら Prometheus 形式、それ以外は JSON lines）")
     args = parser.parse_args()
 
-    if not args.shu and not args.san:
-        print("ERROR: --shu または --san でCSVパスを指定してください")
+    sources = [(house, path) for house, path in (('衆議院', args.shu), ('参議院', args.san)) if path]
+    sources += args.source
+    if not sources:
+        print("ERROR: --shu / --san / --source でCSVパスを指定してください")
         sys.exit(1)
 
-    if args.shu:
-        import_csv(args.shu, '衆議院')
-    if args.san:
-        import_csv(args.san, '参議院')
+    atexit.register(metrics.write, "import_bills", args.metrics)
+
+    # 1コアではワーカーの起動（supabase の import）の分だけ遅くなるので順番に取り込む
+    jobs = args.jobs or min(len(sources), os.cpu_count() or 1)
+    if not import_sources(sources, jobs, args.workers, args.delta):
+        sys.exit(1)
 
     print("\n✅ インポート完了!")
 
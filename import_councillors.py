@@ -16,6 +16,11 @@ import hashlib
 import re
 import uuid
 
+from lookup_cache import LookupCache
+from speaker_index import (LEGISLATOR_COLUMNS, format_counts, legislator_item, load_index, report_review,
+                           resolve_many, save_aliases)
+from supabase_writer import BatchWriter
+
 def make_uuid(seed: str) -> str:
     """シード文字列からUUID v5を生成"""
     return str(uuid.uuid5(uuid.NAMESPACE_DNS, seed))
@@ -50,9 +55,12 @@ except ImportError:
     sys.exit(1)
 
 supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+lookup_cache = LookupCache()
+writer = BatchWriter(supabase)
+
 
 # データディレクトリ
-DATA_DIR = os.path.join(os.path.dirname(__file__), "house-of-councillors", "data")
+DATA_DIR = os.environ.get("COUNCILLORS_DATA_DIR") or os.path.join(os.path.dirname(__file__), "house-of-councillors", "data")
 
 # ===== 会派マッピング =====
 def load_kaiha_map():
@@ -74,50 +82,72 @@ def import_legislators(dry_run=False):
         rows = list(csv.DictReader(f))
     print(f"  CSV: {len(rows)}名")
 
-    # 既存の参議院議員を確認
-    existing = supabase.table('legislators').select('id, name').execute()
-    existing_by_name = {r['name']: r['id'] for r in existing.data}
-    print(f"  既存DB: {len(existing_by_name)}名")
-
-    new_legs = []
+    # 既存の議員を確認（ローカルキャッシュを差分更新して名寄せ索引を作り、引けないものだけDBに問い合わせ）
+    # 会議録の発言者として先に登録された議員（「岸田文雄」）もここで同じ人に寄せる
+    speakers = {
+        r['議員氏名'].replace('　', ' ').strip(): (r['読み方'], kaiha.get(r['会派'], r['会派']))
+        for r in rows
+    }
+    lookup_cache.refresh('legislators', supabase, 'legislators', LEGISLATOR_COLUMNS, 'last_seen', legislator_item)
+    index = load_index(lookup_cache)
+    existing, counts = resolve_many(index, lookup_cache, supabase, speakers)
+    save_aliases(lookup_cache, index, existing)
+    existing_by_id = {v['id']: v for v in existing.values()}
+    print(f"  既存DB: {len(existing)}名 ({format_counts(counts)})")
+    report_review(index)
+
+    legs_by_id = {}
+    csv_names = {}  # id → その id になったCSVの名前（2人以上なら衝突）
     for r in rows:
         name = r['議員氏名'].replace('　', ' ').strip()
         abbrev = r['会派']
         full_party = kaiha.get(abbrev, abbrev)
 
-        # 既存の議員なら既存IDを使う（衆→参の転身等）
-        existing_id = existing_by_name.get(name)
+        # 既存の議員なら既存IDと表記を使う（衆→参の転身等。CSVの「佐藤 太郎」で会議録の「佐藤太郎」を書き換えない）
+        ex = existing.get(name)
 
         leg = {
-            'id': existing_id if existing_id else make_uuid(f"sangiin_{name}"),
-            'name': name,
+            'id': ex['id'] if ex else make_uuid(f"sangiin_{name}"),
+            'name': ex['name'] if ex else name,  # 表記はDBのまま
             'name_yomi': r['読み方'].replace('　', ' ').strip(),
             'house': '参議院',
             'current_party': full_party,
             'current_position': r.get('役職等', '') or None,
             'photo_url': r.get('写真URL', '') or None,
         }
-        new_legs.append(leg)
+        csv_names.setdefault(leg['id'], []).append(name)
+        # 同じ既存議員に寄った2人目以降は送らない（1回の upsert に同じ id が2行あると Postgres がバッチごと拒否する）
+        legs_by_id.setdefault(leg['id'], leg)
+    new_legs = list(legs_by_id.values())
+
+    collisions = {i: names for i, names in csv_names.items() if len(names) > 1}
+    if collisions:
+        print(f"  ⚠️ 同じ議員に寄った名前: {len(collisions)}件（最初の行だけ取り込む。別人なら legislators を確認）")
+        for i, names in list(collisions.items())[:20]:
+            print(f"    {legs_by_id[i]['name']} ← {', '.join(names)}")
 
     # 新規 vs 更新
-    new_count = sum(1 for l in new_legs if l['name'] not in existing_by_name)
+    new_count = sum(1 for l in new_legs if l['id'] not in existing_by_id)
     update_count = len(new_legs) - new_count
     print(f"  新規: {new_count}名, 更新: {update_count}名")
 
     if dry_run:
         # サンプル表示
         for l in new_legs[:5]:
-            tag = "NEW" if l['name'] not in existing_by_name else "UPD"
+            tag = "NEW" if l['id'] not in existing_by_id else "UPD"
             print(f"    [{tag}] {l['name']} ({l['current_party']})")
         print(f"    ... 他 {len(new_legs) - 5}名")
         return new_legs
 
-    # DB upsert（50件ずつ）
+    # DB upsert（送信バイト数で区切って並行して送る）
     print("  DB更新中...")
-    for i in range(0, len(new_legs), 50):
-        batch = new_legs[i:i+50]
-        supabase.table('legislators').upsert(batch, on_conflict='id').execute()
-        print(f"    {min(i+50, len(new_legs))}/{len(new_legs)}")
+    batches = writer.write('legislators', new_legs, on_conflict='id', stage='upsert_legislators')
+    writer.flush('legislators')
+    print(f"    {len(new_legs)}/{len(new_legs)} ({len(batches)}リクエスト)")
+    # 既存の議員はDBの表記のまま送っているので、キャッシュも同じキーを上書きする（古い表記のキーが残らない）
+    lookup_cache.put_many('legislators', dict(
+        legislator_item({**l, 'last_seen': existing_by_id.get(l['id'], {}).get('last_seen')}) for l in new_legs
+    ))
 
     print(f"  ✅ 議員 {len(new_legs)}名 完了")
     return new_legs
@@ -290,13 +320,11 @@ def import_bills(dry_run=False):
             print(f"       状態={b['status']} 回次={b['session']} 委員会={b['committee']}")
         return bills
 
-    # DB upsert（50件ずつ）
+    # DB upsert（送信バイト数で区切って並行して送る）
     print(f"\n  DB更新中... ({len(bills)}件)")
-    for i in range(0, len(bills), 50):
-        batch = bills[i:i+50]
-        supabase.table('bills').upsert(batch, on_conflict='id').execute()
-        if (i + 50) % 500 == 0 or i + 50 >= len(bills):
-            print(f"    {min(i+50, len(bills))}/{len(bills)}")
+    batches = writer.write('bills', bills, on_conflict='id', stage='upsert_bills')
+    writer.flush('bills')
+    print(f"    {len(bills)}/{len(bills)} ({len(batches)}リクエスト)")
 
     print(f"  ✅ 議案 {len(bills)}件 完了")
     return bills
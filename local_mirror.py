@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+local_mirror.py - Supabase のテーブルを手元の SQLite に写す（集計・QA用）
+件数の内訳や整合性チェックのたびに API をページ送りしなくて済むよう、
+bills / bill_votes / meetings / speeches / legislators をローカルに同期し、SQL で数ミリ秒で引く。
+
+同期は差分（ウォーターマーク列が前回の最大値以上の行だけ取り直す）。
+  legislators: last_seen / meetings, speeches: date / bills: session
+  bill_votes: 取り直した議案の分を bill_id で引き直す
+ウォーターマーク列が NULL の行（last_seen のない議員など）は毎回取り直す。
+古い行の更新（議員リンク・再分類）や削除は差分では拾わないので、そのときは --full で取り直す。
+発言本文（speeches.content）は大きいので --with-content を付けたときだけ写す。
+
+使い方:
+  python local_mirror.py --sync                  # 差分同期（初回は全件）
+  python local_mirror.py --sync bills bill_votes # 指定テーブルだけ
+  python local_mirror.py --sync --full           # 全件取り直し
+  python local_mirror.py --stats                 # 件数・カテゴリ別・回次別など
+  python local_mirror.py --check                 # 整合性チェック（未リンク発言・重複議員・孤立した賛否など）
+  python local_mirror.py --sql "SELECT category, COUNT(*) FROM bills GROUP BY 1 ORDER BY 2 DESC"
+  python categorize_bills.py --dry-run --from-mirror   # 分類の試走もミラーから
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+
+from speaker_index import normalize_name
+
+MIRROR_PATH = os.environ.get("LOCAL_MIRROR_PATH", ".mirror.sqlite3")
+PAGE_SIZE = 1000
+IN_CHUNK_SIZE = 200  # PostgREST IN句の制限対策
+
+# テーブル → (ウォーターマーク列, 取得する列)。同期はこの順（bill_votes は bills の後）
+SPEECH_COLUMNS = ("id, speech_id, legislator_id, meeting_id, speech_order, speaker_name, speaker_group, "
+                  "speaker_position, speech_url, date")
+MIRROR_TABLES = {
+    "legislators": ("last_seen", "*"),
+    "meetings": ("date", "*"),
+    "speeches": ("date", SPEECH_COLUMNS),
+    "bills": ("session", "*"),
+    "bill_votes": (None, "*"),
+}
+INDEXES = {
+    "legislators": [("name",), ("last_seen",)],
+    "meetings": [("issue_id",), ("date",), ("session",)],
+    "speeches": [("date",), ("legislator_id",), ("meeting_id",), ("speaker_name",)],
+    "bills": [("session",), ("category",), ("house", "submit_session", "bill_type", "bill_number")],
+    "bill_votes": [("bill_id",), ("party_name",)],
+}
+
+
+def to_sqlite(value):
+    """JSON の値 → SQLite に入れる値（配列・オブジェクトは JSON 文字列）"""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+class LocalMirror:
+    """テーブルごとのローカルコピーと、同期のウォーターマーク"""
+
+    def __init__(self, path: str = MIRROR_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS mirror_state (
+                table_name TEXT PRIMARY KEY,
+                watermark TEXT,
+                synced_at REAL NOT NULL
+            )
+        """)
+        # --check などで使う（表記揺れをSQLの中でそろえる）
+        self.conn.create_function("normalize_name", 1, normalize_name, deterministic=True)
+
+    def columns(self, table: str) -> list[str]:
+        return [row["name"] for row in self.conn.execute(f'PRAGMA table_info("{table}")')]
+
+    def has_table(self, table: str) -> bool:
+        return bool(self.columns(table))
+
+    def ensure_columns(self, table: str, names):
+        """テーブルがなければ作り、行に新しい列があれば足す（列はAPIの返す行に合わせる）"""
+        existing = self.columns(table)
+        if not existing:
+            self.conn.execute(f'CREATE TABLE "{table}" (id PRIMARY KEY)')
+            existing = ["id"]
+        added = [name for name in names if name not in existing]
+        if not added:
+            return
+        for name in added:
+            self.conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{name}"')
+        existing += added
+        for columns in INDEXES.get(table, []):
+            if all(c in existing for c in columns):
+                quoted = ", ".join(f'"{c}"' for c in columns)
+                self.conn.execute(f'CREATE INDEX IF NOT EXISTS "{table}_{"_".join(columns)}" ON "{table}" ({quoted})')
+
+    def upsert(self, table: str, rows: list[dict]):
+        if not rows:
+            return
+        names = list(dict.fromkeys(name for row in rows for name in row))
+        self.ensure_columns(table, names)
+        quoted = ", ".join(f'"{n}"' for n in names)
+        self.conn.executemany(
+            f'INSERT OR REPLACE INTO "{table}" ({quoted}) VALUES ({", ".join("?" * len(names))})',
+            [[to_sqlite(row.get(n)) for n in names] for row in rows],
+        )
+
+    def watermark(self, table: str):
+        row = self.conn.execute("SELECT watermark FROM mirror_state WHERE table_name = ?", (table,)).fetchone()
+        return json.loads(row["watermark"]) if row and row["watermark"] is not None else None
+
+    def synced(self, table: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM mirror_state WHERE table_name = ?", (table,)).fetchone() is not None
+
+    def set_state(self, table: str, watermark):
+        self.conn.execute(
+            "INSERT INTO mirror_state (table_name, watermark, synced_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (table_name) DO UPDATE SET watermark = excluded.watermark, synced_at = excluded.synced_at",
+            (table, None if watermark is None else json.dumps(watermark, ensure_ascii=False), time.time()),
+        )
+
+    def query(self, sql: str, params=()) -> list[sqlite3.Row]:
+        return self.conn.execute(sql, params).fetchall()
+
+    def scalar(self, sql: str, params=()):
+        return self.conn.execute(sql, params).fetchone()[0]
+
+
+def fetch_pages(supabase, table: str, columns: str, where=None, page_size: int = PAGE_SIZE):
+    """id のキーセットで全ページを返す（where(query) で絞り込み）"""
+    last_id = None
+    while True:
+        query = supabase.table(table).select(columns)
+        if where is not None:
+            query = where(query)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.order("id").limit(page_size).execute().data or []
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+def sync_table(supabase, mirror: LocalMirror, table: str, full: bool = False, with_content: bool = False) -> list:
+    """1テーブルを同期し、取り直した行の id を返す"""
+    watermark_column, columns = MIRROR_TABLES[table]
+    if table == "speeches" and with_content:
+        columns += ", content"
+    since = None if full or not mirror.synced(table) else mirror.watermark(table)
+    wheres = [None]
+    if since is not None:
+        wheres = [lambda q: q.gte(watermark_column, since), lambda q: q.is_(watermark_column, "null")]
+
+    ids = []
+    latest = since
+    with mirror.conn:
+        if full and mirror.has_table(table):
+            mirror.conn.execute(f'DELETE FROM "{table}"')
+        for where in wheres:
+            for rows in fetch_pages(supabase, table, columns, where):
+                mirror.upsert(table, rows)
+                ids += [r["id"] for r in rows]
+                if watermark_column:
+                    values = [r[watermark_column] for r in rows if r.get(watermark_column) is not None]
+                    if values and (latest is None or max(values) > latest):
+                        latest = max(values)
+        mirror.set_state(table, latest)
+    return ids
+
+
+def sync_votes_for(supabase, mirror: LocalMirror, bill_ids: list) -> int:
+    """指定した議案の bill_votes を取り直す"""
+    count = 0
+    with mirror.conn:
+        for i in range(0, len(bill_ids), IN_CHUNK_SIZE):
+            chunk = bill_ids[i:i + IN_CHUNK_SIZE]
+            for rows in fetch_pages(supabase, "bill_votes", "*", lambda q: q.in_("bill_id", chunk)):
+                mirror.upsert("bill_votes", rows)
+                count += len(rows)
+        mirror.set_state("bill_votes", None)
+    return count
+
+
+def sync(supabase, mirror: LocalMirror, tables: list[str], full: bool = False, with_content: bool = False):
+    """テーブルを MIRROR_TABLES の順に同期する"""
+    bill_ids = None
+    for table in [t for t in MIRROR_TABLES if t in tables]:
+        started = time.monotonic()
+        initial = full or not mirror.synced(table)
+        if table == "bill_votes" and not initial:
+            # 差分では、取り直した議案の賛否だけ引き直す
+            if bill_ids is None:
+                print("  bill_votes: bills を同期しないときは差分なし（--full で全件）")
+                continue
+            count = sync_votes_for(supabase, mirror, bill_ids)
+        else:
+            ids = sync_table(supabase, mirror, table, full, with_content)
+            count = len(ids)
+            if table == "bills":
+                bill_ids = ids
+        watermark = mirror.watermark(table)
+        total = mirror.scalar(f'SELECT COUNT(*) FROM "{table}"') if mirror.has_table(table) else 0
+        print(f"  {table}: {count}件 {'(全件)' if initial else '(差分)'} → 計{total}件"
+              + (f", ウォーターマーク {watermark}" if watermark is not None else "")
+              + f" ({time.monotonic() - started:.1f}秒)")
+
+
+# === 集計・チェック ===
+
+def timed_query(mirror: LocalMirror, sql: str, params=()) -> tuple[list[sqlite3.Row], float]:
+    started = time.perf_counter()
+    rows = mirror.query(sql, params)
+    return rows, (time.perf_counter() - started) * 1000
+
+
+def print_stats(mirror: LocalMirror):
+    print("=== テーブル ===")
+    for row in mirror.query("SELECT table_name, synced_at FROM mirror_state ORDER BY table_name"):
+        table = row["table_name"]
+        count = mirror.scalar(f'SELECT COUNT(*) FROM "{table}"') if mirror.has_table(table) else 0
+        watermark = mirror.watermark(table)
+        synced = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["synced_at"]))
+        print(f"  {table}: {count}件 (ウォーターマーク {'—' if watermark is None else watermark}, 同期 {synced})")
+
+    if mirror.has_table("bills"):
+        total = mirror.scalar("SELECT COUNT(*) FROM bills")
+        rows, ms = timed_query(mirror, "SELECT COALESCE(category, '未分類') AS category, COUNT(*) AS n "
+                                       "FROM bills GROUP BY 1 ORDER BY 2 DESC")
+        print(f"\n=== 議案 カテゴリ別 ({ms:.1f}ms) ===")
+        for r in rows:
+            print(f"  {r['category']}: {r['n']}件")
+        rows, ms = timed_query(mirror, "SELECT session, COUNT(*) AS n FROM bills GROUP BY 1 ORDER BY 2 DESC LIMIT 15")
+        print(f"\n=== 議案 回次別（上位15） ({ms:.1f}ms) ===")
+        for r in rows:
+            print(f"  第{r['session']}回: {r['n']}件")
+        if total and "date_submitted" in mirror.columns("bills"):
+            submitted = mirror.scalar("SELECT COUNT(*) FROM bills WHERE date_submitted IS NOT NULL AND date_submitted != ''")
+            passed = mirror.scalar("SELECT COUNT(*) FROM bills WHERE date_passed IS NOT NULL AND date_passed != ''")
+            print(f"\n  date_submitted あり: {submitted}件 ({submitted * 100 // total}%)"
+                  f"  date_passed あり: {passed}件 ({passed * 100 // total}%)")
+
+    if mirror.has_table("speeches"):
+        rows, ms = timed_query(mirror, "SELECT COUNT(*) AS n, MIN(date) AS first, MAX(date) AS last, "
+                                       "COUNT(legislator_id) AS linked FROM speeches")
+        r = rows[0]
+        print(f"\n=== 発言 ({ms:.1f}ms) ===")
+        print(f"  {r['n']}件 ({r['first']} ~ {r['last']}), 議員リンク済み {r['linked']}件"
+              + (f" ({r['linked'] * 100 // r['n']}%)" if r["n"] else ""))
+
+    if mirror.has_table("meetings"):
+        rows, ms = timed_query(mirror, "SELECT session, COUNT(*) AS n FROM meetings GROUP BY 1 ORDER BY 1 DESC LIMIT 10")
+        print(f"\n=== 会議 回次別（新しい順10件） ({ms:.1f}ms) ===")
+        for r in rows:
+            print(f"  第{r['session']}回: {r['n']}件")
+
+
+# (名前, 必要なテーブル, 件数を返すSQL, 例を返すSQL)
+CHECKS = [
+    ("議員IDのない発言", ["speeches"],
+     "SELECT COUNT(*) FROM speeches WHERE legislator_id IS NULL",
+     "SELECT speaker_name, COUNT(*) AS n FROM speeches WHERE legislator_id IS NULL "
+     "GROUP BY 1 ORDER BY 2 DESC LIMIT 5"),
+    ("会議が見つからない発言", ["speeches", "meetings"],
+     "SELECT COUNT(*) FROM speeches s LEFT JOIN meetings m ON m.id = s.meeting_id WHERE m.id IS NULL",
+     "SELECT s.speech_id, s.meeting_id FROM speeches s LEFT JOIN meetings m ON m.id = s.meeting_id "
+     "WHERE m.id IS NULL LIMIT 5"),
+    ("表記揺れで重複している議員", ["legislators"],
+     "SELECT COUNT(*) FROM (SELECT normalize_name(name) FROM legislators GROUP BY 1 HAVING COUNT(*) > 1)",
+     "SELECT normalize_name(name) AS key, GROUP_CONCAT(name, ' / ') AS names FROM legislators "
+     "GROUP BY 1 HAVING COUNT(*) > 1 LIMIT 5"),
+    ("議案が見つからない賛否", ["bill_votes", "bills"],
+     "SELECT COUNT(*) FROM bill_votes v LEFT JOIN bills b ON b.id = v.bill_id WHERE b.id IS NULL",
+     "SELECT v.bill_id, v.party_name, v.chamber FROM bill_votes v LEFT JOIN bills b ON b.id = v.bill_id "
+     "WHERE b.id IS NULL LIMIT 5"),
+    ("未分類の議案", ["bills"],
+     "SELECT COUNT(*) FROM bills WHERE category IS NULL",
+     "SELECT session, bill_name FROM bills WHERE category IS NULL LIMIT 5"),
+]
+
+
+def run_checks(mirror: LocalMirror) -> int:
+    """整合性チェックを流し、見つかった問題の種類数を返す"""
+    problems = 0
+    for label, tables, count_sql, sample_sql in CHECKS:
+        if not all(mirror.has_table(t) for t in tables):
+            print(f"  ⏭️ {label}: {', '.join(tables)} が未同期")
+            continue
+        started = time.perf_counter()
+        try:
+            count = mirror.scalar(count_sql)
+        except sqlite3.OperationalError as e:  # 列がない（古いスキーマ）など
+            print(f"  ⏭️ {label}: {e}")
+            continue
+        ms = (time.perf_counter() - started) * 1000
+        if not count:
+            print(f"  ✅ {label}: 0件 ({ms:.1f}ms)")
+            continue
+        problems += 1
+        print(f"  ⚠️ {label}: {count}件 ({ms:.1f}ms)")
+        for row in mirror.query(sample_sql):
+            print(f"      {' | '.join(str(v) for v in row)}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Supabase テーブルのローカルミラー（SQLite）")
+    parser.add_argument("--sync", nargs="*", metavar="TABLE", choices=list(MIRROR_TABLES),
+                        help=f"同期する（テーブル省略時は全部: {', '.join(MIRROR_TABLES)}）")
+    parser.add_argument("--full", action="store_true", help="差分ではなく全件取り直す（古い行の更新・削除も反映）")
+    parser.add_argument("--with-content", action="store_true", help="発言本文（speeches.content）も写す")
+    parser.add_argument("--stats", action="store_true", help="件数・カテゴリ別・回次別などを表示")
+    parser.add_argument("--check", action="store_true", help="整合性チェック（問題があれば終了コード1）")
+    parser.add_argument("--sql", help="任意のSQLを実行して結果を表示")
+    parser.add_argument("--path", default=MIRROR_PATH, help=f"ミラーのファイル (デフォルト: {MIRROR_PATH})")
+    args = parser.parse_args()
+
+    mirror = LocalMirror(args.path)
+
+    if args.sync is not None:
+        url = os.environ.get("SUPABASE_URL", "")
+        key = os.environ.get("SUPABASE_SERVICE_KEY", "")
+        if not url or not key:
+            print("ERROR: SUPABASE_URL and SUPABASE_SERVICE_KEY must be set")
+            sys.exit(1)
+        from supabase import create_client
+        print(f"同期: {args.path}")
+        sync(create_client(url, key), mirror, args.sync or list(MIRROR_TABLES), args.full, args.with_content)
+
+    if args.sql:
+        rows, ms = timed_query(mirror, args.sql)
+        if rows:
+            print("\t".join(rows[0].keys()))
+        for row in rows:
+            print("\t".join("" if v is None else str(v) for v in row))
+        print(f"({len(rows)}行, {ms:.1f}ms)", file=sys.stderr)
+
+    if args.stats or not (args.sync is not None or args.sql or args.check):
+        print_stats(mirror)
+
+    if args.check:
+        print("=== 整合性チェック ===")
+        if run_checks(mirror):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+lookup_cache.py - 取り込みスクリプト共通の IDマッピング キャッシュ
+issue_id → meetings.id、議員名 → legislators.id などを SQLite に保存し、
+毎回の実行で同じマッピングをDBから引き直さないようにする。
+
+collect_daily.py / import_bills.py / import_councillors.py から使う。
+キャッシュにないキーだけをDBに問い合わせ、結果を書き足す。
+件数が上限を超えたら最終利用が古いものから捨てる（LRU）。
+ただし PINNED_NAMESPACES は名寄せ索引の元で全件そろっている必要があるので捨てない。
+それ以外でもウォーターマーク付きの名前空間から捨てたら、ウォーターマークを消して次の refresh で全件取り直す。
+
+使い方:
+  python lookup_cache.py --stats                    # 件数・ウォーターマーク表示
+  python lookup_cache.py --invalidate               # 全消去
+  python lookup_cache.py --invalidate legislators   # 指定の名前空間だけ消去
+"""
+
+import os
+import json
+import time
+import sqlite3
+import argparse
+
+CACHE_PATH = os.environ.get("LOOKUP_CACHE_PATH", ".lookup_cache.sqlite3")
+MAX_ENTRIES = 200_000  # 名前空間ごとの上限
+IN_CHUNK_SIZE = 200  # PostgREST IN句の制限対策
+PINNED_NAMESPACES = {"legislators", "speaker_aliases.v2"}  # LRU で捨てない（speaker_index.py の索引の元）
+
+
+def _encode(key) -> str:
+    """キー（文字列・数値 or タプル）を保存用の文字列に"""
+    if isinstance(key, tuple):
+        return json.dumps(list(key), ensure_ascii=False)
+    return str(key)
+
+
+class LookupCache:
+    """名前空間つきの key → value（JSON）キャッシュ"""
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            );
+            CREATE INDEX IF NOT EXISTS entries_lru ON entries (namespace, last_used);
+            CREATE TABLE IF NOT EXISTS watermarks (
+                namespace TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+
+    def get_many(self, namespace: str, keys) -> dict:
+        """キャッシュにあるキーだけ {key: value} で返す（最終利用時刻も更新）"""
+        encoded = {_encode(k): k for k in keys}
+        found = {}
+        items = list(encoded)
+        for i in range(0, len(items), 500):
+            chunk = items[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT key, value FROM entries WHERE namespace = ? AND key IN ({placeholders})",
+                [namespace, *chunk],
+            ).fetchall()
+            for key, value in rows:
+                found[encoded[key]] = json.loads(value)
+        if found:
+            now = time.time()
+            with self.conn:
+                self.conn.executemany(
+                    "UPDATE entries SET last_used = ? WHERE namespace = ? AND key = ?",
+                    [(now, namespace, _encode(k)) for k in found],
+                )
+        return found
+
+    def items(self, namespace: str) -> dict:
+        """名前空間の全エントリを {key: value} で返す（索引を作る用。最終利用時刻は更新しない）"""
+        return {key: json.loads(value) for key, value in self.conn.execute(
+            "SELECT key, value FROM entries WHERE namespace = ?", (namespace,))}
+
+    def put_many(self, namespace: str, items: dict) -> int:
+        """{key: value} を保存し、上限を超えた分を古い順に削除。削除した件数を返す"""
+        if not items:
+            return 0
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO entries (namespace, key, value, last_used) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, last_used = excluded.last_used",
+                [(namespace, _encode(k), json.dumps(v, ensure_ascii=False), now) for k, v in items.items()],
+            )
+            count = self.conn.execute(
+                "SELECT COUNT(*) FROM entries WHERE namespace = ?", (namespace,)
+            ).fetchone()[0]
+            if count > self.max_entries and namespace not in PINNED_NAMESPACES:
+                self.conn.execute(
+                    "DELETE FROM entries WHERE namespace = ? AND key IN ("
+                    "  SELECT key FROM entries WHERE namespace = ? ORDER BY last_used LIMIT ?)",
+                    (namespace, namespace, count - self.max_entries),
+                )
+                # 差分更新は捨てた行を取り戻せないので、次の refresh は全件から
+                self.conn.execute("DELETE FROM watermarks WHERE namespace = ?", (namespace,))
+                return count - self.max_entries
+        return 0
+
+    def lookup(self, namespace: str, keys, fetch_missing) -> dict:
+        """
+        keys → value を返す。キャッシュにないキーだけ fetch_missing(missing_keys) で取得して保存。
+        fetch_missing は見つかったキーだけを {key: value} で返せばよい。
+        """
+        keys = list(dict.fromkeys(keys))
+        found = self.get_many(namespace, keys)
+        missing = [k for k in keys if k not in found]
+        if missing:
+            fetched = fetch_missing(missing)
+            self.put_many(namespace, fetched)
+            found.update(fetched)
+        return found
+
+    def watermark(self, namespace: str) -> str | None:
+        row = self.conn.execute("SELECT value FROM watermarks WHERE namespace = ?", (namespace,)).fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, namespace: str, value: str):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO watermarks (namespace, value) VALUES (?, ?) "
+                "ON CONFLICT (namespace) DO UPDATE SET value = excluded.value",
+                (namespace, value),
+            )
+
+    def refresh(self, namespace: str, supabase, table: str, columns: str,
+                watermark_column: str, to_item, page_size: int = 1000) -> int:
+        """
+        watermark_column がウォーターマーク以降の行と、watermark_column が NULL の行を取得してキャッシュに反映。
+        （NULL の行は差分で拾えないので毎回取り直す。import_councillors は last_seen なしで議員を入れる）
+        初回（ウォーターマークなし）は全行を取得する。
+        to_item(row) -> (key, value)。取り込んだ行数を返す。
+        """
+        since = self.watermark(namespace)
+        latest = since or ""
+        total = 0
+        evicted = 0
+        if since is None:
+            wheres = [lambda q: q]
+        else:
+            wheres = [lambda q: q.gte(watermark_column, since), lambda q: q.is_(watermark_column, "null")]
+        for where in wheres:
+            offset = 0
+            while True:
+                query = where(supabase.table(table).select(columns))
+                result = query.order("id").range(offset, offset + page_size - 1).execute()
+                rows = result.data or []
+                evicted += self.put_many(namespace, dict(to_item(r) for r in rows))
+                for r in rows:
+                    if r.get(watermark_column) and r[watermark_column] > latest:
+                        latest = r[watermark_column]
+                total += len(rows)
+                if len(rows) < page_size:
+                    break
+                offset += page_size
+
+        if latest and not evicted:
+            self.set_watermark(namespace, latest)
+        return total
+
+    def invalidate(self, namespace: str | None = None):
+        """キャッシュを消去（namespace 省略時は全部）"""
+        with self.conn:
+            if namespace is None:
+                self.conn.execute("DELETE FROM entries")
+                self.conn.execute("DELETE FROM watermarks")
+            else:
+                self.conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+                self.conn.execute("DELETE FROM watermarks WHERE namespace = ?", (namespace,))
+
+    def stats(self) -> list[tuple[str, int, str | None]]:
+        """[(namespace, 件数, ウォーターマーク)]"""
+        rows = self.conn.execute(
+            "SELECT namespace, COUNT(*) FROM entries GROUP BY namespace ORDER BY namespace"
+        ).fetchall()
+        return [(ns, count, self.watermark(ns)) for ns, count in rows]
+
+
+def fetch_in_chunks(supabase, table: str, columns: str, column: str, values: list, to_item) -> dict:
+    """column IN (values) で行を取得し {key: value} を返す（lookup の fetch_missing 用）"""
+    found = {}
+    for i in range(0, len(values), IN_CHUNK_SIZE):
+        chunk = values[i:i + IN_CHUNK_SIZE]
+        result = supabase.table(table).select(columns).in_(column, chunk).execute()
+        for row in (result.data or []):
+            key, value = to_item(row)
+            found[key] = value
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IDマッピング キャッシュ管理")
+    parser.add_argument("--stats", action="store_true", help="名前空間ごとの件数を表示")
+    parser.add_argument("--invalidate", nargs="?", const="*", metavar="NAMESPACE",
+                        help="キャッシュを消去（名前空間省略時は全部）")
+    parser.add_argument("--path", default=CACHE_PATH, help=f"キャッシュファイル (デフォルト: {CACHE_PATH})")
+    args = parser.parse_args()
+
+    cache = LookupCache(args.path)
+
+    if args.invalidate:
+        namespace = None if args.invalidate == "*" else args.invalidate
+        cache.invalidate(namespace)
+        print(f"キャッシュ消去: {namespace or '全て'}")
+
+    if args.stats or not args.invalidate:
+        for namespace, count, watermark in cache.stats():
+            print(f"  {namespace}: {count}件 (ウォーターマーク: {watermark or '—'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+metrics.py - 取り込みスクリプト共通の計測
+ステージ（API取得・upsert・マッピング取得など）ごとの所要時間ヒストグラム、
+リクエスト数、処理行数、エラー・リトライ回数を集計し、実行の最後に1回だけ書き出す。
+
+出力先は --metrics PATH か環境変数 METRICS_PATH（どちらもなければ何もしない）。
+  *.prom  Prometheus の textfile 形式（node_exporter の textfile collector 向け、毎回上書き）
+  その他  JSON lines（1実行1行で追記）
+
+使い方（スクリプト側）:
+  from metrics import metrics
+  with metrics.stage("upsert_speeches") as s:   # 1リクエスト = 1回の観測
+      ...
+      s.rows = len(batch)
+  metrics.incr("upsert_retries")
+  atexit.register(metrics.write, "collect_daily", args.metrics)
+
+  python metrics.py run.jsonl        # JSON lines の最新の実行を表で表示
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+METRICS_PATH = os.environ.get("METRICS_PATH", "")
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)  # 秒
+PROM_PREFIX = "democracy_watcher"
+
+
+class StageRows:
+    """stage() の with 内で処理行数を書き込む入れ物"""
+
+    def __init__(self):
+        self.rows = 0
+
+
+def _empty_stage() -> dict:
+    return {"count": 0, "errors": 0, "seconds": 0.0, "max": 0.0, "rows": 0, "buckets": [0] * (len(BUCKETS) + 1)}
+
+
+class Metrics:
+    """ステージ別の計測値とカウンタ（スレッドセーフ）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.started = time.time()
+        self.stages: dict[str, dict] = {}
+        self.counters: dict[str, int] = {}
+
+    def observe(self, name: str, seconds: float, rows: int = 0, error: bool = False):
+        with self.lock:
+            stage = self.stages.setdefault(name, _empty_stage())
+            stage["count"] += 1
+            stage["errors"] += int(error)
+            stage["seconds"] += seconds
+            stage["max"] = max(stage["max"], seconds)
+            stage["rows"] += rows
+            i = next((i for i, le in enumerate(BUCKETS) if seconds <= le), len(BUCKETS))
+            stage["buckets"][i] += 1
+
+    @contextmanager
+    def stage(self, name: str):
+        """with の中身の所要時間を name に記録する。例外が出たらエラーとして数えて投げ直す"""
+        rec = StageRows()
+        started = time.perf_counter()
+        error = False
+        try:
+            yield rec
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, rec.rows, error)
+
+    def incr(self, name: str, n: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self) -> dict:
+        """プロセス間で受け渡せる形のコピー（merge() で合算できる）"""
+        with self.lock:
+            return {
+                "stages": {k: {**v, "buckets": list(v["buckets"])} for k, v in self.stages.items()},
+                "counters": dict(self.counters),
+            }
+
+    def merge(self, snapshot: dict):
+        """別プロセス（シャードのワーカー等）の snapshot() を足し込む"""
+        with self.lock:
+            for name, other in snapshot.get("stages", {}).items():
+                stage = self.stages.setdefault(name, _empty_stage())
+                for key in ("count", "errors", "seconds", "rows"):
+                    stage[key] += other[key]
+                stage["max"] = max(stage["max"], other["max"])
+                stage["buckets"] = [a + b for a, b in zip(stage["buckets"], other["buckets"])]
+            for name, n in snapshot.get("counters", {}).items():
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self, run: str) -> dict:
+        """1実行分のまとめ。rows_per_sec はそのステージで費やした時間あたりの行数"""
+        snap = self.snapshot()
+        stages = {}
+        for name, s in sorted(snap["stages"].items()):
+            stages[name] = {
+                "count": s["count"],
+                "errors": s["errors"],
+                "seconds": round(s["seconds"], 3),
+                "mean": round(s["seconds"] / s["count"], 4) if s["count"] else 0,
+                "max": round(s["max"], 4),
+                "rows": s["rows"],
+                "rows_per_sec": round(s["rows"] / s["seconds"], 1) if s["seconds"] > 0 else None,
+                "buckets": dict(zip([str(le) for le in BUCKETS] + ["+Inf"], s["buckets"])),
+            }
+        return {
+            "run": run,
+            "started_at": datetime.fromtimestamp(self.started, timezone.utc).isoformat(timespec="seconds"),
+            "seconds": round(time.time() - self.started, 3),
+            "stages": stages,
+            "counters": dict(sorted(snap["counters"].items())),
+        }
+
+    def write(self, run: str, path: str | None = None):
+        """path（省略時は METRICS_PATH）に書き出す。拡張子 .prom なら Prometheus 形式"""
+        path = path or METRICS_PATH
+        if not path:
+            return
+        summary = self.summary(run)
+        if path.endswith(".prom"):
+            # textfile collector が書きかけを読まないよう、一時ファイルから置き換える
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(to_prometheus(summary))
+            os.replace(tmp, path)
+        else:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(summary, ensure_ascii=False) + "\n")
+        print(f"計測結果: {path}")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def to_prometheus(summary: dict) -> str:
+    """summary() の結果 → Prometheus textfile 形式"""
+    run = summary["run"]
+    p = PROM_PREFIX
+    lines = [
+        f"# HELP {p}_stage_seconds Stage latency per request.",
+        f"# TYPE {p}_stage_seconds histogram",
+    ]
+    for name, s in summary["stages"].items():
+        cumulative = 0
+        for le, n in s["buckets"].items():
+            cumulative += n
+            lines.append(f"{p}_stage_seconds_bucket{_labels(run=run, stage=name, le=le)} {cumulative}")
+        lines.append(f"{p}_stage_seconds_sum{_labels(run=run, stage=name)} {s['seconds']}")
+        lines.append(f"{p}_stage_seconds_count{_labels(run=run, stage=name)} {s['count']}")
+
+    for metric, key, help_text in (
+        ("stage_rows_total", "rows", "Rows processed per stage."),
+        ("stage_errors_total", "errors", "Failed requests per stage."),
+    ):
+        lines += [f"# HELP {p}_{metric} {help_text}", f"# TYPE {p}_{metric} counter"]
+        for name, s in summary["stages"].items():
+            lines.append(f"{p}_{metric}{_labels(run=run, stage=name)} {s[key]}")
+
+    lines += [f"# HELP {p}_events_total Named counters such as retries.", f"# TYPE {p}_events_total counter"]
+    for name, n in summary["counters"].items():
+        lines.append(f"{p}_events_total{_labels(run=run, name=name)} {n}")
+
+    lines += [
+        f"# HELP {p}_run_seconds Wall time of the last run.", f"# TYPE {p}_run_seconds gauge",
+        f"{p}_run_seconds{_labels(run=run)} {summary['seconds']}",
+        f"# HELP {p}_run_finished_timestamp_seconds End of the last run.",
+        f"# TYPE {p}_run_finished_timestamp_seconds gauge",
+        f"{p}_run_finished_timestamp_seconds{_labels(run=run)} {time.time():.0f}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+# スクリプト全体で共有
+metrics = Metrics()
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("使い方: python metrics.py run.jsonl")
+        sys.exit(1)
+    with open(sys.argv[1], encoding="utf-8") as f:
+        lines = [line for line in f if line.strip()]
+    if not lines:
+        print("記録なし")
+        return
+    summary = json.loads(lines[-1])
+    print(f"{summary['run']} ({summary['started_at']}, {summary['seconds']}秒)")
+    print(f"  {'ステージ':<28}{'回数':>8}{'合計秒':>10}{'平均秒':>10}{'最大秒':>10}{'行数':>10}{'行/秒':>10}")
+    for name, s in summary["stages"].items():
+        print(f"  {name:<30}{s['count']:>8}{s['seconds']:>10}{s['mean']:>10}{s['max']:>10}"
+              f"{s['rows']:>10}{s['rows_per_sec'] or '—':>10}")
+    for name, n in summary["counters"].items():
+        print(f"  {name}: {n}")
+
+
+if __name__ == "__main__":
+    main()
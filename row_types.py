@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+row_types.py - 取り込みスクリプト共通の行の型
+変換（record_to_speech / process_shu_row など）の結果を、キー文字列を1行ごとに持つ dict ではなく
+__slots__ のデータクラスで持つ。院・会派・会議名のように同じ値が何万行にも出てくる文字列は intern して1つにまとめる。
+dict にするのは Supabase に送る直前（as_row()）だけ。
+
+使い方:
+  from row_types import SpeechRow
+  speech = SpeechRow(speech_id=..., ...)
+  writer.write("speeches", (s.as_row() for s in speeches), ...)
+"""
+
+import sys
+from dataclasses import dataclass
+
+
+def intern(value):
+    """繰り返し出てくる文字列を1つのオブジェクトにまとめる（文字列以外・空文字はそのまま）"""
+    return sys.intern(value) if isinstance(value, str) and value else value
+
+
+class Row:
+    """as_row() でテーブルの列名 → 値の dict にする"""
+    __slots__ = ()
+
+    def as_row(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+@dataclass(slots=True)
+class MeetingRow(Row):
+    """meetings テーブルの1行（id はDBに任せる）"""
+    issue_id: str
+    session: int | None
+    house: str
+    meeting_name: str
+    issue_number: str
+    date: str
+    meeting_url: str
+
+
+@dataclass(slots=True)
+class SpeechRow(Row):
+    """speeches テーブルの1行。content は元レコードの文字列をそのまま参照する"""
+    speech_id: str
+    meeting_id: str  # meetings.id（uuid）
+    speech_order: int | None
+    speaker_name: str
+    speaker_group: str
+    speaker_position: str
+    content: str
+    speech_url: str
+    date: str
+
+
+@dataclass(slots=True)
+class LegislatorRow(Row):
+    """legislators テーブルの1行（新規・更新の候補）"""
+    name: str
+    current_party: str | None
+    current_position: str | None
+    house: str | None
+    is_member: bool
+    last_seen: str
+    name_yomi: str | None = None
+
+
+@dataclass(slots=True)
+class BillRow(Row):
+    """bills テーブルの1行（import_bills.py）"""
+    house: str
+    session: int | None
+    submit_session: int | None
+    bill_type: str
+    bill_number: int | None
+    bill_name: str
+    caption: str
+    status: str
+    proposer: str
+    proposer_party: str
+    committee: str
+    date_submitted: str
+    date_passed: str
+    result: str
+    law_number: str
+    progress_url: str
+
+    @property
+    def key(self) -> tuple:
+        """議案の一意キー (house, submit_session, bill_type, bill_number)"""
+        return (self.house, self.submit_session, self.bill_type, self.bill_number)
+
+
+@dataclass(slots=True)
+class VoteRow(Row):
+    """bill_votes テーブルの1行。bill_id は議案の id が分かってから as_row(bill_id=...) で付ける"""
+    party_name: str
+    vote: str
+    chamber: str
+
+    def as_row(self, **extra) -> dict:
+        return {"party_name": self.party_name, "vote": self.vote, "chamber": self.chamber, **extra}
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+speaker_index.py - 発言者名 → 議員 の名寄せ索引
+同じ議員でも、国会会議録APIの speaker は「岸田文雄」、参議院CSVは「岸田　文雄」（取り込み時に「岸田 文雄」）、
+旧字体（髙・﨑・邊…）の有無もまちまち。名前の完全一致で引くと発言がリンクされず、議員も重複して登録される。
+
+索引は legislators の全行（lookup_cache の legislators 名前空間）から実行ごとに1回作る。
+  1. 正規化キー（NFKC・空白と中黒の除去・旧字体→新字体）で O(1) に引く
+  2. 過去にあいまい照合で決まった表記（speaker_aliases 名前空間）を O(1) に引く
+  3. 残りだけ、文字バイグラムとよみで候補を絞ってから編集距離で照合する
+     （よみが一致して2文字差まで。候補が1人に決まるときだけ採用）
+     よみがなく会派だけ一致する1文字差の候補は採用しない（同じ会派の「佐藤一郎」と「佐東一朗」は別人のことがある）。
+     新しい議員として扱い、要確認として report_review() で表示する
+
+collect_daily.py / import_councillors.py から使う。
+
+使い方:
+  python speaker_index.py 岸田文雄 "髙市　早苗"   # キャッシュの議員から引いて結果を表示
+  python speaker_index.py --stats                 # 索引の件数
+"""
+
+import argparse
+import unicodedata
+from collections import Counter
+
+from lookup_cache import LookupCache, CACHE_PATH, fetch_in_chunks
+from metrics import metrics
+
+LEGISLATOR_COLUMNS = "id, name, name_yomi, current_party, last_seen"
+ALIAS_NAMESPACE = "speaker_aliases.v2"  # v2: 会派だけの一致で決めた別名（v1）は引き継がない
+MAX_DISTANCE_WITH_YOMI = 2
+MAX_DISTANCE_WITH_PARTY = 1  # 要確認として出すだけ（採用はしない）
+MIN_FUZZY_LENGTH = 3  # これより短い名前はあいまい照合しない
+
+# 旧字体・異体字 → 常用の字（NFKC で統合されないもの）
+VARIANTS = str.maketrans({
+    "髙": "高", "﨑": "崎", "嵜": "崎", "濵": "浜", "濱": "浜", "邊": "辺", "邉": "辺",
+    "齋": "斎", "齊": "斉", "澤": "沢", "廣": "広", "國": "国", "眞": "真", "德": "徳",
+    "惠": "恵", "榮": "栄", "櫻": "桜", "實": "実", "淺": "浅", "瀨": "瀬", "槇": "槙",
+    "嶋": "島", "嶌": "島", "峯": "峰", "與": "与", "戶": "戸", "黑": "黒", "𠮷": "吉",
+    "曻": "昇", "晉": "晋", "壽": "寿", "龜": "亀", "藏": "蔵", "傳": "伝",
+})
+SEPARATORS = str.maketrans("", "", " ・\t")
+
+
+def normalize_name(name: str | None) -> str:
+    """名前の照合キー（NFKC で全角空白・半角カナ・互換漢字をそろえ、空白と中黒を除き、旧字体を新字体に）"""
+    if not name:
+        return ""
+    return unicodedata.normalize("NFKC", name).translate(SEPARATORS).translate(VARIANTS)
+
+
+def normalize_yomi(yomi: str | None) -> str:
+    """よみの照合キー（カタカナはひらがなに）"""
+    if not yomi:
+        return ""
+    yomi = unicodedata.normalize("NFKC", yomi).translate(SEPARATORS)
+    return "".join(chr(ord(c) - 0x60) if "ァ" <= c <= "ヶ" else c for c in yomi)
+
+
+def bigrams(key: str) -> set[str]:
+    """前後に印をつけた文字バイグラム（1文字の置換・挿入・削除なら必ず1つは共有する）"""
+    padded = f"^{key}$"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def edit_distance(a: str, b: str) -> int:
+    """レーベンシュタイン距離（名前は短いので素直なDP）"""
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+def legislator_item(row: dict) -> tuple[str, dict]:
+    """legislators 行 → キャッシュ用 (name, {id, last_seen, name_yomi, current_party})"""
+    return row["name"], {"id": row["id"], "last_seen": row.get("last_seen"),
+                         "name_yomi": row.get("name_yomi"), "current_party": row.get("current_party")}
+
+
+class SpeakerIndex:
+    """正規化キー・よみ・バイグラムで議員を引く索引"""
+
+    def __init__(self):
+        self.by_key: dict[str, list[dict]] = {}
+        self.by_bigram: dict[str, set[str]] = {}
+        self.by_id: dict = {}
+        self.aliases: dict[str, object] = {}  # 正規化キー → 議員ID
+        self.review: dict[str, list[dict]] = {}  # 名前 → 会派だけ一致した候補（採用しない）
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def add(self, name: str, value: dict):
+        """議員1人を追加（value は legislator_item の値。同じIDなら置き換える）"""
+        entry = {**value, "name": name}
+        old = self.by_id.get(entry["id"])
+        if old is not None:
+            self.by_key[old["key"]] = [e for e in self.by_key[old["key"]] if e["id"] != entry["id"]]
+        entry["key"] = key = normalize_name(name)
+        entry["yomi"] = normalize_yomi(entry.get("name_yomi"))
+        self.by_id[entry["id"]] = entry
+        self.by_key.setdefault(key, []).append(entry)
+        for bg in bigrams(key):
+            self.by_bigram.setdefault(bg, set()).add(key)
+
+    def add_alias(self, name: str, legislator_id):
+        self.aliases[normalize_name(name)] = legislator_id
+
+    def get(self, name: str, yomi: str | None = None) -> dict | None:
+        """正規化キー・別名で引く（見つからなければ None）"""
+        key = normalize_name(name)
+        entries = self.by_key.get(key)
+        if not entries:
+            alias = self.aliases.get(key)
+            return self.by_id.get(alias) if alias is not None else None
+        if len(entries) == 1:
+            return entries[0]
+        # 同じキーの議員が複数（同姓同名・過去の重複登録）→ よみ、完全一致、最終発言日の順に絞る
+        yomi = normalize_yomi(yomi)
+        if yomi:
+            entries = [e for e in entries if e["yomi"] in ("", yomi)] or entries
+        return max(entries, key=lambda e: (e["name"] == name, e.get("last_seen") or ""))
+
+    def search(self, name: str, yomi: str | None = None, party: str | None = None) -> dict | None:
+        """
+        あいまい照合。バイグラムを共有する名前だけを候補にし、よみが一致する1人を返す。
+        よみがどちらかになく、会派だけ一致する候補は self.review に記録するだけ
+        """
+        key = normalize_name(name)
+        yomi = normalize_yomi(yomi)
+        if len(key) < MIN_FUZZY_LENGTH or not (yomi or party):
+            return None
+        keys = set()
+        for bg in bigrams(key):
+            keys |= self.by_bigram.get(bg, set())
+        matched = {}
+        review = {}
+        for k in keys:
+            if abs(len(k) - len(key)) > MAX_DISTANCE_WITH_YOMI:
+                continue
+            distance = None
+            for e in self.by_key[k]:
+                if yomi and e["yomi"]:
+                    if e["yomi"] != yomi:
+                        continue
+                    found, limit = matched, MAX_DISTANCE_WITH_YOMI
+                elif party and e.get("current_party") == party:
+                    found, limit = review, MAX_DISTANCE_WITH_PARTY
+                else:
+                    continue
+                if distance is None:
+                    distance = edit_distance(key, k)
+                if distance <= limit:
+                    found[e["id"]] = e
+        if len(matched) == 1:
+            return next(iter(matched.values()))
+        if review and not matched:
+            self.review[name] = list(review.values())
+        return None
+
+    def resolve(self, name: str, yomi: str | None = None, party: str | None = None) -> tuple[dict | None, str]:
+        """(議員, 引けた方法) を返す。方法は exact / normalized / alias / fuzzy / review / unresolved（review も未解決）"""
+        entry = self.get(name, yomi)
+        if entry is not None:
+            if entry["name"] == name:
+                return entry, "exact"
+            return entry, "normalized" if entry["key"] == normalize_name(name) else "alias"
+        entry = self.search(name, yomi, party)
+        if entry is not None:
+            self.add_alias(name, entry["id"])
+            return entry, "fuzzy"
+        return None, "review" if name in self.review else "unresolved"
+
+
+def load_index(cache: LookupCache) -> SpeakerIndex:
+    """キャッシュの legislators / speaker_aliases 名前空間から索引を作る（refresh は呼び出し側で）"""
+    index = SpeakerIndex()
+    for name, value in cache.items("legislators").items():
+        index.add(name, value)
+    for key, legislator_id in cache.items(ALIAS_NAMESPACE).items():
+        index.aliases[key] = legislator_id
+    return index
+
+
+def resolve_many(index: SpeakerIndex, cache: LookupCache, supabase, speakers: dict) -> tuple[dict, Counter]:
+    """
+    名前 → (よみ, 会派) を索引で引き、(名前 → 議員, 方法ごとの件数) を返す。
+    索引で引けなかった名前だけDBに完全一致で問い合わせ（キャッシュの差分更新に載らない行の分）、索引に足す。
+    """
+    resolved = {}
+    hows = {}
+    for name, (yomi, party) in speakers.items():
+        entry, hows[name] = index.resolve(name, yomi, party)
+        if entry is not None:
+            resolved[name] = entry
+
+    missing = [name for name in speakers if name not in resolved]
+    if missing:
+        fetched = fetch_in_chunks(supabase, "legislators", LEGISLATOR_COLUMNS, "name", missing, legislator_item)
+        cache.put_many("legislators", fetched)
+        for name, value in fetched.items():
+            index.add(name, value)
+            resolved[name] = index.by_id[value["id"]]
+            index.review.pop(name, None)
+            hows[name] = "exact"
+
+    counts = Counter(hows.values())
+    for how, n in counts.items():
+        if n:
+            metrics.incr(f"speaker_{how}", n)
+    return resolved, counts
+
+
+def save_aliases(cache: LookupCache, index: SpeakerIndex, names):
+    """あいまい照合で決まった表記を保存し、次回から O(1) で引けるようにする"""
+    keys = {normalize_name(n) for n in names}
+    cache.put_many(ALIAS_NAMESPACE, {k: index.aliases[k] for k in keys if k in index.aliases})
+
+
+def report_review(index: SpeakerIndex, limit: int = 20):
+    """会派だけ一致した候補（新しい議員として登録した名前）を表示する。同じ人なら legislators を手で直す"""
+    if not index.review:
+        return
+    print(f"  要確認（よみがなく会派だけ一致。別の議員として登録）: {len(index.review)}名")
+    for name, candidates in list(index.review.items())[:limit]:
+        print(f"    {name} ≒ {', '.join(c['name'] for c in candidates)}")
+    if len(index.review) > limit:
+        print(f"    ... 他 {len(index.review) - limit}名")
+
+
+def format_counts(counts: Counter) -> str:
+    """resolve の方法ごとの件数を1行に"""
+    labels = {"exact": "完全一致", "normalized": "正規化", "alias": "別名", "fuzzy": "あいまい", "review": "要確認",
+              "unresolved": "未解決"}
+    return ", ".join(f"{label} {counts[how]}" for how, label in labels.items() if counts[how])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="発言者名 → 議員 の名寄せ（ローカルキャッシュから）")
+    parser.add_argument("names", nargs="*", help="引く名前")
+    parser.add_argument("--yomi", help="よみ（1つ目の名前に使う）")
+    parser.add_argument("--party", help="会派（1つ目の名前に使う）")
+    parser.add_argument("--stats", action="store_true", help="索引の件数を表示")
+    parser.add_argument("--path", default=CACHE_PATH, help=f"キャッシュファイル (デフォルト: {CACHE_PATH})")
+    args = parser.parse_args()
+
+    index = load_index(LookupCache(args.path))
+    if args.stats or not args.names:
+        print(f"議員 {len(index)}人, 正規化キー {len(index.by_key)}件, 別名 {len(index.aliases)}件")
+    for i, name in enumerate(args.names):
+        entry, how = index.resolve(name, args.yomi if i == 0 else None, args.party if i == 0 else None)
+        print(f"  {name} → {entry['name']} (id: {entry['id']}, {how})" if entry else f"  {name} → 見つからない")
+    report_review(index)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+speech_archive.py - 国会会議録APIの生レコード（speechRecord）のローカル保存
+collect_daily.py --archive で、取得したページをそのまま発言日ごとの gzip JSON lines に追記する。
+変換（record_to_speech など）を直して作り直すときは、APIを巡回し直さずに
+collect_daily.py --replay でここから読み直す（3秒/ページの待ちがなくディスクの速度で流れる）。
+
+保存形式:
+  <ARCHIVE_DIR>/YYYY/YYYY-MM-DD.jsonl.gz   1行1レコード。追記ごとに gzip メンバーを1つ足す（追記のみ、書き換えない）
+  <ARCHIVE_DIR>/index.sqlite3              speechID → 発言日・issueID・ファイル・メンバー位置・内容ハッシュ
+内容が同じレコードは追記しない。内容が変わったレコードは追記し、読み出しでは後のものを使う。
+
+使い方:
+  python speech_archive.py --stats              # 件数・日数・サイズ
+  python speech_archive.py --issue 121405254X00120250122   # 会議1件分のレコードを表示
+  python speech_archive.py --reindex            # ファイルから索引を作り直す
+  python speech_archive.py --import records.jsonl   # speechRecord の JSON lines を取り込む
+"""
+
+import os
+import json
+import zlib
+import gzip
+import hashlib
+import sqlite3
+import argparse
+import threading
+
+from metrics import metrics
+
+ARCHIVE_DIR = os.environ.get("SPEECH_ARCHIVE_DIR", ".speech_archive")
+INDEX_NAME = "index.sqlite3"
+REPLAY_PAGE_SIZE = 100  # --replay で1ページとして流す件数（APIの maximumRecords と同じ）
+
+
+def record_hash(record: dict) -> str:
+    return hashlib.sha1(json.dumps(record, ensure_ascii=False, sort_keys=True).encode()).hexdigest()
+
+
+def record_key(record: dict) -> str:
+    """collect_daily.make_speech_id と同じキー（speechID がなければ issueID-speechOrder）"""
+    return record.get("speechID") or f"{record.get('issueID', 'unknown')}-{record.get('speechOrder', 0)}"
+
+
+def iter_members(path: str, offset: int = 0):
+    """gzip ファイルを (メンバー開始位置, 展開したバイト列) の順に返す"""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    pos = 0
+    while pos < len(data):
+        d = zlib.decompressobj(wbits=31)
+        out = d.decompress(data[pos:])
+        if not d.eof:
+            print(f"  WARNING: {path} の末尾が壊れている (offset {offset + pos})")
+            return
+        yield offset + pos, out
+        pos = len(data) - len(d.unused_data)
+
+
+def read_member(path: str, offset: int) -> bytes:
+    """offset から始まる gzip メンバー1つだけを展開する（ファイルの残りは読まない）"""
+    d = zlib.decompressobj(wbits=31)
+    out = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while not d.eof:
+            chunk = f.read(64 * 1024)
+            if not chunk:
+                break
+            out.append(d.decompress(chunk))
+    return b"".join(out)
+
+
+class SpeechArchive:
+    """発言日で分けた gzip JSON lines と、その索引（スレッドセーフ）"""
+
+    def __init__(self, path: str = ARCHIVE_DIR):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(path, INDEX_NAME), timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS records (
+                speech_id TEXT PRIMARY KEY,
+                date TEXT NOT NULL,
+                issue_id TEXT NOT NULL,
+                file TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                hash TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS records_date ON records (date);
+            CREATE INDEX IF NOT EXISTS records_issue ON records (issue_id);
+        """)
+
+    def file_for(self, date: str) -> str:
+        """発言日 → アーカイブ内の相対パス（日付がないものは unknown にまとめる）"""
+        if len(date) < 10:
+            return "unknown.jsonl.gz"
+        return f"{date[:4]}/{date[:10]}.jsonl.gz"
+
+    def append(self, records: list[dict]) -> int:
+        """1ページ分のレコードを追記し、追記した件数を返す（保存済みで内容が同じものは飛ばす）"""
+        if not records:
+            return 0
+        with metrics.stage("archive_write") as stage, self.lock:
+            ids = [record_key(r) for r in records]
+            stored = {}
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                stored.update(self.conn.execute(
+                    f"SELECT speech_id, hash FROM records WHERE speech_id IN ({','.join('?' * len(chunk))})", chunk))
+
+            by_file: dict[str, list[tuple[dict, str]]] = {}
+            for record, speech_id in zip(records, ids):
+                h = record_hash(record)
+                if stored.get(speech_id) == h:
+                    continue
+                stored[speech_id] = h  # 同じページ内の重複も1回だけ
+                by_file.setdefault(self.file_for(record.get("date", "")), []).append((record, h))
+
+            rows = []
+            for name, items in by_file.items():
+                path = os.path.join(self.path, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                lines = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r, _ in items)
+                member = gzip.compress(lines.encode(), compresslevel=6)
+                with open(path, "ab") as f:
+                    offset = f.tell()
+                    f.write(member)
+                rows += [(record_key(r), r.get("date", ""), r.get("issueID", ""), name, offset, h) for r, h in items]
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?)", rows)
+            stage.rows = len(rows)
+        return len(rows)
+
+    def _read_file(self, name: str) -> dict[str, dict]:
+        """1ファイルを読み、speechID → レコード（同じIDは後から追記したもの）を返す"""
+        records = {}
+        path = os.path.join(self.path, name)
+        if not os.path.exists(path):
+            return records
+        for _, data in iter_members(path):
+            for line in data.decode().splitlines():
+                r = json.loads(line)
+                records[record_key(r)] = r
+        return records
+
+    def count(self, from_date: str, until_date: str) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM records WHERE date BETWEEN ? AND ?",
+                                 (from_date, until_date)).fetchone()[0]
+
+    def iter_records(self, from_date: str, until_date: str):
+        """from_date 〜 until_date のレコードを発言日順に返す"""
+        files = [name for (name,) in self.conn.execute(
+            "SELECT DISTINCT file FROM records WHERE date BETWEEN ? AND ? ORDER BY file",
+            (from_date, until_date))]
+        for name in files:
+            for r in self._read_file(name).values():
+                if from_date <= r.get("date", "") <= until_date:
+                    yield r
+
+    def iter_pages(self, from_date: str, until_date: str, page_size: int = REPLAY_PAGE_SIZE):
+        """collect_daily.iter_speech_pages と同じ (startRecord, records) の形で返す"""
+        print(f"  期間 {from_date} ~ {until_date}: {self.count(from_date, until_date)}件の発言（アーカイブ）")
+        page = []
+        start = 1
+        for r in self.iter_records(from_date, until_date):
+            page.append(r)
+            if len(page) >= page_size:
+                yield start, page
+                start += len(page)
+                page = []
+        if page:
+            yield start, page
+
+    def records_for_issue(self, issue_id: str) -> list[dict]:
+        """会議1件分のレコード。索引のメンバー位置から必要な部分だけ展開する"""
+        rows = self.conn.execute("SELECT speech_id, file, offset FROM records WHERE issue_id = ?",
+                                 (issue_id,)).fetchall()
+        wanted = {(name, offset): set() for _, name, offset in rows}
+        for speech_id, name, offset in rows:
+            wanted[(name, offset)].add(speech_id)
+        records = []
+        for (name, offset), ids in wanted.items():
+            for line in read_member(os.path.join(self.path, name), offset).decode().splitlines():
+                r = json.loads(line)
+                if record_key(r) in ids:
+                    records.append(r)
+        return sorted(records, key=lambda r: int(r.get("speechOrder") or 0))
+
+    def reindex(self) -> int:
+        """全ファイルを読み直して索引を作り直す（索引が消えた・壊れたとき用）"""
+        rows = []
+        for root, _, names in os.walk(self.path):
+            for n in sorted(names):
+                if not n.endswith(".jsonl.gz"):
+                    continue
+                name = os.path.relpath(os.path.join(root, n), self.path)
+                for offset, data in iter_members(os.path.join(self.path, name)):
+                    for line in data.decode().splitlines():
+                        r = json.loads(line)
+                        rows.append((record_key(r), r.get("date", ""), r.get("issueID", ""), name, offset,
+                                     record_hash(r)))
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM records")
+            # ファイル内は追記順なので、同じIDは後の行で上書きされる
+            self.conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def stats(self) -> dict:
+        records, dates, issues, first, last = self.conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT date), COUNT(DISTINCT issue_id), MIN(date), MAX(date) FROM records"
+        ).fetchone()
+        size = sum(os.path.getsize(os.path.join(root, n))
+                   for root, _, names in os.walk(self.path) for n in names if n.endswith(".jsonl.gz"))
+        return {"records": records, "dates": dates, "issues": issues, "from": first, "until": last, "bytes": size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="国会会議録 生レコードのアーカイブ")
+    parser.add_argument("--dir", default=ARCHIVE_DIR, help=f"アーカイブのディレクトリ (デフォルト: {ARCHIVE_DIR})")
+    parser.add_argument("--stats", action="store_true", help="件数・日数・サイズを表示")
+    parser.add_argument("--issue", help="会議（issueID）1件分のレコードを JSON lines で表示")
+    parser.add_argument("--reindex", action="store_true", help="ファイルから索引を作り直す")
+    parser.add_argument("--import", dest="import_path", help="speechRecord の JSON lines を取り込む")
+    args = parser.parse_args()
+
+    archive = SpeechArchive(args.dir)
+    if args.import_path:
+        added = 0
+        with open(args.import_path, encoding="utf-8") as f:
+            page = []
+            for line in f:
+                if line.strip():
+                    page.append(json.loads(line))
+                if len(page) >= REPLAY_PAGE_SIZE:
+                    added += archive.append(page)
+                    page = []
+            added += archive.append(page)
+        print(f"取り込み: {added}件")
+    if args.reindex:
+        print(f"索引を作り直しました: {archive.reindex()}件")
+    if args.issue:
+        for r in archive.records_for_issue(args.issue):
+            print(json.dumps(r, ensure_ascii=False))
+    if args.stats or not (args.reindex or args.issue or args.import_path):
+        s = archive.stats()
+        print(f"{args.dir}: {s['records']}件, {s['dates']}日分, 会議 {s['issues']}件 "
+              f"({s['from']} ~ {s['until']}), {s['bytes'] / 1e6:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
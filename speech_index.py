@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+speech_index.py - 発言本文の全文検索インデックス（文字バイグラムの転置インデックス）
+collect_daily.py --index で、発言を書き込むたびに本文を足していく。サイトの ilike '%…%' のように
+speeches 全体をなめずに、語を含む発言の speechID をスコア順に返す。
+
+トークンは NFKC・小文字化した本文の文字バイグラム（形態素解析の依存なし）。句読点・空白で区切り、
+区切りの直前の1文字も (文字, 終端) として持つので、1文字の検索もできる。
+複数語・複数バイグラムは AND（バイグラムの並びまでは確かめないので「東京都」は「東京」と「京都」を含む発言にも当たる）。
+スコアは BM25。
+
+保存形式:
+  <INDEX_DIR>/seg-*.sidx       セグメント（書き込み後は変更しない）。ヘッダ・ポスティング・バイグラム表・発言長・speechID
+                               ポスティングは (文書番号の差分, 出現数) の uint32 列を語ごとに zlib 圧縮
+  <INDEX_DIR>/manifest.sqlite3 有効なセグメントの一覧と、索引済みの speechID（同じ発言を2回足さない）
+足した発言はメモリに溜め、一定量ごと・flush() でセグメントに書き出す（書き出す前に落ちた分は --from-archive で埋まる）。
+同じ規模のセグメントが MERGE_FACTOR 個たまったら1つにまとめる（--merge で全部を1つに）。
+
+使い方:
+  python speech_index.py --search "消費税 軽減税率"     # スコア順の speechID
+  python speech_index.py --stats                         # セグメント数・発言数・サイズ
+  python speech_index.py --merge                         # セグメントを1つにまとめる
+  python speech_index.py --from-archive                  # 生レコードのアーカイブ（speech_archive.py）から作る
+"""
+
+import os
+import re
+import math
+import mmap
+import time
+import zlib
+import heapq
+import fcntl
+import struct
+import sqlite3
+import argparse
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import accumulate, chain, repeat
+from operator import lshift, or_, sub
+
+INDEX_DIR = os.environ.get("SPEECH_INDEX_DIR", ".speech_index")
+MANIFEST_NAME = "manifest.sqlite3"
+FLUSH_POSTINGS = 4_000_000  # メモリに溜めるポスティング数の上限（超えたらセグメントに書き出す）
+MERGE_FACTOR = 8  # 同じ段のセグメントがこれだけたまったらまとめる
+K1 = 1.2  # BM25
+B = 0.75
+
+MAGIC = b"SIDX\x01\x00\x00\x00"
+# magic, 文書数, バイグラム数, 総トークン数, 各セクションの開始位置（バイグラム表・位置・長さ・文書頻度・発言長・ID位置・ID本体）
+HEADER = struct.Struct("<8sIIQ7Q")
+CHAR_BITS = 21  # キー = 1文字目 << 21 | 2文字目（2文字目が 0 なら区切りの直前の文字）
+CHAR_MASK = (1 << CHAR_BITS) - 1
+# 区切り（空白・句読点・括弧・発言冒頭の ○）。すべて \0 にしてからバイグラムを作る
+SEPARATORS = re.compile(r"[\s、。，．,.・「」『』（）()\[\]［］【】〔〕〈〉《》!?！？:：;；\"'“”‘’…○◯〇―]")
+
+
+def bigram_keys(text: str) -> list[int]:
+    """
+    本文 → バイグラムのキーの列。区切りの直前の文字は (文字, 0) になる（1文字の検索用）。
+    NFKC は本文がすでに正規化済みなら省く（会議録の本文はほぼそう）
+    """
+    text = SEPARATORS.sub("\0", text)
+    if not unicodedata.is_normalized("NFKC", text):
+        text = SEPARATORS.sub("\0", unicodedata.normalize("NFKC", text))
+    cps = array("I", (text.lower() + "\0").encode("utf-32-le"))
+    # (区切り, 文字) と (区切り, 区切り) のキーは 1 << 21 未満になるので落とす
+    return list(filter((1 << CHAR_BITS).__le__, map(or_, map(lshift, cps, repeat(CHAR_BITS)), cps[1:])))
+
+
+def query_terms(query: str) -> list[tuple[int, int]]:
+    """検索語 → キーの範囲 [lo, hi) の列。2文字以上はバイグラム、1文字はその文字で始まるキー全部"""
+    terms = []
+    for word in query.split():
+        keys = bigram_keys(word)
+        pairs = [k for k in keys if k & CHAR_MASK]
+        if pairs:
+            # 重なりを1つおきに飛ばしても全部の文字を覆う（長い語で突き合わせる回数が半分になる）
+            terms += [(k, k + 1) for k in pairs[::2] + pairs[-1:]]
+        else:
+            terms += [(k, k + (1 << CHAR_BITS)) for k in keys]
+    return list(dict.fromkeys(terms))
+
+
+class SegmentWriter:
+    """セグメントを1つ書く。ポスティングはキーの昇順に add_term で渡す"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path + ".tmp", "wb")
+        self.file.write(b"\0" * HEADER.size)
+        self.keys = array("Q")
+        self.offsets = array("Q")
+        self.lengths = array("I")
+        self.dfs = array("I")
+
+    def add_term(self, key: int, docs: array, tfs: array):
+        deltas = array("I", map(sub, docs, chain((0,), docs)))
+        block = zlib.compress(deltas.tobytes() + tfs.tobytes(), 1)
+        self.keys.append(key)
+        self.offsets.append(self.file.tell())
+        self.lengths.append(len(block))
+        self.dfs.append(len(docs))
+        self.file.write(block)
+
+    def finish(self, doc_lens: array, speech_ids: list[str]):
+        """発言長・speechID を書いてヘッダを埋め、名前を付け替える"""
+        blob = "".join(speech_ids).encode()
+        id_offsets = array("I", accumulate((len(s.encode()) for s in speech_ids), initial=0))
+        sections = []
+        for data in (self.keys, self.offsets, self.lengths, self.dfs, doc_lens, id_offsets, blob):
+            sections.append(self.file.tell())
+            self.file.write(data if isinstance(data, bytes) else data.tobytes())
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, len(doc_lens), len(self.keys), sum(doc_lens), *sections))
+        self.file.close()
+        os.replace(self.path + ".tmp", self.path)
+
+
+class Segment:
+    """書き込み済みのセグメント（mmap で開き、バイグラム表と発言長だけメモリに載せる）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.docs, terms, self.tokens, *sections = HEADER.unpack_from(self.mm)
+        if magic != MAGIC:
+            raise ValueError(f"セグメントではない: {path}")
+        tables = [self.mm[start:end] for start, end in zip(sections[:6], sections[1:])]  # ID本体は mmap のまま
+        self.keys, self.offsets, self.lengths, self.dfs, self.doc_lens, self.id_offsets = (
+            self._array(code, data) for code, data in zip("QQIIII", tables))
+        self.id_base = sections[6]
+
+    @staticmethod
+    def _array(code: str, data: bytes) -> array:
+        a = array(code)
+        a.frombytes(data)
+        return a
+
+    def postings(self, i: int) -> tuple[array, array]:
+        """i 番目のバイグラムの (文書番号, 出現数)"""
+        raw = zlib.decompress(self.mm[self.offsets[i]:self.offsets[i] + self.lengths[i]])
+        n = self.dfs[i]
+        docs = array("I", accumulate(self._array("I", raw[:4 * n])))
+        return docs, self._array("I", raw[4 * n:])
+
+    def range_postings(self, lo: int, hi: int) -> tuple[array, array]:
+        """キーが [lo, hi) のバイグラムをまとめた (文書番号, 出現数の合計)"""
+        start, end = bisect_left(self.keys, lo), bisect_left(self.keys, hi)
+        if end - start == 1:
+            return self.postings(start)
+        counts = Counter()
+        for i in range(start, end):
+            docs, tfs = self.postings(i)
+            for doc, tf in zip(docs, tfs):
+                counts[doc] += tf
+        docs = array("I", sorted(counts))
+        return docs, array("I", map(counts.__getitem__, docs))
+
+    def speech_ids(self) -> list[str]:
+        blob = self.mm[self.id_base:self.id_base + self.id_offsets[-1]]
+        return [blob[a:b].decode() for a, b in zip(self.id_offsets, self.id_offsets[1:])]
+
+    def speech_id(self, doc: int) -> str:
+        a, b = self.id_offsets[doc], self.id_offsets[doc + 1]
+        return self.mm[self.id_base + a:self.id_base + b].decode()
+
+    def norms(self, avgdl: float) -> list[float]:
+        """BM25 の文書長の補正 K1 * (1 - B + B * 長さ / 平均長)。平均長が変わるまで使い回す"""
+        if getattr(self, "_norms_avgdl", None) != avgdl:
+            self._norms = [K1 * (1 - B + B * n / avgdl) for n in self.doc_lens]
+            self._norms_avgdl = avgdl
+        return self._norms
+
+    def close(self):
+        self.mm.close()
+
+
+def segment_name() -> str:
+    """新しいセグメントの名前（名前順 = 作った順。ワーカープロセスが同時に書いても重ならない）"""
+    return f"seg-{time.time_ns():020d}-{os.getpid()}.sidx"
+
+
+def level(docs: int, base: int) -> int:
+    """セグメントの段（いちばん小さいセグメントの MERGE_FACTOR 倍ごとに1段上がる）"""
+    return int(math.log(docs / base, MERGE_FACTOR) + 1e-9) if docs > base else 0
+
+
+class SpeechIndex:
+    """発言本文の転置インデックス。add_many → flush で書き、search で引く"""
+
+    def __init__(self, path: str = INDEX_DIR, flush_postings: int = FLUSH_POSTINGS):
+        self.path = path
+        self.flush_postings = flush_postings
+        os.makedirs(path, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(path, MANIFEST_NAME), timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS segments (
+                name TEXT PRIMARY KEY,
+                docs INTEGER NOT NULL,
+                tokens INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS docs (speech_id TEXT PRIMARY KEY) WITHOUT ROWID;
+        """)
+        self.segments: dict[str, Segment] = {}
+        self._reset_buffer()
+
+    def _reset_buffer(self):
+        self.buffer: dict[int, array] = {}  # キー → [文書番号, 出現数, 文書番号, 出現数, …]
+        self.buffer_ids: list[str] = []
+        self.buffer_lens = array("I")
+        self.buffer_postings = 0
+
+    def _lock(self):
+        """セグメントの一覧を書き換える間のプロセス間ロック（--shard のワーカーが同時に書き出す）"""
+        f = open(os.path.join(self.path, "lock"), "w")
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return f
+
+    # === 書き込み ===
+
+    def add_many(self, speeches) -> int:
+        """(speechID, 本文) を足し、足した件数を返す（索引済み・空の本文は飛ばす）"""
+        added = 0
+        pending = set(self.buffer_ids)
+        chunk = []
+        for item in speeches:
+            chunk.append(item)
+            if len(chunk) >= 500:
+                added += self._add_chunk(chunk, pending)
+                chunk = []
+        return added + self._add_chunk(chunk, pending)
+
+    def _add_chunk(self, chunk: list[tuple[str, str]], pending: set) -> int:
+        ids = [speech_id for speech_id, _ in chunk]
+        known = {row[0] for row in self.conn.execute(
+            f"SELECT speech_id FROM docs WHERE speech_id IN ({','.join('?' * len(ids))})", ids)} if ids else set()
+        added = 0
+        for speech_id, text in chunk:
+            if not text or speech_id in known or speech_id in pending:
+                continue
+            pending.add(speech_id)
+            keys = bigram_keys(text)
+            doc = len(self.buffer_ids)
+            self.buffer_ids.append(speech_id)
+            self.buffer_lens.append(len(keys))
+            counts = Counter(keys)
+            for key, tf in counts.items():
+                entry = self.buffer.get(key)
+                if entry is None:
+                    entry = self.buffer[key] = array("I")
+                entry.append(doc)
+                entry.append(tf)
+            self.buffer_postings += len(counts)
+            added += 1
+            if self.buffer_postings >= self.flush_postings:
+                self.flush()
+                pending.clear()
+        return added
+
+    def flush(self) -> str | None:
+        """溜めた発言をセグメントに書き出し、必要ならまとめる。書いたセグメント名を返す"""
+        if not self.buffer_ids:
+            return None
+        name = segment_name()
+        writer = SegmentWriter(os.path.join(self.path, name))
+        for key in sorted(self.buffer):
+            entry = self.buffer[key]
+            writer.add_term(key, entry[0::2], entry[1::2])
+        writer.finish(self.buffer_lens, self.buffer_ids)
+        with self._lock(), self.conn:
+            self.conn.execute("INSERT INTO segments VALUES (?, ?, ?)",
+                              (name, len(self.buffer_ids), sum(self.buffer_lens)))
+            self.conn.executemany("INSERT OR IGNORE INTO docs VALUES (?)", ((i,) for i in self.buffer_ids))
+        self._reset_buffer()
+        self.maybe_merge()
+        return name
+
+    def manifest(self) -> list[tuple[str, int, int]]:
+        """[(セグメント名, 文書数, トークン数)]（古い順）"""
+        return self.conn.execute("SELECT name, docs, tokens FROM segments ORDER BY name").fetchall()
+
+    def maybe_merge(self):
+        """同じ段のセグメントが MERGE_FACTOR 個たまっていたらまとめる（段が上がって連鎖することもある）"""
+        while True:
+            manifest = self.manifest()
+            if not manifest:
+                return
+            base = min(docs for _, docs, _ in manifest)
+            levels = {}
+            for name, docs, _ in manifest:
+                levels.setdefault(level(docs, base), []).append(name)
+            full = [names for _, names in sorted(levels.items()) if len(names) >= MERGE_FACTOR]
+            if not full:
+                return
+            self.merge(full[0][:MERGE_FACTOR])
+
+    def merge(self, names: list[str] | None = None) -> str | None:
+        """セグメントを1つにまとめる（names 省略時は全部）。文書番号は古いセグメントから順に振り直す"""
+        with self._lock():
+            current = [name for name, _, _ in self.manifest()]
+            names = [n for n in current if n in (names or current)]
+            if len(names) < 2:
+                return None
+            segments = [Segment(os.path.join(self.path, n)) for n in names]
+            bases = list(accumulate((s.docs for s in segments), initial=0))
+            name = segment_name()
+            writer = SegmentWriter(os.path.join(self.path, name))
+            streams = [zip(s.keys, repeat(n), range(len(s.keys))) for n, s in enumerate(segments)]
+            key, parts = None, []
+            for k, n, i in chain(heapq.merge(*streams), [(None, None, None)]):
+                if k != key and parts:
+                    docs, tfs = array("I"), array("I")
+                    for d, t in parts:
+                        docs += d
+                        tfs += t
+                    writer.add_term(key, docs, tfs)
+                    parts = []
+                key = k
+                if k is None:
+                    break
+                docs, tfs = segments[n].postings(i)
+                if bases[n]:
+                    docs = array("I", map(bases[n].__add__, docs))
+                parts.append((docs, tfs))
+            doc_lens = array("I")
+            speech_ids = []
+            for s in segments:
+                doc_lens += s.doc_lens
+                speech_ids += s.speech_ids()
+            writer.finish(doc_lens, speech_ids)
+            for s in segments:
+                s.close()
+            with self.conn:
+                self.conn.executemany("DELETE FROM segments WHERE name = ?", ((n,) for n in names))
+                self.conn.execute("INSERT INTO segments VALUES (?, ?, ?)", (name, len(doc_lens), sum(doc_lens)))
+            for n in names:
+                old = self.segments.pop(n, None)
+                if old is not None:
+                    old.close()
+                os.remove(os.path.join(self.path, n))
+        return name
+
+    # === 検索 ===
+
+    def refresh(self):
+        """一覧を読み直し、増えたセグメントを開いて消えたものを閉じる"""
+        names = [name for name, _, _ in self.manifest()]
+        for name in [n for n in self.segments if n not in names]:
+            self.segments.pop(name).close()
+        for name in names:
+            if name not in self.segments:
+                self.segments[name] = Segment(os.path.join(self.path, name))
+
+    def search(self, query: str, limit: int = 20) -> list[tuple[str, float]]:
+        """query の語をすべて含む発言を [(speechID, スコア)] で BM25 の高い順に返す（書き出し済みの分だけ）"""
+        self.refresh()
+        terms = query_terms(query)
+        segments = list(self.segments.values())
+        total_docs = sum(s.docs for s in segments)
+        if not terms or not total_docs:
+            return []
+        avgdl = sum(s.tokens for s in segments) / total_docs
+
+        # 語ごと・セグメントごとのポスティング。どこかのセグメントにない語があってもよい（AND はセグメント内で取る）
+        postings = [[s.range_postings(lo, hi) for s in segments] for lo, hi in terms]
+        idf = []
+        for per_segment in postings:
+            df = sum(len(docs) for docs, _ in per_segment)
+            if not df:
+                return []
+            idf.append(math.log(1 + (total_docs - df + 0.5) / (df + 0.5)))
+
+        # セグメントごとに語を珍しい順に足し込む（スコアの dict が AND の候補を兼ねる）
+        hits = []
+        for n, segment in enumerate(segments):
+            norms = segment.norms(avgdl)
+            lists = sorted(((postings[t][n], idf[t] * (K1 + 1)) for t in range(len(terms))), key=lambda p: len(p[0][0]))
+            (docs, tfs), weight = lists[0]
+            scores = {doc: weight * tf / (tf + norms[doc]) for doc, tf in zip(docs, tfs)}
+            for (docs, tfs), weight in lists[1:]:
+                if not scores:
+                    break
+                if len(scores) * 24 < len(docs):
+                    # 候補が少なければ二分探索、多ければ dict にして突き合わせる
+                    for doc in list(scores):
+                        j = bisect_left(docs, doc)
+                        if j < len(docs) and docs[j] == doc:
+                            scores[doc] += weight * tfs[j] / (tfs[j] + norms[doc])
+                        else:
+                            del scores[doc]
+                else:
+                    lookup = dict(zip(docs, tfs))
+                    scores = {doc: score + weight * lookup[doc] / (lookup[doc] + norms[doc])
+                              for doc, score in scores.items() if doc in lookup}
+            hits += heapq.nlargest(limit, ((score, n, doc) for doc, score in scores.items()))
+
+        return [(segments[n].speech_id(doc), round(score, 4)) for score, n, doc in heapq.nlargest(limit, hits)]
+
+    def stats(self) -> dict:
+        manifest = self.manifest()
+        size = sum(os.path.getsize(os.path.join(self.path, name)) for name, _, _ in manifest)
+        return {"segments": len(manifest), "docs": sum(d for _, d, _ in manifest),
+                "tokens": sum(t for _, _, t in manifest), "bytes": size, "buffered": len(self.buffer_ids)}
+
+    def close(self):
+        self.flush()
+        for segment in self.segments.values():
+            segment.close()
+        self.segments.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="発言本文の全文検索インデックス")
+    parser.add_argument("--dir", default=INDEX_DIR, help=f"インデックスのディレクトリ (デフォルト: {INDEX_DIR})")
+    parser.add_argument("--search", help="検索語（空白区切りは AND）")
+    parser.add_argument("--limit", type=int, default=20, help="--search で返す件数 (デフォルト: 20)")
+    parser.add_argument("--stats", action="store_true", help="セグメント数・発言数・サイズを表示")
+    parser.add_argument("--merge", action="store_true", help="セグメントを1つにまとめる")
+    parser.add_argument("--from-archive", nargs="?", const="", metavar="DIR",
+                        help="生レコードのアーカイブ（speech_archive.py）から索引を作る（索引済みの発言は飛ばす）")
+    args = parser.parse_args()
+
+    index = SpeechIndex(args.dir)
+    if args.from_archive is not None:
+        from speech_archive import ARCHIVE_DIR, SpeechArchive, record_key
+        archive = SpeechArchive(args.from_archive or ARCHIVE_DIR)
+        added = index.add_many((record_key(r), r.get("speech", "")) for r in archive.iter_records("", "9999"))
+        index.flush()
+        print(f"アーカイブから追加: {added}件")
+    if args.merge:
+        print(f"まとめました: {index.merge() or '（1つ以下なので何もしない）'}")
+    if args.search:
+        for speech_id, score in index.search(args.search, args.limit):
+            print(f"{speech_id}\t{score}")
+    if args.stats or not (args.search or args.merge or args.from_archive is not None):
+        s = index.stats()
+        print(f"{args.dir}: {s['docs']}件, セグメント {s['segments']}個, トークン {s['tokens']}, "
+              f"{s['bytes'] / 1e6:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
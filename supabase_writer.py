@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+supabase_writer.py - 取り込みスクリプト共通の書き込みキュー（write-behind）
+upsert / insert のバッチを受け取り、最大 N 本を同時に送る。
+キューが一杯なら投入側が空くまで待つ（バックプレッシャー）ので、メモリは増え続けない。
+
+- write() は行リストを、テーブルごとに調整する「1リクエストの送信バイト数」で区切って送る。
+  応答が速ければ広げ、遅ければ縮める。413 やタイムアウトはバッチを半分に割って送り直す
+- 429 / 5xx / 接続エラーは、ジッター付き指数バックオフで再送する
+  ただし届いたか分からない失敗（応答待ちのタイムアウト・途中での切断・504）は、
+  送り直しても同じ結果になる upsert（on_conflict あり）だけ再送・分割する。insert は重複行を作りうるので投げる
+- ordered_tables に入れたテーブルは、投入順に1本ずつ送る（同じテーブル内の順序を保つ）
+- 別テーブルへの外部キー（speeches → meetings 等）が絡む場合は、親テーブルを flush(table) してから子を投入する
+- flush() で全バッチの完了を待ち、失敗があれば最初の例外を投げる。
+  flush し忘れても終了時（atexit）に残りを送り切る
+
+使い方:
+  from supabase_writer import BatchWriter
+  with BatchWriter(supabase) as writer:
+      writer.write("speeches", speeches, on_conflict="speech_id", ignore_duplicates=True)
+  # with を抜けると flush（失敗があれば例外）
+
+  for batch in writer.write("bills", bills, on_conflict="...", returning="representation"):
+      rows = batch.result().data  # レスポンスが必要なら Batch（Future）から受け取る
+  # 行数は batch.size。送った行 batch.rows は失敗したバッチにだけ残す（成功したら手放してメモリを空ける）
+"""
+
+import os
+import json
+import time
+import atexit
+import random
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import httpx
+
+from metrics import metrics
+
+WRITE_CONCURRENCY = int(os.environ.get("SUPABASE_WRITE_CONCURRENCY", 4))  # 同時に送るバッチ数
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5  # 秒。再送ごとに倍（上限 BACKOFF_MAX）、実際の待ちは 0〜その値の一様乱数
+BACKOFF_MAX = 30.0
+
+# 1リクエストの送信バイト数（JSON）。テーブルごとに INITIAL から始めて応答時間で調整する
+INITIAL_BATCH_BYTES = 256 * 1024
+MIN_BATCH_BYTES = 8 * 1024
+MAX_BATCH_BYTES = 4 * 1024 * 1024
+MAX_BATCH_ROWS = 5000  # バイト数が小さくても1リクエストの行数はここまで
+FAST_RESPONSE = 1.0  # 秒。これより速ければバッチを広げる
+SLOW_RESPONSE = 5.0  # 秒。これより遅ければ縮める
+
+RETRY_STATUS = {408, 425, 429}  # これ以外は 5xx のみ再送
+RETRY_CODES = {
+    "PGRST000", "PGRST001", "PGRST002", "PGRST003",  # PostgREST ↔ DB の接続エラー・プール枯渇
+    "57014",  # statement_timeout
+    "40001", "40P01",  # シリアライズ失敗・デッドロック
+    "53300", "57P01",  # 接続数上限・管理者による切断
+}
+SPLIT_STATUS = {413, 504}  # 大きすぎる・重すぎるバッチ（割れば通る見込み）
+SPLIT_CODES = {"57014"}
+# 送る前に失敗したと分かる接続エラー（これ以外の TransportError は、DBでコミット済みかもしれない）
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.ProxyError,
+                 httpx.UnsupportedProtocol, httpx.LocalProtocolError)
+AMBIGUOUS_STATUS = {504}  # ゲートウェイのタイムアウト。DBでは完了しているかもしれない
+
+
+def _status(error: Exception) -> int | None:
+    """postgrest-py はレスポンスがJSONでないとき code に HTTPステータスを入れる"""
+    code = getattr(error, "code", None)
+    if isinstance(code, int) or (isinstance(code, str) and len(code) == 3 and code.isdigit()):
+        return int(code)
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """再送してよいエラーか（一時的な混雑・接続断）。制約違反などは False"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    status = _status(error)
+    if status is not None:
+        return status in RETRY_STATUS or status >= 500
+    return getattr(error, "code", None) in RETRY_CODES
+
+
+def is_too_large(error: Exception) -> bool:
+    """バッチを小さくすれば通りそうなエラーか（413・タイムアウト）"""
+    if isinstance(error, httpx.TimeoutException):
+        return True
+    return _status(error) in SPLIT_STATUS or getattr(error, "code", None) in SPLIT_CODES
+
+
+def is_ambiguous(error: Exception) -> bool:
+    """書き込みが反映されたか分からないエラーか（送り直すと insert では行が重複しうる）"""
+    if isinstance(error, httpx.TransportError):
+        return not isinstance(error, UNSENT_ERRORS)
+    return _status(error) in AMBIGUOUS_STATUS
+
+
+def backoff_delay(attempt: int) -> float:
+    """attempt 回目（0始まり）の再送前の待ち時間（full jitter）"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def execute_with_retry(query, label: str, max_retries: int = MAX_RETRIES, split_on_error: bool = False,
+                       idempotent: bool = True):
+    """
+    query.execute() を、再送してよいエラーの間だけジッター付きバックオフで繰り返す（writer を通さない単発の書き込み用）。
+    split_on_error=True なら、割れば通りそうなエラーは再送せずに投げる（呼び出し側で分割する）。
+    idempotent=False（insert など）なら、届いたか分からないエラーは再送せずに投げる
+    """
+    for attempt in range(max_retries):
+        try:
+            return query.execute()
+        except Exception as e:
+            if (attempt == max_retries - 1 or not is_retryable(e) or (split_on_error and is_too_large(e))
+                    or (not idempotent and is_ambiguous(e))):
+                raise
+            wait = backoff_delay(attempt)
+            metrics.incr("write_retries")
+            print(f"    ⚠️ {label} 書き込みエラー (試行{attempt + 1}/{max_retries}): "
+                  f"{str(e)[:80]} … {wait:.1f}秒後に再送")
+            time.sleep(wait)
+
+
+def row_bytes(row: dict) -> int:
+    """1行の送信バイト数（httpx と同じコンパクトな UTF-8 JSON + 区切りのカンマ）"""
+    return len(json.dumps(row, ensure_ascii=False, separators=(",", ":"), default=str).encode()) + 1
+
+
+class BatchSizer:
+    """
+    1テーブル分のバッチの大きさ。送信バイト数の目標 target を持ち、
+    応答が FAST_RESPONSE より速ければ 1.5倍、SLOW_RESPONSE より遅ければ半分にする。
+    413・タイムアウトなら失敗したバッチの半分まで縮め、以後はその 3/4 を超えて広げない
+    """
+
+    def __init__(self, target: int = INITIAL_BATCH_BYTES, max_rows: int = MAX_BATCH_ROWS):
+        self.target = target
+        self.ceiling = MAX_BATCH_BYTES
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+
+    def batches(self, rows, max_rows: int | None = None):
+        """rows を (行リスト, バイト数) に区切って順に返す。区切る時点の target を使うので、途中の調整が後続に効く"""
+        limit = min(self.max_rows, max_rows or self.max_rows)
+        batch, size = [], 0
+        for row in rows:
+            n = row_bytes(row)
+            if batch and (size + n > self.target or len(batch) >= limit):
+                yield batch, size
+                batch, size = [], 0
+            batch.append(row)
+            size += n
+        if batch:
+            yield batch, size
+
+    def observe(self, nbytes: int, seconds: float):
+        with self.lock:
+            if seconds < FAST_RESPONSE and nbytes >= self.target / 2:  # 端数の小さいバッチでは広げない
+                self.target = max(self.target, min(self.ceiling, int(self.target * 1.5)))
+            elif seconds > SLOW_RESPONSE:
+                self.target = max(MIN_BATCH_BYTES, self.target // 2)
+
+    def too_large(self, nbytes: int):
+        with self.lock:
+            self.ceiling = max(MIN_BATCH_BYTES, min(self.ceiling, nbytes * 3 // 4))
+            self.target = max(MIN_BATCH_BYTES, min(self.target, nbytes) // 2)
+
+
+class Batch(Future):
+    """1リクエスト分の行と送信オプション。APIResponse か例外で完了する"""
+
+    def __init__(self, table: str, rows: list[dict], nbytes: int, options: dict, stage: str):
+        super().__init__()
+        self.table = table
+        self.rows = rows
+        self.size = len(rows)
+        self.nbytes = nbytes
+        self.options = options
+        self.stage = stage
+
+
+class BatchWriter:
+    """バッチ書き込みを最大 max_in_flight 本並行で送る"""
+
+    def __init__(self, supabase, max_in_flight: int = WRITE_CONCURRENCY, max_retries: int = MAX_RETRIES,
+                 ordered_tables=()):
+        self.supabase = supabase
+        self.max_retries = max_retries
+        self.ordered_tables = set(ordered_tables)
+        self.pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="writer")
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.lock = threading.Lock()
+        self.pending: set[Batch] = set()
+        self.failed: list[tuple[str, Exception]] = []  # flush() で報告する (テーブル名, 例外)
+        self.lanes: dict[str, deque] = {}  # ordered_tables の順番待ち
+        self.sizers: dict[str, BatchSizer] = {}
+        atexit.register(self._flush_at_exit)
+
+    def sizer(self, table: str) -> BatchSizer:
+        with self.lock:
+            return self.sizers.setdefault(table, BatchSizer())
+
+    def write(self, table: str, rows, *, on_conflict: str | None = None, ignore_duplicates: bool = False,
+              returning: str = "minimal", stage: str | None = None, max_rows: int | None = None) -> list[Batch]:
+        """
+        rows をテーブルごとの大きさで区切って upsert（on_conflict なしなら insert）する。
+        投入した Batch を順に返す。max_rows で1リクエストの行数に上限を付けられる。
+        stage は metrics のステージ名（デフォルト write_<table>）
+        """
+        options = {"on_conflict": on_conflict, "ignore_duplicates": ignore_duplicates, "returning": returning}
+        return [
+            self._enqueue(Batch(table, batch, nbytes, options, stage or f"write_{table}"))
+            for batch, nbytes in self.sizer(table).batches(rows, max_rows)
+        ]
+
+    def submit(self, table: str, rows: list[dict], *, on_conflict: str | None = None,
+               ignore_duplicates: bool = False, returning: str = "minimal", stage: str | None = None) -> Batch:
+        """rows を区切らずに1バッチとして投入する（413 等なら分割はする）"""
+        options = {"on_conflict": on_conflict, "ignore_duplicates": ignore_duplicates, "returning": returning}
+        nbytes = sum(map(row_bytes, rows))
+        return self._enqueue(Batch(table, rows, nbytes, options, stage or f"write_{table}"))
+
+    def _enqueue(self, batch: Batch) -> Batch:
+        """同時送信数が上限なら空くまで待ってから投入する"""
+        self.slots.acquire()
+        with self.lock:
+            self.pending.add(batch)
+            if batch.table in self.ordered_tables:
+                lane = self.lanes.setdefault(batch.table, deque())
+                lane.append(batch)
+                if len(lane) > 1:
+                    return batch  # 前のバッチが終わったら _done() が送る
+        self.pool.submit(self._run, batch)
+        return batch
+
+    def _query(self, table: str, rows: list[dict], options: dict):
+        query = self.supabase.table(table)
+        if options["on_conflict"]:
+            return query.upsert(rows, on_conflict=options["on_conflict"],
+                                ignore_duplicates=options["ignore_duplicates"], returning=options["returning"])
+        return query.insert(rows, returning=options["returning"])
+
+    def _send(self, batch: Batch, rows: list[dict], nbytes: int):
+        """rows を送る。割れば通りそうなエラーなら半分ずつ送り直し、レスポンスをつなげて返す"""
+        sizer = self.sizer(batch.table)
+        query = self._query(batch.table, rows, batch.options)
+        idempotent = bool(batch.options["on_conflict"])
+        started = time.perf_counter()
+        try:
+            result = execute_with_retry(query, batch.table, self.max_retries, split_on_error=len(rows) > 1,
+                                        idempotent=idempotent)
+        except Exception as e:
+            if len(rows) < 2 or not is_too_large(e) or (not idempotent and is_ambiguous(e)):
+                raise
+            sizer.too_large(nbytes)
+            metrics.incr("batch_splits")
+            print(f"    ✂️ {batch.table} {len(rows)}行 ({nbytes // 1024}KB) を分割して再送: {str(e)[:60]}")
+            half = len(rows) // 2
+            head, tail = rows[:half], rows[half:]
+            first = self._send(batch, head, sum(map(row_bytes, head)))
+            second = self._send(batch, tail, sum(map(row_bytes, tail)))
+            count = None if first.count is None or second.count is None else first.count + second.count
+            return first.model_copy(update={"data": first.data + second.data, "count": count})
+        sizer.observe(nbytes, time.perf_counter() - started)
+        return result
+
+    def _run(self, batch: Batch):
+        try:
+            # ステージの時間は再送・分割込み（1バッチが書き込まれるまでの時間）
+            with metrics.stage(batch.stage) as stage:
+                result = self._send(batch, batch.rows, batch.nbytes)
+                stage.rows = batch.size
+        except Exception as e:
+            metrics.incr("write_failures")
+            self._done(batch, error=e)
+        else:
+            self._done(batch, result=result)
+
+    def _done(self, batch: Batch, result=None, error=None):
+        next_batch = None
+        with self.lock:
+            self.pending.discard(batch)
+            if error is not None:
+                self.failed.append((batch.table, error))
+            lane = self.lanes.get(batch.table)
+            if lane:
+                lane.popleft()
+                next_batch = lane[0] if lane else None
+        self.slots.release()
+        if next_batch:
+            try:
+                self.pool.submit(self._run, next_batch)
+            except RuntimeError:
+                # インタプリタ終了処理中は新しく投入できないので、このスレッドで続けて送る
+                self._run(next_batch)
+        if error is not None:
+            batch.set_exception(error)
+        else:
+            batch.rows = None
+            batch.set_result(result)
+
+    def flush(self, table: str | None = None, raise_errors: bool = True):
+        """
+        投入済みのバッチ（table 指定ならそのテーブルの分）が全部終わるまで待つ。
+        失敗があれば最初の例外を投げる（raise_errors=False なら捨てる。Batch 側で失敗を数える場合用）
+        """
+        while True:
+            with self.lock:
+                batches = [b for b in self.pending if table is None or b.table == table]
+            if not batches:
+                break
+            for b in batches:
+                b.exception()  # 完了待ち（例外はここでは投げない）
+        with self.lock:
+            failed = [e for t, e in self.failed if table is None or t == table]
+            self.failed = [(t, e) for t, e in self.failed if not (table is None or t == table)]
+        if failed and raise_errors:
+            if len(failed) > 1:
+                print(f"    ❌ 書き込み失敗 {len(failed)}バッチ")
+            raise failed[0]
+
+    def close(self):
+        """flush してスレッドを止める"""
+        try:
+            self.flush()
+        finally:
+            self.pool.shutdown(wait=True)
+            atexit.unregister(self._flush_at_exit)
+
+    def _flush_at_exit(self):
+        """close されずに終了したときの保険。送り切ってから終わる"""
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"  ERROR: 終了時の書き込みに失敗: {e}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # 本体が例外で抜けた場合も投入済みの分は送り切るが、元の例外を優先する
+            try:
+                self.close()
+            except Exception as e:
+                print(f"  ERROR: 書き込みに失敗: {e}")
+        return False